@@ -48,8 +48,8 @@ S.backing = backing.rigid
 result = S.solve(freqs, theta, n_draws=n_draws)
 
 
-# produce a figure for the absorption coefficient
-values = 1-abs(np.array(result['R']))**2
+# produce a figure for the absorption coefficient (single angle)
+values = result.alpha[:, 0, :]
 
 import matplotlib.pyplot as plt
 plt.figure()
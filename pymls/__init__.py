@@ -1,6 +1,7 @@
 __VERSION__ = '1.8'
 
 from pymls.solver import Solver
+from pymls.result import ResultSet, DiffuseResult, SensitivityResult, OptimizationResult
 from pymls.layers import Layer, StochasticLayer
 
 from mediapack.utils import from_yaml
@@ -75,3 +75,13 @@ class Analysis:
 
     def __iter__(self):
         return itertools.product(self.freqs, self.angles)
+
+    def __len__(self):
+        return len(self.freqs)*len(self.angles)
+
+    def points(self):
+        """ Returns the frequencies and angles of all points, in iteration order, as two arrays """
+        return (
+            np.repeat(self.freqs, len(self.angles)),
+            np.tile(self.angles, len(self.freqs))
+        )
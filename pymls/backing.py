@@ -28,17 +28,23 @@ from mediapack import Air
 
 
 def rigid(omega, k_x):
+    """ Rigid backing condition
 
-    return np.array([
-        [0],
-        [1]
-    ], dtype=np.complex128)
+    If `omega` is an array, returns a stack of vectors of shape (len(omega), 2, 1).
+    """
+
+    Omega = np.zeros(np.shape(omega)+(2,1), dtype=np.complex128)
+    Omega[...,1,0] = 1
+    return Omega
 
 
 def transmission(omega, k_x):
+    """ Semi-infinite air medium backing condition
+
+    If `omega` and `k_x` are arrays, returns a stack of vectors of shape (n, 2, 1).
+    """
     k_air = omega/Air.c
     k_z = sqrt(k_air**2-k_x**2)
-    return np.array([
-        [-1j*k_z/(Air.rho*omega**2)],
-        [1]
-    ], dtype=np.complex128)
+    Omega = np.ones(np.shape(k_z)+(2,1), dtype=np.complex128)
+    Omega[...,0,0] = -1j*k_z/(Air.rho*omega**2)
+    return Omega
@@ -108,3 +108,215 @@ def elastic_pem_interface(O):
     tau_tilde = np.vstack([np.eye(2), tau])
 
     return (Omega_minus, tau_tilde)
+
+
+# Constant tau_tilde matrices, shared by all the points of a stack
+TAU_TILDE_PEM_FLUID = np.array([[1, 0, 0]], dtype=np.complex128)
+TAU_TILDE_ELASTIC_FLUID = np.array([[1, 0]], dtype=np.complex128)
+TAU_TILDE_PEM_ELASTIC = np.array([[1, 0, 0], [0, 1, 0]], dtype=np.complex128)
+for _ in (TAU_TILDE_PEM_FLUID, TAU_TILDE_ELASTIC_FLUID, TAU_TILDE_PEM_ELASTIC):
+    _.flags.writeable = False
+
+
+def fluid_pem_interface_batch(O):
+    """ Stacked version of `fluid_pem_interface`, `O` being of shape (n, 6, 3) """
+
+    n = len(O)
+
+    # a = -[[O01, O02], [O31, O32]] is inverted analytically
+    det = O[:,0,1]*O[:,3,2] - O[:,0,2]*O[:,3,1]
+    tau_1 = (O[:,0,2]*O[:,3,0] - O[:,3,2]*O[:,0,0])/det
+    tau_2 = (O[:,3,1]*O[:,0,0] - O[:,0,1]*O[:,3,0])/det
+
+    tau_tilde = np.ones((n,3,1), dtype=np.complex128)
+    tau_tilde[:,1,0] = tau_1
+    tau_tilde[:,2,0] = tau_2
+
+    Omega_minus = np.empty((n,2,1), dtype=np.complex128)
+    Omega_minus[:,0,0] = O[:,2,0] + O[:,2,1]*tau_1 + O[:,2,2]*tau_2
+    Omega_minus[:,1,0] = O[:,4,0] + O[:,4,1]*tau_1 + O[:,4,2]*tau_2
+
+    return (Omega_minus, tau_tilde)
+
+
+def pem_fluid_interface_batch(O):
+    """ Stacked version of `pem_fluid_interface`, `O` being of shape (n, 2, 1) """
+
+    Omega_minus = np.zeros((len(O),6,3), dtype=np.complex128)
+    Omega_minus[:,1,1] = 1
+    Omega_minus[:,2,0] = O[:,0,0]
+    Omega_minus[:,4,0] = O[:,1,0]
+    Omega_minus[:,5,2] = 1
+
+    return (Omega_minus, TAU_TILDE_PEM_FLUID)
+
+
+def elastic_fluid_interface_batch(O):
+    """ Stacked version of `elastic_fluid_interface`, `O` being of shape (n, 2, 1) """
+
+    Omega_minus = np.zeros((len(O),4,2), dtype=np.complex128)
+    Omega_minus[:,1,0] = O[:,0,0]
+    Omega_minus[:,2,0] = -O[:,1,0]
+    Omega_minus[:,3,1] = 1
+
+    return (Omega_minus, TAU_TILDE_ELASTIC_FLUID)
+
+
+def fluid_elastic_interface_batch(O):
+    """ Stacked version of `fluid_elastic_interface`, `O` being of shape (n, 4, 2) """
+
+    n = len(O)
+
+    tau = -O[:,0,0]/O[:,0,1]
+
+    Omega_minus = np.empty((n,2,1), dtype=np.complex128)
+    Omega_minus[:,0,0] = O[:,1,1]*tau + O[:,1,0]
+    Omega_minus[:,1,0] = -O[:,2,1]*tau - O[:,2,0]
+
+    tau_tilde = np.ones((n,2,1), dtype=np.complex128)
+    tau_tilde[:,1,0] = tau
+
+    return (Omega_minus, tau_tilde)
+
+
+def pem_elastic_interface_batch(O):
+    """ Stacked version of `pem_elastic_interface`, `O` being of shape (n, 4, 2) """
+
+    Omega_minus = np.zeros((len(O),6,3), dtype=np.complex128)
+    Omega_minus[:,0,0:2] = O[:,0,0:2]
+    Omega_minus[:,1,0:2] = O[:,1,0:2]
+    Omega_minus[:,2,0:2] = O[:,1,0:2]
+    Omega_minus[:,3,0:2] = O[:,2,0:2]
+    Omega_minus[:,3,2] = 1
+    Omega_minus[:,4,2] = 1
+    Omega_minus[:,5,0:2] = O[:,3,0:2]
+
+    return (Omega_minus, TAU_TILDE_PEM_ELASTIC)
+
+
+def elastic_pem_interface_batch(O):
+    """ Stacked version of `elastic_pem_interface`, `O` being of shape (n, 6, 3) """
+
+    n = len(O)
+
+    # Dplus = [0, 1, -1, 0, 0, 0] applied to the columns of O
+    tau = -(O[:,1,0:2] - O[:,2,0:2])/(O[:,1,2] - O[:,2,2])[:,np.newaxis]
+    X = O[:,:,0:2] + O[:,:,2:3]*tau[:,np.newaxis,:]
+
+    # Dminus applied to X
+    Omega_minus = np.empty((n,4,2), dtype=np.complex128)
+    Omega_minus[:,0,:] = X[:,0,:]
+    Omega_minus[:,1,:] = X[:,1,:]
+    Omega_minus[:,2,:] = X[:,3,:] - X[:,4,:]
+    Omega_minus[:,3,:] = X[:,5,:]
+
+    tau_tilde = np.zeros((n,3,2), dtype=np.complex128)
+    tau_tilde[:,0,0] = 1
+    tau_tilde[:,1,1] = 1
+    tau_tilde[:,2,:] = tau
+
+    return (Omega_minus, tau_tilde)
+
+
+# Forward-mode tangents of the stacked interface functions: given `O` and its
+# derivatives `dO` along several directions (of shape (p, n, m, k)), they return the
+# output of the stacked function followed by the derivatives of `Omega_minus` and of
+# `tau_tilde` (0 when constant).
+
+def fluid_pem_interface_tangent(O, dO):
+    """ Tangent of `fluid_pem_interface_batch` """
+
+    (Omega_minus, tau_tilde) = fluid_pem_interface_batch(O)
+    (tau_1, tau_2) = (tau_tilde[:,1,0], tau_tilde[:,2,0])
+
+    det = O[:,0,1]*O[:,3,2] - O[:,0,2]*O[:,3,1]
+    d_det = dO[...,0,1]*O[:,3,2] + O[:,0,1]*dO[...,3,2] - dO[...,0,2]*O[:,3,1] - O[:,0,2]*dO[...,3,1]
+    d_numerator_1 = dO[...,0,2]*O[:,3,0] + O[:,0,2]*dO[...,3,0] - dO[...,3,2]*O[:,0,0] - O[:,3,2]*dO[...,0,0]
+    d_numerator_2 = dO[...,3,1]*O[:,0,0] + O[:,3,1]*dO[...,0,0] - dO[...,0,1]*O[:,3,0] - O[:,0,1]*dO[...,3,0]
+    d_tau_1 = (d_numerator_1 - tau_1*d_det)/det
+    d_tau_2 = (d_numerator_2 - tau_2*d_det)/det
+
+    d_tau_tilde = np.zeros(dO.shape[:-2]+(3,1), dtype=np.complex128)
+    d_tau_tilde[...,1,0] = d_tau_1
+    d_tau_tilde[...,2,0] = d_tau_2
+
+    d_Omega_minus = np.empty(dO.shape[:-2]+(2,1), dtype=np.complex128)
+    for (i, row) in enumerate([2, 4]):
+        d_first = dO[...,row,1]*tau_1 + O[:,row,1]*d_tau_1
+        d_second = dO[...,row,2]*tau_2 + O[:,row,2]*d_tau_2
+        d_Omega_minus[...,i,0] = dO[...,row,0] + d_first + d_second
+
+    return (Omega_minus, tau_tilde, d_Omega_minus, d_tau_tilde)
+
+
+def pem_fluid_interface_tangent(O, dO):
+    """ Tangent of `pem_fluid_interface_batch` """
+
+    d_Omega_minus = np.zeros(dO.shape[:-2]+(6,3), dtype=np.complex128)
+    d_Omega_minus[...,2,0] = dO[...,0,0]
+    d_Omega_minus[...,4,0] = dO[...,1,0]
+
+    return pem_fluid_interface_batch(O)+(d_Omega_minus, 0)
+
+
+def elastic_fluid_interface_tangent(O, dO):
+    """ Tangent of `elastic_fluid_interface_batch` """
+
+    d_Omega_minus = np.zeros(dO.shape[:-2]+(4,2), dtype=np.complex128)
+    d_Omega_minus[...,1,0] = dO[...,0,0]
+    d_Omega_minus[...,2,0] = -dO[...,1,0]
+
+    return elastic_fluid_interface_batch(O)+(d_Omega_minus, 0)
+
+
+def fluid_elastic_interface_tangent(O, dO):
+    """ Tangent of `fluid_elastic_interface_batch` """
+
+    (Omega_minus, tau_tilde) = fluid_elastic_interface_batch(O)
+    tau = tau_tilde[:,1,0]
+    d_tau = -(dO[...,0,0] + tau*dO[...,0,1])/O[:,0,1]
+
+    d_Omega_minus = np.empty(dO.shape[:-2]+(2,1), dtype=np.complex128)
+    d_Omega_minus[...,0,0] = dO[...,1,1]*tau + O[:,1,1]*d_tau + dO[...,1,0]
+    d_Omega_minus[...,1,0] = -dO[...,2,1]*tau - O[:,2,1]*d_tau - dO[...,2,0]
+
+    d_tau_tilde = np.zeros(dO.shape[:-2]+(2,1), dtype=np.complex128)
+    d_tau_tilde[...,1,0] = d_tau
+
+    return (Omega_minus, tau_tilde, d_Omega_minus, d_tau_tilde)
+
+
+def pem_elastic_interface_tangent(O, dO):
+    """ Tangent of `pem_elastic_interface_batch` """
+
+    d_Omega_minus = np.zeros(dO.shape[:-2]+(6,3), dtype=np.complex128)
+    d_Omega_minus[...,0,0:2] = dO[...,0,0:2]
+    d_Omega_minus[...,1,0:2] = dO[...,1,0:2]
+    d_Omega_minus[...,2,0:2] = dO[...,1,0:2]
+    d_Omega_minus[...,3,0:2] = dO[...,2,0:2]
+    d_Omega_minus[...,5,0:2] = dO[...,3,0:2]
+
+    return pem_elastic_interface_batch(O)+(d_Omega_minus, 0)
+
+
+def elastic_pem_interface_tangent(O, dO):
+    """ Tangent of `elastic_pem_interface_batch` """
+
+    (Omega_minus, tau_tilde) = elastic_pem_interface_batch(O)
+    tau = tau_tilde[:,2,:]
+
+    denominator = (O[:,1,2] - O[:,2,2])[:,np.newaxis]
+    d_denominator = (dO[...,1,2] - dO[...,2,2])[...,np.newaxis]
+    d_tau = -((dO[...,1,0:2] - dO[...,2,0:2]) + tau*d_denominator)/denominator
+    d_X = dO[...,0:2] + dO[...,2:3]*tau[:,np.newaxis,:] + O[:,:,2:3]*d_tau[...,np.newaxis,:]
+
+    d_Omega_minus = np.empty(dO.shape[:-2]+(4,2), dtype=np.complex128)
+    d_Omega_minus[...,0,:] = d_X[...,0,:]
+    d_Omega_minus[...,1,:] = d_X[...,1,:]
+    d_Omega_minus[...,2,:] = d_X[...,3,:] - d_X[...,4,:]
+    d_Omega_minus[...,3,:] = d_X[...,5,:]
+
+    d_tau_tilde = np.zeros(dO.shape[:-2]+(3,2), dtype=np.complex128)
+    d_tau_tilde[...,2,:] = d_tau
+
+    return (Omega_minus, tau_tilde, d_Omega_minus, d_tau_tilde)
@@ -28,8 +28,8 @@ import numpy as np
 def pem_rigid_interface(O):
 
     Omega_minus = np.zeros((6,3), dtype=np.complex128)
-    Omega_minus[2,0] = O[0]
-    Omega_minus[4,0] = O[1]
+    Omega_minus[2,0] = O[0,0]
+    Omega_minus[4,0] = O[1,0]
     Omega_minus[0,1] = 1
     Omega_minus[3,2] = 1
 
@@ -41,9 +41,55 @@ def pem_rigid_interface(O):
 def elastic_rigid_interface(O):
 
     Omega_minus = np.zeros((4,2), dtype=np.complex128)
-    Omega_minus[0,1] = O[1]
-    Omega_minus[2,0] = -O[1]
+    Omega_minus[0,1] = O[1,0]
+    Omega_minus[2,0] = -O[1,0]
 
     tau_tilde = 0
 
     return (Omega_minus, tau_tilde)
+
+
+def pem_rigid_interface_batch(O):
+    """ Stacked version of `pem_rigid_interface`, `O` being of shape (n, 2, 1) """
+
+    Omega_minus = np.zeros((len(O),6,3), dtype=np.complex128)
+    Omega_minus[:,2,0] = O[:,0,0]
+    Omega_minus[:,4,0] = O[:,1,0]
+    Omega_minus[:,0,1] = 1
+    Omega_minus[:,3,2] = 1
+
+    tau_tilde = 0
+
+    return (Omega_minus, tau_tilde)
+
+
+def elastic_rigid_interface_batch(O):
+    """ Stacked version of `elastic_rigid_interface`, `O` being of shape (n, 2, 1) """
+
+    Omega_minus = np.zeros((len(O),4,2), dtype=np.complex128)
+    Omega_minus[:,0,1] = O[:,1,0]
+    Omega_minus[:,2,0] = -O[:,1,0]
+
+    tau_tilde = 0
+
+    return (Omega_minus, tau_tilde)
+
+
+def pem_rigid_interface_tangent(O, dO):
+    """ Tangent of `pem_rigid_interface_batch`, see `pymls.interface.interfaces` """
+
+    d_Omega_minus = np.zeros(dO.shape[:-2]+(6,3), dtype=np.complex128)
+    d_Omega_minus[...,2,0] = dO[...,0,0]
+    d_Omega_minus[...,4,0] = dO[...,1,0]
+
+    return pem_rigid_interface_batch(O)+(d_Omega_minus, 0)
+
+
+def elastic_rigid_interface_tangent(O, dO):
+    """ Tangent of `elastic_rigid_interface_batch`, see `pymls.interface.interfaces` """
+
+    d_Omega_minus = np.zeros(dO.shape[:-2]+(4,2), dtype=np.complex128)
+    d_Omega_minus[...,0,1] = dO[...,1,0]
+    d_Omega_minus[...,2,0] = -dO[...,1,0]
+
+    return elastic_rigid_interface_batch(O)+(d_Omega_minus, 0)
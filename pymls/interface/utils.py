@@ -22,17 +22,57 @@
 # copies or substantial portions of the Software.
 #
 
-
 from .interfaces import\
     fluid_elastic_interface,\
     elastic_fluid_interface,\
     fluid_pem_interface,\
     pem_fluid_interface,\
     elastic_pem_interface,\
-    pem_elastic_interface
+    pem_elastic_interface,\
+    fluid_elastic_interface_batch,\
+    elastic_fluid_interface_batch,\
+    fluid_pem_interface_batch,\
+    pem_fluid_interface_batch,\
+    elastic_pem_interface_batch,\
+    pem_elastic_interface_batch,\
+    fluid_elastic_interface_tangent,\
+    elastic_fluid_interface_tangent,\
+    fluid_pem_interface_tangent,\
+    pem_fluid_interface_tangent,\
+    elastic_pem_interface_tangent,\
+    pem_elastic_interface_tangent
 from .interfaces_rigid import\
     pem_rigid_interface,\
-    elastic_rigid_interface
+    elastic_rigid_interface,\
+    pem_rigid_interface_batch,\
+    elastic_rigid_interface_batch,\
+    pem_rigid_interface_tangent,\
+    elastic_rigid_interface_tangent
+
+
+# Stacked counterpart of each interface function
+BATCH_INTERFACES = {
+    fluid_elastic_interface: fluid_elastic_interface_batch,
+    elastic_fluid_interface: elastic_fluid_interface_batch,
+    fluid_pem_interface: fluid_pem_interface_batch,
+    pem_fluid_interface: pem_fluid_interface_batch,
+    elastic_pem_interface: elastic_pem_interface_batch,
+    pem_elastic_interface: pem_elastic_interface_batch,
+    pem_rigid_interface: pem_rigid_interface_batch,
+    elastic_rigid_interface: elastic_rigid_interface_batch,
+}
+
+# Forward-mode tangent of each interface function
+TANGENT_INTERFACES = {
+    fluid_elastic_interface: fluid_elastic_interface_tangent,
+    elastic_fluid_interface: elastic_fluid_interface_tangent,
+    fluid_pem_interface: fluid_pem_interface_tangent,
+    pem_fluid_interface: pem_fluid_interface_tangent,
+    elastic_pem_interface: elastic_pem_interface_tangent,
+    pem_elastic_interface: pem_elastic_interface_tangent,
+    pem_rigid_interface: pem_rigid_interface_tangent,
+    elastic_rigid_interface: elastic_rigid_interface_tangent,
+}
 
 
 def generic_interface(medium_left, medium_right):
@@ -80,3 +120,42 @@ def rigid_interface(medium):
         return elastic_rigid_interface
     if medium.MODEL == 'pem':
         return pem_rigid_interface
+
+
+def generic_interface_batch(medium_left, medium_right):
+    """
+    Returns a callable to the interface function corresponding to the two given
+    media and working on stacks of `Omega` matrices of shape (n, m, k).
+
+    Returns None when the interface is transparent (see `generic_interface`).
+    """
+    return BATCH_INTERFACES.get(generic_interface(medium_left, medium_right))
+
+
+def rigid_interface_batch(medium):
+    """
+    Returns a callable to the rigid backing function corresponding to the given media
+    and working on stacks of `Omega` matrices.
+    """
+    return BATCH_INTERFACES.get(rigid_interface(medium))
+
+
+def generic_interface_tangent(medium_left, medium_right):
+    """
+    Returns a callable to the forward-mode tangent of the stacked interface function
+    corresponding to the two given media.
+
+    The callable, `tangent(O, dO)`, takes the derivatives `dO` of the stack `O` along
+    several directions, as an array of shape (p, n, m, k), and returns the output of the
+    stacked interface function followed by the derivatives of `Omega_minus` and of
+    `tau_tilde`. Returns None when the interface is transparent.
+    """
+    return TANGENT_INTERFACES.get(generic_interface(medium_left, medium_right))
+
+
+def rigid_interface_tangent(medium):
+    """
+    Returns a callable to the forward-mode tangent of the rigid backing function
+    corresponding to the given media, see `generic_interface_tangent`.
+    """
+    return TANGENT_INTERFACES.get(rigid_interface(medium))
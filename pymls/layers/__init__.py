@@ -22,10 +22,12 @@
 # copies or substantial portions of the Software.
 #
 
-from .elastic import transfert_elastic
-from .fluid import transfert_fluid
-from .pem import transfert_pem
-from .screen import transfert_screen
+from .elastic import transfert_elastic, transfert_elastic_batch
+from .fluid import transfert_fluid, transfert_fluid_batch
+from .pem import transfert_pem, transfert_pem_batch
+from .screen import transfert_screen, transfert_screen_batch
 
-from .utils import generic_layer
+from .utils import generic_layer, generic_layer_batch, generic_eigen_batch, generic_profile_batch, \
+    generic_tangent_batch
 from .layer import Layer, StochasticLayer
+from .stack import MediumStack
@@ -25,12 +25,14 @@
 import numpy as np
 from numpy.lib.scimath import sqrt
 
+from .modes import modal_sort, modal_profile, modal_propagate_tangent
+
 
 def transfert_elastic(Omega_minus, omega, k_x, medium, d):
 
-    P_mat = medium.lambda_ + 2*medium.mu
-    delta_p = omega*sqrt(medium.rho/P_mat)
-    delta_s = omega*sqrt(medium.rho/medium.mu)
+    # wavenumbers computed by the medium in update_frequency
+    delta_p = medium.delta_p
+    delta_s = medium.delta_s
 
     beta_p = sqrt(delta_p**2-k_x**2)
     beta_s = sqrt(delta_s**2-k_x**2)
@@ -98,3 +100,118 @@ def transfert_elastic(Omega_minus, omega, k_x, medium, d):
     Xi = xi_prime_lambda*np.exp(-lambda_[1]*d)
 
     return (Omega_plus, Xi)
+
+
+def transfert_elastic_batch(Omega_minus, omega, k_x, medium, d):
+    """ Stacked version of `transfert_elastic`
+
+    `Omega_minus` is of shape (n, 4, 2), `omega` and `k_x` of shape (n,), the
+    frequency dependent attributes of `medium` (a `MediumStack`) are of shape (n,) and
+    `d` is either a scalar or of shape (n,).
+    """
+    return propagate_elastic_batch(Omega_minus, eigen_elastic_batch(omega, k_x, medium), d)
+
+
+def eigen_elastic_batch(omega, k_x, medium, reference=None):
+    """ Thickness-independent part of `transfert_elastic_batch`
+
+    Returns the sorted eigenvectors `Phi` of the state matrix, their inverse and the
+    sorted eigenvalues `lambda_`, for each point of the stack. If `reference`, the
+    output of this function at close parameters, is given, the modes are sorted as in
+    it rather than by real parts (see `modal_sort`).
+    """
+
+    n = len(k_x)
+
+    # wavenumbers computed by the medium in update_frequency
+    delta_p = medium.delta_p
+    delta_s = medium.delta_s
+
+    beta_p = sqrt(delta_p**2-k_x**2)
+    beta_s = sqrt(delta_s**2-k_x**2)
+
+    alpha_p = -1j*medium.lambda_*delta_p**2 - 2j*medium.mu*beta_p**2
+    alpha_s = 2j*medium.mu*beta_s*k_x
+
+    Phi_0 = np.zeros((n,4,4),dtype=np.complex128)
+    Phi_0[:,0,0] = -2j*medium.mu*beta_p*k_x
+    Phi_0[:,0,1] = 2j*medium.mu*beta_p*k_x
+    Phi_0[:,0,2] = 1j*medium.mu*(beta_s**2-k_x**2)
+    Phi_0[:,0,3] = 1j*medium.mu*(beta_s**2-k_x**2)
+
+    Phi_0[:,1,0] = beta_p
+    Phi_0[:,1,1] = -beta_p
+    Phi_0[:,1,2] = k_x
+    Phi_0[:,1,3] = k_x
+
+    Phi_0[:,2,0] = alpha_p
+    Phi_0[:,2,1] = alpha_p
+    Phi_0[:,2,2] = -alpha_s
+    Phi_0[:,2,3] = alpha_s
+
+    Phi_0[:,3,0] = k_x
+    Phi_0[:,3,1] = k_x
+    Phi_0[:,3,2] = -beta_s
+    Phi_0[:,3,3] = beta_s
+
+    V_0 = np.stack([
+        1j*beta_p,
+        -1j*beta_p,
+        1j*beta_s,
+        -1j*beta_s
+    ], axis=-1)
+
+    # reverse sort, point by point
+    index = modal_sort(V_0, None if reference is None else reference[2])
+
+    Phi = np.take_along_axis(Phi_0, index[:,np.newaxis,:], axis=2)
+    lambda_ = np.take_along_axis(V_0, index, axis=1)
+
+    Phi_inv = np.linalg.inv(Phi)
+
+    return (Phi, Phi_inv, lambda_)
+
+
+def propagate_elastic_batch(Omega_minus, eigen, d):
+    """ Propagates `Omega_minus` through a thickness `d` given the output of `eigen_elastic_batch` """
+
+    (Phi, Phi_inv, lambda_) = eigen
+    n = len(lambda_)
+
+    Lambda = np.stack([
+        np.zeros(n),
+        np.ones(n),
+        np.exp((lambda_[:,2]-lambda_[:,1])*d),
+        np.exp((lambda_[:,3]-lambda_[:,1])*d)
+    ], axis=-1)
+
+    alpha_prime = (Phi*Lambda[:,np.newaxis,:]) @ Phi_inv
+
+    xi_prime = np.zeros((n,2,2), dtype=np.complex128)
+    xi_prime[:,:1,:] = Phi_inv[:,:1,:] @ Omega_minus
+    xi_prime[:,1,1] = 1
+    xi_prime_lambda = np.linalg.inv(xi_prime)*np.stack([
+        np.exp((lambda_[:,1]-lambda_[:,0])*d),
+        np.ones(n)
+    ], axis=-1)[:,np.newaxis,:]
+
+    Omega_plus = alpha_prime @ Omega_minus @ xi_prime_lambda
+    Omega_plus[:,:,0] += Phi[:,:,0]
+
+    Xi = xi_prime_lambda*np.exp(-lambda_[:,1]*d)[:,np.newaxis,np.newaxis]
+
+    return (Omega_plus, Xi)
+
+
+def propagate_elastic_tangent(Omega_minus, d_Omega_minus, eigen, d_eigen, d, d_d):
+    """ Forward-mode tangent of `propagate_elastic_batch`, see `modal_propagate_tangent` """
+
+    return modal_propagate_tangent(Omega_minus, d_Omega_minus, eigen, d_eigen, d, d_d)
+
+
+def profile_elastic_batch(eigen, S_left, S_right, d, z):
+    """ State vectors at depths `z` given the output of `eigen_elastic_batch`, see `modal_profile` """
+
+    (Phi, Phi_inv, lambda_) = eigen
+
+    return modal_profile(Phi, Phi_inv, lambda_, S_left, S_right, d, z)
@@ -25,6 +25,8 @@
 import numpy as np
 from numpy.lib.scimath import sqrt
 
+from .modes import modal_profile
+
 
 def transfert_fluid(Omega_minus, omega, k_x, medium, d):
 
@@ -59,3 +61,122 @@ def transfert_fluid(Omega_minus, omega, k_x, medium, d):
     Xi = np.exp(-lambda_*d)/Psi[0,:].reshape(1,2).dot(Omega_minus)
 
     return (Omega_plus, Xi)
+
+
+def transfert_fluid_batch(Omega_minus, omega, k_x, medium, d):
+    """ Stacked version of `transfert_fluid`
+
+    `Omega_minus` is of shape (n, 2, 1), `omega` and `k_x` of shape (n,), the
+    frequency dependent attributes of `medium` (a `MediumStack`) are of shape (n,) and
+    `d` is either a scalar or of shape (n,).
+    """
+    return propagate_fluid_batch(Omega_minus, eigen_fluid_batch(omega, k_x, medium), d)
+
+
+def eigen_fluid_batch(omega, k_x, medium, reference=None):
+    """ Thickness-independent part of `transfert_fluid_batch`
+
+    Returns the eigenvalue `lambda_` of the state matrix (the other one being
+    -`lambda_`) and the ratio `Z` defining the eigenvectors, for each point of the stack.
+    The modes are not sorted, `reference` is unused (see `eigen_elastic_batch`).
+    """
+
+    if medium.MEDIUM_TYPE == 'eqf':
+        rho = medium.rho_eq_til
+        c = medium.c_eq_til
+    elif medium.MEDIUM_TYPE == 'fluid':
+        rho = medium.rho
+        c = medium.c
+    else:
+        raise ValueError('Provided material is not a fluid')
+
+    delta = omega/c
+
+    lambda_ = -sqrt(k_x**2-delta**2)
+    Z = lambda_/(rho*omega**2)
+
+    return (Z, lambda_)
+
+
+def propagate_fluid_batch(Omega_minus, eigen, d):
+    """ Propagates `Omega_minus` through a thickness `d` given the output of `eigen_fluid_batch` """
+
+    (Z, lambda_) = eigen
+
+    # Projections of Omega_minus on the two waves (rows of the analytical
+    # inverse of Phi, see transfert_fluid)
+    Psi_0 = (-Omega_minus[:,0,0] + Z*Omega_minus[:,1,0])/(2*Z)
+    Psi_1 = (Omega_minus[:,0,0] + Z*Omega_minus[:,1,0])/(2*Z)
+
+    ratio = np.exp(-2*lambda_*d)*Psi_1/Psi_0
+    Omega_plus = np.stack([
+        -Z + ratio*Z,
+        1 + ratio
+    ], axis=-1)[:,:,np.newaxis]
+
+    Xi = (np.exp(-lambda_*d)/Psi_0)[:,np.newaxis,np.newaxis]
+
+    return (Omega_plus, Xi)
+
+
+def profile_fluid_batch(eigen, S_left, S_right, d, z):
+    """ State vectors at depths `z` given the output of `eigen_fluid_batch`, see `modal_profile` """
+
+    (Z, lambda_) = eigen
+    n = len(lambda_)
+
+    Phi = np.empty((n,2,2), dtype=np.complex128)
+    Phi[:,0,0] = -Z
+    Phi[:,0,1] = Z
+    Phi[:,1,:] = 1
+
+    # analytical inverse of Phi
+    Phi_inv = np.empty((n,2,2), dtype=np.complex128)
+    Phi_inv[:,0,0] = -1/(2*Z)
+    Phi_inv[:,1,0] = 1/(2*Z)
+    Phi_inv[:,:,1] = 0.5
+
+    return modal_profile(Phi, Phi_inv, np.stack([lambda_, -lambda_], axis=-1), S_left, S_right, d, z)
+
+
+def propagate_fluid_tangent(Omega_minus, d_Omega_minus, eigen, d_eigen, d, d_d):
+    """ Forward-mode tangent of `propagate_fluid_batch`
+
+    The derivatives of `Omega_minus`, of the output of `eigen_fluid_batch` and of the
+    thickness along p directions are given with a leading axis of size p, see
+    `pymls.layers.modes.modal_propagate_tangent`.
+
+    Returns
+    -------
+    Omega_plus, d_Omega_plus, Xi, d_Xi : ndarray
+        Outputs of `propagate_fluid_batch` and their derivatives
+    """
+
+    (Z, lambda_) = eigen
+    (d_Z, d_lambda) = d_eigen
+    (O_0, O_1) = (Omega_minus[:,0,0], Omega_minus[:,1,0])
+    (d_O_0, d_O_1) = (d_Omega_minus[...,0,0], d_Omega_minus[...,1,0])
+
+    Psi_0 = (-O_0 + Z*O_1)/(2*Z)
+    Psi_1 = (O_0 + Z*O_1)/(2*Z)
+    d_Psi_1 = (d_O_0 - O_0*d_Z/Z)/(2*Z) + d_O_1/2
+    d_Psi_0 = d_O_1 - d_Psi_1
+
+    decay = np.exp(-2*lambda_*d)
+    d_decay = -2*decay*(d_lambda*d + lambda_*d_d)
+    ratio = decay*Psi_1/Psi_0
+    d_ratio = (d_decay*Psi_1 + decay*d_Psi_1 - ratio*d_Psi_0)/Psi_0
+
+    Omega_plus = np.stack([
+        -Z + ratio*Z,
+        1 + ratio
+    ], axis=-1)[:,:,np.newaxis]
+    d_Omega_plus = np.stack(np.broadcast_arrays(
+        -d_Z + d_ratio*Z + ratio*d_Z,
+        d_ratio
+    ), axis=-1)[...,np.newaxis]
+
+    Xi = (np.exp(-lambda_*d)/Psi_0)[:,np.newaxis,np.newaxis]
+    d_Xi = Xi*(-(d_lambda*d + lambda_*d_d) - d_Psi_0/Psi_0)[...,np.newaxis,np.newaxis]
+
+    return (Omega_plus, d_Omega_plus, Xi, d_Xi)
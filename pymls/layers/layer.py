@@ -24,6 +24,10 @@
 
 import copy
 
+import numpy as np
+
+from .stack import MediumStack
+
 
 class Layer(object):
 
@@ -40,6 +44,33 @@ class Layer(object):
             f(self)
         self.medium.update_frequency(omega)
 
+    def stack_frequencies(self, omegas):
+        """ Evaluates the layer for each circular frequency in `omegas`
+
+        The medium is updated once per distinct frequency, the resulting state being
+        shared by all the points at this frequency (typically all the angles).
+
+        Parameters
+        ----------
+        omegas : ndarray
+            Circular frequencies, one per analysis point
+
+        Returns
+        -------
+        medium : MediumStack
+            State of the medium on each point
+        thickness : ndarray
+            Thickness of the layer on each point
+        """
+        (unique_omegas, inverse) = np.unique(omegas, return_inverse=True)
+        snapshots, thicknesses = [], []
+        for omega in unique_omegas:
+            self.update_frequency(omega)
+            snapshots.append(MediumStack.snapshot(self.medium))
+            thicknesses.append(self.thickness)
+        medium = MediumStack.from_snapshots(self.medium, snapshots)
+        return (medium.take(inverse), np.array(thicknesses)[inverse])
+
     def register(self, hook_name):
         if self.hooks.get(hook_name) is None:
             raise ValueError("Invalid hook name. Use one of : {}".format(','.join(self.hooks.keys())))
@@ -68,7 +99,10 @@ class StochasticLayer(Layer):
         name -- optional layer's name
 
         Please note that the pdf is a **function handle** that must return
-        a sample per call (and accepts no argument)
+        a sample per call (and accepts no argument). Batch samplers (a
+        `pymls.utils.Distribution`, a `pymls.utils.DrawsManager` or its `as_pdf`)
+        are also accepted, and give all the draws of an analysis at once (see
+        `new_draws`).
         """
 
         super().__init__(medium, thickness, name)
@@ -79,31 +113,87 @@ class StochasticLayer(Layer):
         self.__medium_params = dict(self.medium.EXPECTED_PARAMS+self.medium.OPT_PARAMS)
 
         if self.stochastic_param == 'thickness':
-            setattr(self, 'new_draw', self.__draw_thickness)
             self.initial_param_value = self.thickness
         elif self.stochastic_param in self.__medium_params.keys():
             self.initial_param_value = getattr(self.medium, self.stochastic_param)
-            setattr(self, 'new_draw', self.__draw_medium_parameter)
         else:
             raise ValueError('Unable to draw a parameter undefined in the layer')
 
+    def new_draw(self):
+        """ Draws a new value of the stochastic parameter from the pdf and applies it """
+        if self.stochastic_param == 'thickness':
+            return self.__draw_thickness()
+        else:
+            return self.__draw_medium_parameter()
+
+    def new_draws(self, n):
+        """ Takes `n` draws of the stochastic parameter and applies the last one
+
+        If the pdf is a batch sampler (see `batch_sampler`), the draws are taken at
+        once: the next batch of `n` values of a `DrawsManager` or `n` samples of a
+        `Distribution`. Otherwise, the pdf is called once per draw.
+        """
+        sampler = self.batch_sampler
+        if sampler is None:
+            return [self.new_draw() for _ in range(n)]
+
+        if hasattr(sampler, 'batches'):
+            draws = next(sampler.batches(n), [])
+        else:
+            draws = sampler.sample(n)
+        if len(draws) < n:
+            raise ValueError('The pdf only has {} samples left.'.format(len(draws)))
+
+        draws = np.asarray(draws).tolist()
+        if self.stochastic_param == 'thickness':
+            draws = [float(_) for _ in draws]
+        else:
+            for draw in draws:
+                self.__check_type(draw)
+        self.apply_draw(draws[-1])
+        return draws
+
+    @property
+    def batch_sampler(self):
+        """ Object behind the pdf drawing batches of values, None for plain functions
+
+        Either the pdf itself, if it has a `batches` (`pymls.utils.DrawsManager`) or a
+        `sample` (`pymls.utils.Distribution`) method, or the `DrawsManager` the pdf is
+        the `as_pdf` method of.
+        """
+        if hasattr(self.pdf, 'batches') or hasattr(self.pdf, 'sample'):
+            return self.pdf
+        owner = getattr(self.pdf, '__self__', None)
+        if hasattr(owner, 'batches'):
+            return owner
+        return None
+
     def __draw_thickness(self):
         draw = float(self.pdf())
-        self.thickness = draw
+        self.apply_draw(draw)
         return draw
 
     def __draw_medium_parameter(self):
         draw = self.pdf()
+        self.__check_type(draw)
+        self.apply_draw(draw)
+        return draw
+
+    def __check_type(self, draw):
         expected_type = self.__medium_params[self.stochastic_param]
-        if type(draw) == expected_type:
-            setattr(self.medium, self.stochastic_param, draw)
-            self.medium.omega = -1
-        else:
+        if type(draw) != expected_type:
             raise TypeError('Draw of type {} but expected type {}'.format(
                 type(draw),
                 expected_type
             ))
-        return draw
+
+    def apply_draw(self, draw):
+        """ Sets the stochastic parameter to a value previously drawn """
+        if self.stochastic_param == 'thickness':
+            self.thickness = draw
+        else:
+            setattr(self.medium, self.stochastic_param, draw)
+            self.medium.omega = -1
 
     def reinit(self):
         if self.stochastic_param == 'thickness':
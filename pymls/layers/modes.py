@@ -0,0 +1,201 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# modes.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+
+import numpy as np
+
+
+def modal_sort(V_0, reference=None):
+    """
+    Order of the modes of eigenvalues `V_0`, point by point.
+
+    The modes are sorted by decreasing real parts or, if `reference` is given, as the
+    modes of closest eigenvalues in `reference`. The latter is meant for eigenvalues
+    at slightly perturbed parameters (as in central differences): sorted by real
+    parts, two modes of close real parts could be swapped by the perturbation.
+
+    Parameters
+    ----------
+    V_0 : ndarray
+        Eigenvalues of the state matrix, of shape (n, m)
+    reference : ndarray, optional
+        Sorted eigenvalues at close parameters, of shape (n, m)
+
+    Returns
+    -------
+    index : ndarray
+        Indices of the sorted modes in `V_0`, of shape (n, m)
+
+    Raises
+    ------
+    ValueError
+        If the eigenvalues cannot be matched unambiguously to the ones of `reference`
+    """
+
+    if reference is None:
+        return np.argsort(V_0.real, axis=-1)[:,::-1]
+
+    m = V_0.shape[-1]
+    distance = np.abs(reference[:,:,np.newaxis]-V_0[:,np.newaxis,:])
+    index = np.argmin(distance, axis=-1)
+    closest = np.take_along_axis(distance, index[:,:,np.newaxis], axis=-1)[:,:,0]
+    others = np.where(np.arange(m) == index[:,:,np.newaxis], np.inf, distance).min(axis=-1)
+    if np.any(np.sort(index, axis=-1) != np.arange(m)) or np.any(others <= 2*closest):
+        raise ValueError('Unable to match the modes to the reference ones, the eigenvalues are degenerate')
+
+    return index
+
+
+def modal_profile(Phi, Phi_inv, lambda_, S_left, S_right, d, z):
+    """
+    State vectors at depths `z` in a layer described by its modes.
+
+    In a layer of thickness `d`, the state vectors on both sides are related by
+    `S_left = Phi.diag(exp(lambda_*d)).Phi_inv.S_right`. Each mode is evaluated from
+    the side it decays from, so that only exponentials of modulus lower than one are
+    computed whatever the thickness.
+
+    Parameters
+    ----------
+    Phi, Phi_inv : ndarray
+        Eigenvectors of the state matrix and their inverse, of shape (n, m, m)
+    lambda_ : ndarray
+        Eigenvalues of the state matrix, of shape (n, m)
+    S_left, S_right : ndarray
+        State vectors on the left and right sides of the layer, of shape (n, m).
+        `S_right` can be None, it is then deduced from `S_left`.
+    d : float or ndarray
+        Thickness of the layer, scalar or of shape (n,)
+    z : ndarray
+        Depths in the layer, measured from its left side, of shape (n_z,)
+
+    Returns
+    -------
+    S : ndarray
+        State vectors, of shape (n, n_z, m)
+    """
+
+    d = np.reshape(d, (-1,1,1))
+    z = np.reshape(z, (1,-1,1))
+    lambda_ = lambda_[:,np.newaxis,:]
+
+    q_left = (Phi_inv @ S_left[:,:,np.newaxis])[:,np.newaxis,:,0]
+    if S_right is None:
+        q_right = q_left*np.exp(-lambda_*d)
+    else:
+        q_right = (Phi_inv @ S_right[:,:,np.newaxis])[:,np.newaxis,:,0]
+
+    from_left = lambda_.real >= 0
+    q = np.where(from_left, q_left, q_right)*np.exp(np.where(from_left, -lambda_*z, lambda_*(d-z)))
+
+    return np.einsum('nij,nzj->nzi', Phi, q)
+
+
+def modal_propagate_tangent(Omega_minus, d_Omega_minus, eigen, d_eigen, d, d_d):
+    """
+    Forward-mode tangent of the propagation through a layer described by its modes.
+
+    `Omega_minus`, of shape (n, m, k) with m = 2k, is propagated through a thickness `d`
+    as in `propagate_elastic_batch` and `propagate_pem_batch`: the first k-1 modes are
+    the ones added to `Omega_plus` and the k-th one is the reference of the
+    exponentials. The derivatives of the inputs along p directions are propagated
+    alongside.
+
+    Parameters
+    ----------
+    Omega_minus : ndarray
+        Stack of `Omega` matrices on the right side of the layer, of shape (n, m, k)
+    d_Omega_minus : ndarray
+        Its derivatives, of shape (p, n, m, k)
+    eigen : tuple
+        `(Phi, Phi_inv, lambda_)`, as returned by the eigen kernel of the layer
+    d_eigen : tuple
+        Derivatives of `Phi`, `Phi_inv` and `lambda_`, with a leading axis of size p (or
+        1 if they are the same along all directions). The derivatives of `Phi_inv` are
+        not used but deduced from the ones of `Phi`, which avoids the round-off errors
+        of the inversion when they are obtained by finite differences.
+    d : float or ndarray
+        Thickness of the layer, scalar or of shape (n,)
+    d_d : ndarray
+        Derivatives of the thickness, of shape (p, n) (or broadcastable to it)
+
+    Returns
+    -------
+    Omega_plus, d_Omega_plus, Xi, d_Xi : ndarray
+        Outputs of the propagation and their derivatives
+    """
+
+    (Phi, Phi_inv, lambda_) = eigen
+    (d_Phi, _, d_lambda) = d_eigen
+    d_Phi_inv = -Phi_inv @ d_Phi @ Phi_inv
+    (n, m, k) = Omega_minus.shape
+    r = k-1
+
+    d_col = np.reshape(d, (-1,1))
+    d_d_col = np.asarray(d_d)[...,np.newaxis]
+    lambda_r = lambda_[:,r:r+1]
+    d_lambda_r = d_lambda[...,r:r+1]
+
+    # derivative of the exponents (lambda_j-lambda_r)*d
+    d_exponents = (d_lambda-d_lambda_r)*d_col + (lambda_-lambda_r)*d_d_col
+
+    Lambda = np.zeros((n,m), dtype=np.complex128)
+    Lambda[:,r] = 1
+    Lambda[:,r+1:] = np.exp((lambda_[:,r+1:]-lambda_r)*d_col)
+    d_Lambda = Lambda*d_exponents
+
+    Phi_Lambda = Phi*Lambda[:,np.newaxis,:]
+    d_Phi_Lambda = d_Phi*Lambda[:,np.newaxis,:] + Phi*d_Lambda[...,np.newaxis,:]
+    alpha_prime = Phi_Lambda @ Phi_inv
+    d_alpha_prime = d_Phi_Lambda @ Phi_inv + Phi_Lambda @ d_Phi_inv
+
+    xi_prime = np.zeros((n,k,k), dtype=np.complex128)
+    xi_prime[:,:r,:] = Phi_inv[:,:r,:] @ Omega_minus
+    xi_prime[:,r,r] = 1
+    d_xi_prime = np.zeros(d_Omega_minus.shape[:-3]+(n,k,k), dtype=np.complex128)
+    d_xi_prime[...,:r,:] = d_Phi_inv[...,:r,:] @ Omega_minus + Phi_inv[:,:r,:] @ d_Omega_minus
+
+    X = np.linalg.inv(xi_prime)
+    d_X = -X @ d_xi_prime @ X
+
+    scaling = np.ones((n,k), dtype=np.complex128)
+    scaling[:,:r] = np.exp((lambda_r-lambda_[:,:r])*d_col)
+    d_scaling = -scaling*d_exponents[...,:k]
+
+    xi_prime_lambda = X*scaling[:,np.newaxis,:]
+    d_xi_prime_lambda = d_X*scaling[...,np.newaxis,:] + X*d_scaling[...,np.newaxis,:]
+
+    Omega_plus = alpha_prime @ Omega_minus @ xi_prime_lambda
+    Omega_plus[:,:,:r] += Phi[:,:,:r]
+    d_Omega_plus = (d_alpha_prime @ Omega_minus + alpha_prime @ d_Omega_minus) @ xi_prime_lambda \
+        + alpha_prime @ Omega_minus @ d_xi_prime_lambda
+    d_Omega_plus[...,:r] += d_Phi[...,:r]
+
+    reference = np.exp(-lambda_r[:,0]*np.reshape(d, (-1,)))
+    d_reference = -reference*(d_lambda_r[...,0]*np.reshape(d, (-1,)) + lambda_r[:,0]*np.asarray(d_d))
+    Xi = xi_prime_lambda*reference[:,np.newaxis,np.newaxis]
+    d_Xi = d_xi_prime_lambda*reference[:,np.newaxis,np.newaxis] \
+        + xi_prime_lambda*d_reference[...,np.newaxis,np.newaxis]
+
+    return (Omega_plus, d_Omega_plus, Xi, d_Xi)
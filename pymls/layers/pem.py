@@ -25,6 +25,8 @@
 import numpy as np
 from numpy.lib.scimath import sqrt
 
+from .modes import modal_sort, modal_profile, modal_propagate_tangent
+
 
 def transfert_pem(Omega_minus, omega, k_x, medium, d):
 
@@ -124,3 +126,143 @@ def transfert_pem(Omega_minus, omega, k_x, medium, d):
     Xi = xi_prime_lambda*np.exp(-lambda_[2]*d)
 
     return (Omega_plus, Xi)
+
+
+def transfert_pem_batch(Omega_minus, omega, k_x, medium, d):
+    """ Stacked version of `transfert_pem`
+
+    `Omega_minus` is of shape (n, 6, 3), `omega` and `k_x` of shape (n,), the
+    frequency dependent attributes of `medium` (a `MediumStack`) are of shape (n,) and
+    `d` is either a scalar or of shape (n,).
+    """
+    return propagate_pem_batch(Omega_minus, eigen_pem_batch(omega, k_x, medium), d)
+
+
+def eigen_pem_batch(omega, k_x, medium, reference=None):
+    """ Thickness-independent part of `transfert_pem_batch`
+
+    Returns the sorted eigenvectors `Phi` of the state matrix, their inverse and the
+    sorted eigenvalues `lambda_`, for each point of the stack. If `reference`, the
+    output of this function at close parameters, is given, the modes are sorted as in
+    it rather than by real parts (see `modal_sort`).
+    """
+
+    n = len(k_x)
+
+    beta_1 = sqrt(medium.delta_1**2-k_x**2)
+    beta_2 = sqrt(medium.delta_2**2-k_x**2)
+    beta_3 = sqrt(medium.delta_3**2-k_x**2)
+    alpha_1 = -1j*medium.A_hat*medium.delta_1**2 - 2j*medium.N*beta_1**2
+    alpha_2 = -1j*medium.A_hat*medium.delta_2**2 - 2j*medium.N*beta_2**2
+    alpha_3 = 2j*medium.N*beta_3*k_x
+
+    Phi_0 = np.zeros((n,6,6), dtype=np.complex128)
+    Phi_0[:,0,0] = -2j*medium.N*beta_1*k_x
+    Phi_0[:,0,1] = 2j*medium.N*beta_1*k_x
+    Phi_0[:,0,2] = -2j*medium.N*beta_2*k_x
+    Phi_0[:,0,3] = 2j*medium.N*beta_2*k_x
+    Phi_0[:,0,4] = 1j*medium.N*(beta_3**2-k_x**2)
+    Phi_0[:,0,5] = 1j*medium.N*(beta_3**2-k_x**2)
+
+    Phi_0[:,1,0] = beta_1
+    Phi_0[:,1,1] = -beta_1
+    Phi_0[:,1,2] = beta_2
+    Phi_0[:,1,3] = -beta_2
+    Phi_0[:,1,4] = k_x
+    Phi_0[:,1,5] = k_x
+
+    Phi_0[:,2,0] = medium.mu_1*beta_1
+    Phi_0[:,2,1] = -medium.mu_1*beta_1
+    Phi_0[:,2,2] = medium.mu_2*beta_2
+    Phi_0[:,2,3] = -medium.mu_2*beta_2
+    Phi_0[:,2,4] = medium.mu_3*k_x
+    Phi_0[:,2,5] = medium.mu_3*k_x
+
+    Phi_0[:,3,0] = alpha_1
+    Phi_0[:,3,1] = alpha_1
+    Phi_0[:,3,2] = alpha_2
+    Phi_0[:,3,3] = alpha_2
+    Phi_0[:,3,4] = -alpha_3
+    Phi_0[:,3,5] = alpha_3
+
+    Phi_0[:,4,0] = 1j*medium.delta_1**2*medium.K_eq_til*medium.mu_1
+    Phi_0[:,4,1] = 1j*medium.delta_1**2*medium.K_eq_til*medium.mu_1
+    Phi_0[:,4,2] = 1j*medium.delta_2**2*medium.K_eq_til*medium.mu_2
+    Phi_0[:,4,3] = 1j*medium.delta_2**2*medium.K_eq_til*medium.mu_2
+
+    Phi_0[:,5,0] = k_x
+    Phi_0[:,5,1] = k_x
+    Phi_0[:,5,2] = k_x
+    Phi_0[:,5,3] = k_x
+    Phi_0[:,5,4] = -beta_3
+    Phi_0[:,5,5] = beta_3
+
+    V_0 = np.stack([
+        1j*beta_1,
+        -1j*beta_1,
+        1j*beta_2,
+        -1j*beta_2,
+        1j*beta_3,
+        -1j*beta_3
+    ], axis=-1)
+
+    # reverse sort, point by point
+    index = modal_sort(V_0, None if reference is None else reference[2])
+
+    # sorted versions
+    Phi = np.take_along_axis(Phi_0, index[:,np.newaxis,:], axis=2)
+    lambda_ = np.take_along_axis(V_0, index, axis=1)
+
+    Phi_inv = np.linalg.inv(Phi)
+
+    return (Phi, Phi_inv, lambda_)
+
+
+def propagate_pem_batch(Omega_minus, eigen, d):
+    """ Propagates `Omega_minus` through a thickness `d` given the output of `eigen_pem_batch` """
+
+    (Phi, Phi_inv, lambda_) = eigen
+    n = len(lambda_)
+
+    Lambda = np.stack([
+        np.zeros(n),
+        np.zeros(n),
+        np.ones(n),
+        np.exp((lambda_[:,3]-lambda_[:,2])*d),
+        np.exp((lambda_[:,4]-lambda_[:,2])*d),
+        np.exp((lambda_[:,5]-lambda_[:,2])*d)
+    ], axis=-1)
+
+    # Phi.diag(Lambda).Phi_inv, the diagonal product being a column scaling
+    alpha_prime = (Phi*Lambda[:,np.newaxis,:]) @ Phi_inv
+
+    xi_prime = np.zeros((n,3,3), dtype=np.complex128)
+    xi_prime[:,:2,:] = Phi_inv[:,:2,:] @ Omega_minus
+    xi_prime[:,2,2] = 1
+    xi_prime_lambda = np.linalg.inv(xi_prime)*np.stack([
+        np.exp((lambda_[:,2]-lambda_[:,0])*d),
+        np.exp((lambda_[:,2]-lambda_[:,1])*d),
+        np.ones(n)
+    ], axis=-1)[:,np.newaxis,:]
+
+    Omega_plus = alpha_prime @ Omega_minus @ xi_prime_lambda
+    Omega_plus[:,:,:2] += Phi[:,:,:2]
+
+    # eq. 24
+    Xi = xi_prime_lambda*np.exp(-lambda_[:,2]*d)[:,np.newaxis,np.newaxis]
+
+    return (Omega_plus, Xi)
+
+
+def propagate_pem_tangent(Omega_minus, d_Omega_minus, eigen, d_eigen, d, d_d):
+    """ Forward-mode tangent of `propagate_pem_batch`, see `modal_propagate_tangent` """
+
+    return modal_propagate_tangent(Omega_minus, d_Omega_minus, eigen, d_eigen, d, d_d)
+
+
+def profile_pem_batch(eigen, S_left, S_right, d, z):
+    """ State vectors at depths `z` given the output of `eigen_pem_batch`, see `modal_profile` """
+
+    (Phi, Phi_inv, lambda_) = eigen
+
+    return modal_profile(Phi, Phi_inv, lambda_, S_left, S_right, d, z)
@@ -51,3 +51,84 @@ def transfert_screen(Omega_minus, omega, k_x, m, d):
     Xi = np.eye(3)
 
     return (Omega_plus, Xi)
+
+
+def transfert_screen_batch(Omega_minus, omega, k_x, m, d):
+    """ Stacked version of `transfert_screen`
+
+    `Omega_minus` is of shape (n, 6, 3), `omega` and `k_x` of shape (n,), the
+    frequency dependent attributes of `m` (a `MediumStack`) are of shape (n,) and
+    `d` is either a scalar or of shape (n,).
+    """
+    return propagate_screen_batch(Omega_minus, eigen_screen_batch(omega, k_x, m), d)
+
+
+def eigen_screen_batch(omega, k_x, m, reference=None):
+    """ Thickness-independent part of `transfert_screen_batch`
+
+    The screen is not diagonalised, only its (simplified) state matrix `alpha` is
+    returned, for each point of the stack. `reference` is unused (see
+    `eigen_elastic_batch`).
+    """
+
+    n = len(k_x)
+
+    alpha = np.zeros((n,6,6), dtype=np.complex128)
+    alpha[:,0,5] = -(m.A_hat**2-m.P_hat**2)/m.P_hat*k_x**2-m.rho_til*omega**2
+    alpha[:,2,4] = -1/m.K_eq_til+k_x**2/(m.rho_eq_til*omega**2)
+    alpha[:,3,1] = -m.rho_s_til*omega**2
+    alpha[:,3,2] = -m.rho_eq_til*m.gamma_til*omega**2
+    alpha[:,4,1] = m.rho_eq_til*m.gamma_til*omega**2
+    alpha[:,4,2] = m.rho_eq_til*omega**2
+
+    return (alpha,)
+
+
+def propagate_screen_batch(Omega_minus, eigen, d):
+    """ Propagates `Omega_minus` through a thickness `d` given the output of `eigen_screen_batch` """
+
+    (alpha,) = eigen
+    n = len(alpha)
+
+    T = np.eye(6) - np.reshape(d, (-1,1,1))*alpha
+
+    Omega_plus = T @ Omega_minus
+    Xi = np.tile(np.eye(3), (n,1,1))
+
+    return (Omega_plus, Xi)
+
+
+def propagate_screen_tangent(Omega_minus, d_Omega_minus, eigen, d_eigen, d, d_d):
+    """ Forward-mode tangent of `propagate_screen_batch`
+
+    See `pymls.layers.modes.modal_propagate_tangent` for the layout of the derivatives.
+    """
+
+    (alpha,) = eigen
+    (d_alpha,) = d_eigen
+
+    (Omega_plus, Xi) = propagate_screen_batch(Omega_minus, eigen, d)
+
+    T = np.eye(6) - np.reshape(d, (-1,1,1))*alpha
+    d_T = -np.asarray(d_d)[...,np.newaxis,np.newaxis]*alpha - np.reshape(d, (-1,1,1))*d_alpha
+    d_Omega_plus = d_T @ Omega_minus + T @ d_Omega_minus
+
+    return (Omega_plus, d_Omega_plus, Xi, 0)
+
+
+def profile_screen_batch(eigen, S_left, S_right, d, z):
+    """ State vectors at depths `z` given the output of `eigen_screen_batch`
+
+    The transfer through the screen being linear in its thickness, the state vector at
+    a depth `z` is obtained from `S_right` through the remaining thickness `d-z`.
+    `S_left` and `S_right` are of shape (n, 6), `z` of shape (n_z,) and the result of
+    shape (n, n_z, 6).
+    """
+
+    (alpha,) = eigen
+
+    if S_right is None:
+        S_right = np.linalg.solve(np.eye(6) - np.reshape(d, (-1,1,1))*alpha, S_left[:,:,np.newaxis])[:,:,0]
+
+    remaining = np.reshape(d, (-1,1,1)) - np.reshape(z, (1,-1,1))
+    return S_right[:,np.newaxis,:] - remaining*np.einsum('nij,nj->ni', alpha, S_right)[:,np.newaxis,:]
@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# stack.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+import numbers
+
+import numpy as np
+
+
+class MediumStack(object):
+    """
+    State of a medium evaluated on a stack of analysis points.
+
+    Numeric attributes populated by the medium's `update_frequency` are stored as arrays
+    whose first axis runs over the stack. Any other attribute (`MODEL`, `MEDIUM_TYPE`,
+    class constants, ...) is looked up on the wrapped medium, and properties of the
+    medium's class are evaluated against the stacked values.
+
+    Parameters
+    ----------
+    medium : Medium
+        Medium the state has been computed from
+    values : dict
+        Maps attribute names to arrays of values (one per point)
+    """
+
+    def __init__(self, medium, values):
+        self.medium = medium
+        self.values = values
+
+    @classmethod
+    def from_snapshots(cls, medium, snapshots):
+        """ Builds a stack from a list of per-point snapshots (see `snapshot`) """
+        names = set.intersection(*[set(_.keys()) for _ in snapshots])
+        return cls(medium, {k: np.array([_[k] for _ in snapshots]) for k in names})
+
+    @staticmethod
+    def snapshot(medium):
+        """ Returns all the numeric attributes of `medium` in a dict """
+        return {k: v for k, v in vars(medium).items() if isinstance(v, numbers.Number)}
+
+    def __getattr__(self, name):
+        if name in ('medium', 'values'):
+            raise AttributeError(name)
+        try:
+            return self.values[name]
+        except KeyError:
+            pass
+        attr = getattr(type(self.medium), name, None)
+        if isinstance(attr, property):
+            return attr.fget(self)
+        return getattr(self.medium, name)
+
+    def __len__(self):
+        return len(next(iter(self.values.values())))
+
+    def take(self, indices):
+        """ Returns a new stack made of the points `indices` of this one """
+        return self.__class__(self.medium, {k: v[indices] for k, v in self.values.items()})
+
+    def at(self, index):
+        """ Returns the state of the medium for one point of the stack """
+        return self.__class__(self.medium, {k: v[index] for k, v in self.values.items()})
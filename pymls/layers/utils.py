@@ -22,10 +22,14 @@
 # copies or substantial portions of the Software.
 #
 
-from .fluid import transfert_fluid
-from .elastic import transfert_elastic
-from .pem import transfert_pem
-from .screen import transfert_screen
+from .fluid import transfert_fluid, transfert_fluid_batch, eigen_fluid_batch, propagate_fluid_batch, \
+    profile_fluid_batch, propagate_fluid_tangent
+from .elastic import transfert_elastic, transfert_elastic_batch, eigen_elastic_batch, propagate_elastic_batch, \
+    profile_elastic_batch, propagate_elastic_tangent
+from .pem import transfert_pem, transfert_pem_batch, eigen_pem_batch, propagate_pem_batch, \
+    profile_pem_batch, propagate_pem_tangent
+from .screen import transfert_screen, transfert_screen_batch, eigen_screen_batch, propagate_screen_batch, \
+    profile_screen_batch, propagate_screen_tangent
 
 
 def generic_layer(medium):
@@ -39,3 +43,72 @@ def generic_layer(medium):
         return transfert_elastic
     else:
         raise ValueError('Unknown MODEL for propagation in medium')
+
+
+def generic_layer_batch(medium):
+    """
+    Returns a callable propagating a stack of `Omega` matrices through a layer of
+    `medium`.
+
+    The callable has the same signature as the single-point transfer functions but
+    expects `Omega_minus` of shape (n, m, k), `omega` and `k_x` of shape (n,), a
+    `MediumStack` and a thickness that is either a scalar or of shape (n,).
+    """
+    return batch_kernels(medium)[0]
+
+
+def generic_eigen_batch(medium):
+    """
+    Returns the two halves of `generic_layer_batch(medium)` as a couple of callables.
+
+    The first one, `eigen(omega, k_x, medium, reference=None)`, computes all the
+    thickness-independent data of the layer, with its modes sorted as in `reference`
+    if given. The second one, `propagate(Omega_minus, eigen_data, d)`, uses it
+    to propagate `Omega_minus` through a thickness `d`.
+    """
+    return batch_kernels(medium)[1:3]
+
+
+def generic_profile_batch(medium):
+    """
+    Returns a callable giving the state vectors inside a layer of `medium`.
+
+    The callable, `profile(eigen_data, S_left, S_right, d, z)`, uses the output of the
+    eigen callable of `generic_eigen_batch` and the state vectors on both sides of the
+    layer (of shape (n, m)) to compute the state vectors at the depths `z` (of shape
+    (n_z,), measured from the left side of the layer), as an array of shape
+    (n, n_z, m).
+    """
+    return batch_kernels(medium)[3]
+
+
+def generic_tangent_batch(medium):
+    """
+    Returns a callable giving the forward-mode tangent of the propagation through a
+    layer of `medium`.
+
+    The callable, `tangent(Omega_minus, d_Omega_minus, eigen_data, d_eigen_data, d,
+    d_d)`, takes the inputs of the propagate callable of `generic_eigen_batch` and their
+    derivatives along p directions (with a leading axis of size p) and returns
+    `(Omega_plus, d_Omega_plus, Xi, d_Xi)`, see
+    `pymls.layers.modes.modal_propagate_tangent`.
+    """
+    return batch_kernels(medium)[4]
+
+
+def batch_kernels(medium):
+    """ Returns the (transfert, eigen, propagate, profile, tangent) stacked kernels for `medium` """
+    if medium.MODEL == 'fluid':
+        return (transfert_fluid_batch, eigen_fluid_batch, propagate_fluid_batch, profile_fluid_batch,
+                propagate_fluid_tangent)
+    elif medium.MODEL == 'pem' and medium.MEDIUM_TYPE == 'screen':
+        return (transfert_screen_batch, eigen_screen_batch, propagate_screen_batch, profile_screen_batch,
+                propagate_screen_tangent)
+    elif medium.MODEL == 'pem':
+        return (transfert_pem_batch, eigen_pem_batch, propagate_pem_batch, profile_pem_batch,
+                propagate_pem_tangent)
+    elif medium.MODEL == 'elastic':
+        return (transfert_elastic_batch, eigen_elastic_batch, propagate_elastic_batch, profile_elastic_batch,
+                propagate_elastic_tangent)
+    else:
+        raise ValueError('Unknown MODEL for propagation in medium')
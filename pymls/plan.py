@@ -0,0 +1,176 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# plan.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+from collections import namedtuple
+
+from pymls.interface.utils import generic_interface, rigid_interface, \
+    generic_interface_batch, rigid_interface_batch, generic_interface_tangent, rigid_interface_tangent
+from pymls.layers import generic_layer, generic_eigen_batch, generic_profile_batch, generic_tangent_batch, \
+    StochasticLayer
+import pymls.backing as backing
+from mediapack import Air
+
+
+# Size of the state vector in each model
+STATE_SIZES = {
+    'fluid': 2,
+    'elastic': 4,
+    'pem': 6,
+}
+
+
+class Step(namedtuple('Step', [
+    'layer',  # index of the layer in the system
+    'size',  # size of the state vector in the layer
+    'interface',  # interface on the right of the layer (None if transparent)
+    'interface_batch',  # stacked counterpart of `interface`
+    'interface_tangent',  # forward-mode tangent of `interface_batch`
+    'tau_size',  # size of the identity replacing a transparent interface
+    'transfer',  # transfer function through the layer
+    'eigen_batch',  # thickness-independent half of the stacked transfer function
+    'propagate_batch',  # thickness-dependent half of the stacked transfer function
+    'profile_batch',  # state vectors inside the layer, see `generic_profile_batch`
+    'propagate_tangent',  # forward-mode tangent of `propagate_batch`
+    'transparent',  # True if the layer is identical to the transmission medium, None if unknown
+])):
+    """ Interface and transfer through one layer, see `compile_plan` """
+    __slots__ = ()
+
+    def is_transparent(self, medium):
+        """ True if the layer, of current medium `medium`, is identical to the transmission medium
+
+        Unless known at compilation, the check is done on each point of `medium` if it
+        is a `MediumStack`, giving a boolean array.
+        """
+        if self.transparent is None:
+            if medium.MODEL != 'fluid':
+                return False
+            return (medium.c == Air.c) & (medium.rho == Air.rho)
+        return self.transparent
+
+
+class Plan(namedtuple('Plan', [
+    'backing',  # backing function
+    'transmission',  # True for a transmission backing
+    'steps',  # Step of each layer, from the last layer to the first one
+    'interface',  # interface between air and the first layer (None if transparent)
+    'interface_batch',  # stacked counterpart of `interface`
+    'interface_tangent',  # forward-mode tangent of `interface_batch`
+    'tau_size',  # size of the identity replacing a transparent first interface
+])):
+    """ Immutable sequence of the operations solving a system, see `compile_plan` """
+    __slots__ = ()
+
+    def step(self, layer):
+        """ Returns the step of the layer of index `layer` """
+        return self.steps[len(self.steps)-1-layer]
+
+
+def compile_plan(layers, backing_func, varied=()):
+    """
+    Resolves once the interface and transfer functions of a system.
+
+    None of them depend on the frequency, the angle or the draw: the plan can be
+    reused for all the points of the analyses and shipped to workers (it only refers
+    to the layers by their index and holds module-level functions).
+
+    Whether the last layer is identical to the transmission medium is decided once,
+    unless its medium may change during the analysis: drawn by a stochastic layer,
+    frequency-dependent or listed in `varied`. It is then checked by the solver on each
+    point of the stacked medium (see `Step.is_transparent`), or on the current medium
+    by the single-point engine.
+
+    Parameters
+    ----------
+    layers : list of Layer/StochasticLayer instances
+        The right most layer appears last in the list.
+    backing_func : function reference from `pymls.backing`
+    varied : iterable of int
+        Indices of the layers whose medium parameters are changed after compilation
+        (joint draws, perturbations)
+
+    Returns
+    -------
+    plan : Plan
+    """
+    transmission = backing_func == backing.transmission
+
+    steps = []
+    for i_L in reversed(range(len(layers))):
+        medium = layers[i_L].medium
+
+        transparent = False
+        if i_L == len(layers)-1:  # right-most layer
+            if transmission:
+                interface = generic_interface(medium, Air)
+                interface_batch = generic_interface_batch(medium, Air)
+                interface_tangent = generic_interface_tangent(medium, Air)
+                # check if the last layer is identical to the transmission medium, which
+                # is left to each point for drawn or frequency-dependent media
+                drawn = i_L in varied or (
+                    isinstance(layers[i_L], StochasticLayer) and layers[i_L].stochastic_param != 'thickness')
+                if medium.MODEL != 'fluid':
+                    transparent = False
+                elif drawn or medium.MEDIUM_TYPE != 'fluid':
+                    transparent = None
+                else:
+                    transparent = medium.c == Air.c and medium.rho == Air.rho
+                tau_size = STATE_SIZES['fluid']//2
+            else:
+                interface = rigid_interface(medium)
+                interface_batch = rigid_interface_batch(medium)
+                interface_tangent = rigid_interface_tangent(medium)
+                tau_size = STATE_SIZES[medium.MODEL]//2
+        else:
+            medium_right = layers[i_L+1].medium
+            interface = generic_interface(medium, medium_right)
+            interface_batch = generic_interface_batch(medium, medium_right)
+            interface_tangent = generic_interface_tangent(medium, medium_right)
+            tau_size = STATE_SIZES[medium_right.MODEL]//2
+
+        (eigen_batch, propagate_batch) = generic_eigen_batch(medium)
+        steps.append(Step(
+            layer=i_L,
+            size=STATE_SIZES[medium.MODEL],
+            interface=interface,
+            interface_batch=interface_batch,
+            interface_tangent=interface_tangent,
+            tau_size=tau_size,
+            transfer=generic_layer(medium),
+            eigen_batch=eigen_batch,
+            propagate_batch=propagate_batch,
+            profile_batch=generic_profile_batch(medium),
+            propagate_tangent=generic_tangent_batch(medium),
+            transparent=transparent,
+        ))
+
+    return Plan(
+        backing=backing_func,
+        transmission=transmission,
+        steps=tuple(steps),
+        interface=generic_interface(Air, layers[0].medium),
+        interface_batch=generic_interface_batch(Air, layers[0].medium),
+        interface_tangent=generic_interface_tangent(Air, layers[0].medium),
+        tau_size=STATE_SIZES[layers[0].medium.MODEL]//2,
+    )
@@ -0,0 +1,434 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# result.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class ResultSet(Mapping):
+    """
+    Results of an analysis stored in preallocated arrays.
+
+    Coefficients are stored as complex128 arrays with one axis per dimension of the
+    analysis (see `axes`): frequencies, angles and, for stochastic analyses, draws.
+
+    For backward compatibility, the result also behaves as the dict previously
+    returned by `Solver.solve`: `result['R']` and `result['T']` give the coefficients
+    with the frequency and angle axes flattened in the order of `Analysis.__iter__`
+    (one row per point and, for stochastic analyses, one column per draw).
+
+    Parameters
+    ----------
+
+    name : str
+        Name of the analysis
+    freqs : ndarray
+        Frequencies of the analysis
+    angles : ndarray
+        Angles of incidence of the analysis
+    n_draws : int, optional
+        Number of draws, for stochastic analyses only
+    transmission : bool
+        Whether transmission coefficients are computed
+    stochastics : dict, optional
+        Stochastic layer (`layer`), parameter (`param`) and drawn `values`, or drawn
+        `parameters` for joint draws (see `pymls.utils.solve_joint`)
+    memmap : str, optional
+        If given, the arrays are memory-mapped to `.npy` files whose paths start with
+        `memmap` (for instance `memmap + 'R.npy'`), so that results larger than the
+        memory can be stored. Derived quantities are then computed one frequency at a
+        time into memory-mapped files as well.
+
+    Attributes
+    ----------
+
+    axes : tuple of str
+        Names of the axes of the coefficient arrays
+    shape : tuple of int
+        Shape of the coefficient arrays
+    R : ndarray
+        Reflection coefficients
+    T : ndarray or None
+        Transmission coefficients (None for a rigid backing)
+    alpha : ndarray
+        Absorption coefficients, computed on first access
+    TL : ndarray or None
+        Transmission loss, computed on first access
+    """
+
+    @classmethod
+    def for_chunk(cls, chunk, memmap=None):
+        """ Allocates the result of the analysis `chunk` (a `ResultChunk`) belongs to """
+        stochastics = None
+        if chunk.stochastics is not None:
+            stochastics = dict(chunk.stochastics, values=[None]*chunk.n_draws)
+        return cls(
+            chunk.analysis.name,
+            chunk.analysis.freqs,
+            chunk.analysis.angles,
+            n_draws=chunk.n_draws,
+            transmission=chunk.T is not None,
+            stochastics=stochastics,
+            memmap=memmap
+        )
+
+    def __init__(self, name, freqs, angles, n_draws=None, transmission=True, stochastics=None,
+                 memmap=None):
+        self.name = name
+        self.f = freqs
+        self.angle = angles
+        self.stochastics = stochastics
+        self.enable_stochastic = n_draws is not None
+        self.memmap = memmap
+
+        if self.enable_stochastic:
+            self.axes = ('f', 'angle', 'draw')
+            self.shape = (len(freqs), len(angles), n_draws)
+        else:
+            self.axes = ('f', 'angle')
+            self.shape = (len(freqs), len(angles))
+
+        self.R = self.__allocate('R', np.complex128)
+        self.T = self.__allocate('T', np.complex128) if transmission else None
+        self.__derived = {}
+
+    def __allocate(self, key, dtype):
+        """ Returns a zeroed array for `key`, memory-mapped if `memmap` is set """
+        if self.memmap is None:
+            return np.zeros(self.shape, dtype=dtype)
+        return np.lib.format.open_memmap(
+            '{}{}.npy'.format(self.memmap, key), mode='w+', dtype=dtype, shape=self.shape)
+
+    @property
+    def n_points(self):
+        """ Number of (frequency, angle) points """
+        return self.shape[0]*self.shape[1]
+
+    def flat(self, key):
+        """ Returns the coefficients `key` with the frequency and angle axes flattened
+
+        The returned array is a view: writing into it fills the result.
+        """
+        values = getattr(self, key)
+        if values is None:
+            # no transmission through a rigid backing
+            shape = (self.n_points, 0) if self.enable_stochastic else (0,)
+            return np.zeros(shape, dtype=np.complex128)
+        return values.reshape((self.n_points,)+self.shape[2:])
+
+    def store(self, R, T=None, points=slice(None), draws=slice(None)):
+        """ Stores coefficients given per point (and per draw for stochastic analyses)
+
+        Parameters
+        ----------
+        R, T : ndarray
+            Coefficients, of shape (n_points,) or (n_points, n_draws)
+        points : slice
+            Points (in the order of `Analysis.__iter__`) the coefficients refer to
+        draws : slice
+            Draws the coefficients refer to, for stochastic analyses
+        """
+        index = (points, draws) if self.enable_stochastic else points
+        self.flat('R')[index] = R
+        if self.T is not None:
+            self.flat('T')[index] = T
+        self.__derived.clear()
+
+    def add(self, chunk):
+        """ Stores the coefficients and drawn values of a `ResultChunk` """
+        if chunk.result is self:
+            # already written by the solver
+            return
+        if chunk.draws is None:
+            self.store(chunk.R, chunk.T, points=chunk.points)
+        else:
+            self.store(chunk.R, chunk.T, points=chunk.points, draws=chunk.draws)
+            self.stochastics['values'][chunk.draws] = chunk.stochastics['values']
+
+    @property
+    def alpha(self):
+        """ Absorption coefficients, see `pymls.utils.alpha_from_R` """
+        # imported here as pymls.utils depends on the solver
+        from pymls.utils.indicators import alpha_from_R
+        return self.__derive('alpha', alpha_from_R, self.R)
+
+    @property
+    def TL(self):
+        """ Transmission loss, see `pymls.utils.TL_from_T` """
+        if self.T is None:
+            return None
+        from pymls.utils.indicators import TL_from_T
+        return self.__derive('TL', TL_from_T, self.T)
+
+    def __derive(self, key, func, values):
+        """ Computes (on first access) the quantity `key` as `func(values)` """
+        if key not in self.__derived:
+            if self.memmap is None:
+                self.__derived[key] = func(values)
+            else:
+                derived = self.__allocate(key, np.float64)
+                for i_f in range(self.shape[0]):
+                    derived[i_f] = func(values[i_f])
+                self.__derived[key] = derived
+        return self.__derived[key]
+
+    def flush(self):
+        """ Writes memory-mapped arrays to disk (no-op for in-memory results) """
+        for values in [self.R, self.T]+list(self.__derived.values()):
+            if isinstance(values, np.memmap):
+                values.flush()
+
+    def __keys(self):
+        keys = ['name', 'enable_stochastic', 'f', 'angle', 'R', 'T']
+        if self.enable_stochastic:
+            keys.insert(2, 'stochastics')
+        return keys
+
+    def __getitem__(self, key):
+        if key not in self.__keys():
+            raise KeyError(key)
+        if key in ['R', 'T']:
+            return self.flat(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.__keys())
+
+    def __len__(self):
+        return len(self.__keys())
+
+    def as_dict(self):
+        """ Returns the results as a plain dict (see the class documentation) """
+        return dict(self)
+
+    def __repr__(self):
+        return '<ResultSet {!r} {}>'.format(
+            self.name,
+            ', '.join('{}: {}'.format(*_) for _ in zip(self.axes, self.shape))
+        )
+
+
+class ResultChunk(object):
+    """
+    Block of results yielded by `Solver.iter_solve`.
+
+    A chunk holds either a block of contiguous frequencies (with all their angles) of
+    a deterministic analysis, or a block of contiguous draws (with all the points) of a
+    stochastic analysis.
+
+    Attributes
+    ----------
+
+    index : int
+        Position of the result the chunk belongs to in the resultset
+    analysis : Analysis
+        Analysis the chunk belongs to
+    points : slice
+        Points covered by the chunk, in the order of `Analysis.__iter__`
+    draws : slice or None
+        Draws covered by the chunk, for stochastic analyses
+    f : ndarray
+        Frequencies covered by the chunk
+    angle : ndarray
+        Angles covered by the chunk
+    stochastics : dict or None
+        Stochastic layer (`layer`), parameter (`param`) and the `values` drawn in the
+        chunk
+    n_draws : int or None
+        Total number of draws of the analysis
+    result : ResultSet or None
+        Result already holding the coefficients of the chunk, `R` and `T` being views
+        into its arrays (memory-mapped runs, see `Solver.solve`)
+    R : ndarray
+        Reflection coefficients, of shape (n_points,) or (n_points, n_draws)
+    T : ndarray or None
+        Transmission coefficients (None for a rigid backing)
+    """
+
+    def __init__(self, index, analysis, R, T, points, draws=None, stochastics=None, n_draws=None,
+                 result=None):
+        self.index = index
+        self.analysis = analysis
+        self.R = R
+        self.T = T
+        self.points = points
+        self.draws = draws
+        self.stochastics = stochastics
+        self.n_draws = n_draws
+        self.result = result
+
+        n_angles = len(analysis.angles)
+        self.f = analysis.freqs[points.start//n_angles:-(-points.stop//n_angles)]
+        self.angle = analysis.angles
+
+    def __repr__(self):
+        return '<ResultChunk {} of {!r}: points {}:{}{}>'.format(
+            self.index,
+            self.analysis.name,
+            self.points.start,
+            self.points.stop,
+            '' if self.draws is None else ', draws {}:{}'.format(self.draws.start, self.draws.stop)
+        )
+
+
+class DiffuseResult(object):
+    """
+    Diffuse-field indicators of an analysis, see `pymls.utils.solve_diffuse`.
+
+    Attributes
+    ----------
+
+    name : str
+        Name of the analysis
+    f : ndarray
+        Frequencies of the analysis
+    theta_max : float
+        Limiting angle of the integration, in degrees
+    alpha : ndarray
+        Diffuse-field absorption coefficient at each frequency
+    tau : ndarray or None
+        Diffuse-field transmission coefficient (in energy) at each frequency, None for a
+        rigid backing
+    TL : ndarray or None
+        Diffuse-field transmission loss at each frequency
+    n_points : int
+        Number of (frequency, angle) points solved
+    """
+
+    def __init__(self, name, freqs, theta_max, alpha, tau, n_points):
+        self.name = name
+        self.f = freqs
+        self.theta_max = theta_max
+        self.alpha = alpha
+        self.tau = tau
+        self.n_points = n_points
+
+    @property
+    def TL(self):
+        if self.tau is None:
+            return None
+        return -10*np.log10(self.tau)
+
+    def __repr__(self):
+        return '<DiffuseResult {!r} f: {}, theta_max: {}>'.format(self.name, len(self.f), self.theta_max)
+
+
+class SensitivityResult(object):
+    """
+    Derivatives of the results of an analysis with respect to parameters of the system,
+    see `pymls.utils.solve_sensitivities`.
+
+    Attributes
+    ----------
+
+    result : ResultSet
+        Coefficients the derivatives refer to
+    parameters : list of tuple
+        `(layer_id, param)` couples the derivatives are taken with respect to
+    axes : tuple of str
+        Names of the axes of the derivative arrays
+    R : ndarray
+        Derivatives of the reflection coefficients, of shape (n_freq, n_angle,
+        n_parameters)
+    T : ndarray or None
+        Derivatives of the transmission coefficients (None for a rigid backing)
+    alpha : ndarray
+        Derivatives of the absorption coefficients
+    TL : ndarray or None
+        Derivatives of the transmission loss, in dB per unit of the parameters
+    """
+
+    def __init__(self, result, parameters, R, T):
+        self.result = result
+        self.parameters = parameters
+        self.axes = ('f', 'angle', 'parameter')
+        self.R = R
+        self.T = T
+
+    @property
+    def alpha(self):
+        return -2*np.real(np.conj(self.result.R)[..., np.newaxis]*self.R)
+
+    @property
+    def TL(self):
+        if self.T is None:
+            return None
+        return -20/np.log(10)*np.real(self.T/self.result.T[..., np.newaxis])
+
+    def __repr__(self):
+        return '<SensitivityResult {!r}: {} parameters>'.format(self.result.name, len(self.parameters))
+
+
+class OptimizationResult(object):
+    """
+    Optimal thicknesses of the layers of a system, see `pymls.utils.optimize_thicknesses`.
+
+    Attributes
+    ----------
+
+    target : str
+        Quantity maximized, `'alpha'` or `'TL'`
+    f : ndarray
+        Frequencies of the band
+    angles : ndarray
+        Angles of incidence the target is averaged over, in degrees
+    layers : list of int
+        Indices of the layers whose thickness is optimized
+    thicknesses : list of float
+        Thickness of every layer of the system at the optimum
+    objective : float
+        Band average of the target at the optimum (TL in dB)
+    gradient : ndarray
+        Derivatives of `objective` with respect to the thicknesses of `layers`
+    mass : float or None
+        Mass per unit area of the system at the optimum, if a budget was given
+    success : bool
+        Whether the optimizer converged
+    message : str
+        Message of the optimizer
+    n_iterations : int
+        Number of iterations of the optimizer
+    n_evaluations : int
+        Number of evaluations of the system
+    """
+
+    def __init__(self, target, freqs, angles, layers, thicknesses, objective, gradient, mass, success,
+                 message, n_iterations, n_evaluations):
+        self.target = target
+        self.f = freqs
+        self.angles = angles
+        self.layers = layers
+        self.thicknesses = thicknesses
+        self.objective = objective
+        self.gradient = gradient
+        self.mass = mass
+        self.success = success
+        self.message = message
+        self.n_iterations = n_iterations
+        self.n_evaluations = n_evaluations
+
+    def __repr__(self):
+        return '<OptimizationResult {}: {:.6g}, {} layers, {} evaluations>'.format(
+            self.target, self.objective, len(self.layers), self.n_evaluations)
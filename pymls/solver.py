@@ -22,16 +22,32 @@
 # copies or substantial portions of the Software.
 #
 
+import copy
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import numpy as np
 from numpy.lib.scimath import sqrt
 
 from pymls.analysis import Analysis
-from pymls.interface.utils import generic_interface, rigid_interface
-from pymls.layers import generic_layer, StochasticLayer
+from pymls.result import ResultSet, ResultChunk
+from pymls.layers import StochasticLayer
+from pymls.plan import compile_plan
 import pymls.backing as backing
 from mediapack import Air
 
 
+# Default bound on the number of (point, draw) couples stacked together when the
+# draws are pushed through the vectorized engine
+CHUNK_POINTS = 2**14
+
+EXECUTORS = {
+    'process': ProcessPoolExecutor,
+    'thread': ThreadPoolExecutor,
+}
+
+
 class IncompleteDefinitionError(Exception):
     """
     Exception raised when attempting to solve an incomplete system
@@ -69,16 +85,44 @@ class Solver(object):
     layers : list of Layer/StochasticLayer instances
     backing : function reference from `pymls.backing`
     analyses : list of Analysis instances, optional
-    resultset : list of dict
+    resultset : list of ResultSet
         Contains the results for all analysis and metadata
 
     Methods
     -------
 
-    solve(frequencies, angles, n_draws, prng_state) : list of dict
+    solve(frequencies, angles, n_draws, prng_state, vectorized, chunk_size, block_size, workers, seed, executor, memmap) : list of ResultSet
         Starts the solving process w/w stochastic parameters.
+    iter_solve(frequencies, angles, n_draws, prng_state, vectorized, chunk_size, block_size, workers, seed, executor, memmap) : generator of ResultChunk
+        Same as `solve` but yields the results by chunks as they are computed.
+    stop(index)
+        Stops the stochastic analysis giving the result of index `index`.
     check_is_complete() : bool
         Check that all required data has been provided and gathers media.
+    compile(varied) : Plan
+        Resolves the interface and transfer functions of the system once.
+    solve_adaptive(frequencies, angles, tol, tol_TL, max_points, min_step) : ResultSet
+        Solves a deterministic analysis on an adaptively refined frequency grid.
+    solve_fields(frequencies, angles, block_size) : ResultSet, list of ndarray
+        Solves a deterministic analysis and gives the state vectors in all the layers.
+    solve_profiles(frequencies, depths, angles, block_size) : ResultSet, list of couples
+        Solves a deterministic analysis and gives the state vectors at given depths.
+    compute_fields(layer_id, frequency, theta_inc) : ndarray
+        Returns the state vector on the left side of a layer.
+
+    The analyses built on top of the solver (diffuse field, polynomial chaos, streaming
+    statistics, joint draws, sensitivities and optimization) are functions of
+    `pymls.utils` taking a `Solver`. They rely on the following kernels:
+
+    _solve_batch(frequencies, thetas_inc)
+        Reflection and transmission coefficients of a stack of points.
+    _solve_draw_chunks(a, l_id, chunks), _solve_joint_chunks(a, parameters, chunks)
+        Results of chunks of draws, the recursion behind the drawn layers being
+        computed once.
+    _stack_layers(frequencies, thetas_inc), _stack_tangents(omega, k_x, states, parameters, step)
+        States of the layers on a stack of points, and their derivatives.
+    _tangent_recursion_batch(omega, k_x, states, tangents, n_directions)
+        Recursion with its forward-mode tangent.
     """
 
     def __init__(self, media=None, analyses=None, layers=None, backing=None):
@@ -93,6 +137,7 @@ class Solver(object):
             self.analyses = []
 
         self.resultset = []
+        self.plan = None
 
     def check_is_complete(self):
         """
@@ -121,7 +166,37 @@ class Solver(object):
 
         return True
 
-    def solve(self, frequencies=None, angles=0, n_draws=1000, prng_state=None):
+    def compile(self, varied=()):
+        """
+        Resolves the interface and transfer functions of the system once.
+
+        The resulting plan is used for all frequencies, angles and draws of the
+        following analyses, and shipped to the workers. It is compiled by `solve`, the
+        layers (or their media models) shouldn't be replaced during an analysis.
+
+        Parameters
+        ----------
+        varied : iterable of int
+            Indices of the layers whose medium parameters are changed during the
+            analysis (besides stochastic layers), see `pymls.plan.compile_plan`
+
+        Returns
+        -------
+        plan : pymls.plan.Plan
+            Immutable and picklable plan, also stored in `plan`
+
+        Raises
+        ------
+        IncompleteDefinitionError
+            If the system is incomplete (missing layer or backing)
+        """
+        self.check_is_complete()
+        self.plan = compile_plan(self.layers, self.backing, varied)
+        return self.plan
+
+    def solve(self, frequencies=None, angles=0, n_draws=1000, prng_state=None, vectorized=False,
+              chunk_size=None, block_size=None, workers=None, seed=None, executor='process',
+              memmap=None):
         """
         Starts the solving process w/w stochastic parameters.
 
@@ -141,26 +216,114 @@ class Solver(object):
             Number of draws for the stochastic analyses.
         prng_state : tuple
             Saved state for Numpy's pseudo random number generator (see `numpy.random.get_state`)
+        vectorized : bool
+            If True, all the points of an analysis are solved at once on stacked arrays
+            instead of one (frequency, angle) point at a time. For stochastic analyses,
+            the draws are also taken up front and solved together as an extra batch
+            dimension.
+        chunk_size : int, optional
+            Number of draws stacked together by the vectorized engine. Defaults to as
+            many draws as fit in `CHUNK_POINTS` (frequency, angle, draw) points.
+        block_size : int, optional
+            Number of frequencies solved together in deterministic analyses. Defaults
+            to as many frequencies as fit in `CHUNK_POINTS` (frequency, angle) points.
+        workers : int, optional
+            Number of workers the analyses are spread over. Deterministic analyses are
+            split in blocks of contiguous frequencies, stochastic ones in chunks of
+            draws (the draws themselves are taken in the calling process). In both
+            cases, results are merged in the order of the analysis.
+        seed : int, optional
+            Seed from which one independent stream per draw is derived (see
+            `numpy.random.SeedSequence`): the global NumPy PRNG is re-seeded from the
+            i-th stream before the i-th draw, and its state restored once the draws are
+            taken. Seeded draws are always solved by the vectorized engine, so that for
+            a fixed seed the output does not depend on `workers` nor on `chunk_size`.
+        executor : str
+            Kind of pool used when `workers` is set, either 'process' (default) or
+            'thread'. Threads avoid copying the system to other processes but only scale
+            with the vectorized engine, which spends most of its time in NumPy. Hooks
+            registered on the layers run on the workers as well and must be picklable
+            (module-level functions) to be sent to processes.
+        memmap : str, optional
+            Directory where the arrays of the results are memory-mapped, as `.npy` files
+            named after the index of the result in the resultset (`0_R.npy`, `0_T.npy`,
+            ...). Workers write their coefficients directly into these files, so that
+            results larger than the memory can be computed.
 
         .. _numpy.random.get_state: https://docs.scipy.org/doc/numpy/reference/generated/numpy.random.get_state.html
 
         Returns
         -------
-        resultset : dict or list of dict
-            Set of all computed results and relevant metadata provided as a dict for easy
-            serialisation.
+        resultset : ResultSet or list of ResultSet
+            Set of all computed results and relevant metadata, also readable as a dict
+            for easy serialisation (see `pymls.result.ResultSet`).
         """
 
-        self.check_is_complete()
         self.resultset = []
+        for chunk in self.iter_solve(
+                frequencies, angles, n_draws, prng_state, vectorized,
+                chunk_size, block_size, workers, seed, executor, memmap):
+            if chunk.index == len(self.resultset):
+                self.resultset.append(chunk.result or ResultSet.for_chunk(chunk))
+            self.resultset[chunk.index].add(chunk)
+
+        for result in self.resultset:
+            result.flush()
+
+        if len(self.resultset) == 1:
+            return self.resultset[0]
+        else:
+            return self.resultset
+
+    def iter_solve(self, frequencies=None, angles=0, n_draws=1000, prng_state=None, vectorized=False,
+                   chunk_size=None, block_size=None, workers=None, seed=None, executor='process',
+                   memmap=None, resume_from=None):
+        """
+        Starts the solving process and yields the results by chunks as they are computed.
+
+        Takes the same parameters as `solve`. Deterministic analyses are yielded by
+        blocks of `block_size` frequencies, stochastic ones by chunks of `chunk_size`
+        draws (one draw at a time with the single-point solver). Chunks can be reduced
+        or written to disk on the fly without holding all the results in memory, or
+        gathered with `ResultSet.for_chunk` and `ResultSet.add` as `solve` does. With
+        `memmap`, chunks are views into the memory-mapped result they belong to
+        (`ResultChunk.result`).
+
+        Parameters
+        ----------
+        resume_from : dict, optional
+            Maps the index of a result to its number of leading points (deterministic
+            analyses) or draws (stochastic analyses) already computed. Chunks fully
+            included are neither solved nor yielded, the draws are still taken so that
+            the following ones are unchanged. Other parameters are the ones of `solve`.
+
+        Yields
+        ------
+        chunk : ResultChunk
+            Coefficients of the chunk with the index ranges they cover and metadata
+        """
+
+        self.compile()
+        if executor not in EXECUTORS:
+            raise ValueError('Unknown executor {}, use one of: {}'.format(
+                executor, ', '.join(EXECUTORS.keys())))
 
         self.n_draws = n_draws
+        self.vectorized = vectorized
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+        self.resume_from = resume_from if resume_from is not None else {}
+        self.workers = workers
+        self.seed = seed
+        self.executor = executor
+        self.memmap = memmap
+        self.stopped = set()
         self.stochastic_layers = list(filter(
             lambda _: type(_[1]) == StochasticLayer,
             enumerate(self.layers)
         ))
-        if self.stochastic_layers and prng_state is None:
-            self.prng_state = np.random.get_state()
+        if self.stochastic_layers:
+            self.prng_state = prng_state if prng_state is not None else np.random.get_state()
 
         if frequencies is not None:
             self.analyses = [Analysis(
@@ -173,37 +336,42 @@ class Solver(object):
         self.n_analyses = 0
         for a in self.analyses:
             if a.enable_stochastic:
-                partial_resultset = self.__run_stochastic_analysis(a)
-                self.resultset += partial_resultset
+                yield from self.__run_stochastic_analysis(a)
             else:
-                result = self.__run__analysis(a)
-                self.resultset.append(result)
+                yield from self.__run__analysis(a)
 
-        if len(self.resultset) == 1:
-            return self.resultset[0]
-        else:
-            return self.resultset
+    def stop(self, index):
+        """
+        Stops the stochastic analysis giving the result of index `index`.
+
+        Meant to be called by a consumer of `iter_solve`: the draws of the result are
+        no longer solved once the current chunk has been yielded, the solver moving on
+        to the next result.
+        """
+        self.stopped.add(index)
 
     def __run_stochastic_analysis(self, a):
         """ Runs a stochastic solver for `Analysis` `a` with stochastic layers
 
         Note that it will run the analysis for each stochastic layer separately, re
-        initialising the PRNG state between two runs.
+        initialising the PRNG state between two runs. When only the thickness of the
+        layer is drawn, the media and eigen decompositions of all layers are computed
+        once and reused for every draw (see `__solve_draws_batch`).
 
         Parameters
         ----------
         a : Analysis
             The one to be run.
 
-        Returns
-        -------
-        partial_resultset : list of dict
-            Return a list of all result dicts computed
+        Yields
+        ------
+        chunk : ResultChunk
+            Chunks of draws, each stochastic layer giving a separate result
 
         Notes
         -----
 
-        The result dict has the following structure:
+        The gathered results have the following structure when read as dicts:
 
         .. code-block:: python
             result = {
@@ -216,8 +384,8 @@ class Solver(object):
                 },
                 'f': freqs_vect,
                 'angle': angles_vect,
-                'R': [],  # reflection coefficient per freq
-                'T': [],  # transmission coefficient per freq
+                'R': ndarray,  # reflection coefficients
+                'T': ndarray,  # transmission coefficients
             }
 
         `R` and `T` are matrices (rows corresponding to the freqs/angles axis, columns to
@@ -229,38 +397,298 @@ class Solver(object):
         layers.layer.StochasticLayer
             For stochastic layer definition
         """
-        partial_resultset = []
-        analysis_size = len(a.freqs)*len(a.angles)
-
         for l_id, l in self.stochastic_layers:
+            index = self.n_analyses
             self.n_analyses += 1
             self.__reinit_stochastic_solver()
 
-            result = {
-                'name': a.name,
-                'enable_stochastic': a.enable_stochastic,
-                'stochastics': {
-                    'layer': l_id,
-                    'param': l.stochastic_param,
-                    'values': [],
-                },
-                'f': a.freqs,
-                'angle': a.angles,
-                'R': [[] for _ in range(analysis_size)],
-                'T': [[] for _ in range(analysis_size)],
-            }
+            stochastics = {'layer': l_id, 'param': l.stochastic_param}
+            result = self.__memmap_result(index, a, stochastics)
+
+            draws = self.__draw_values(l)
+            # seeded runs always use the vectorized engine, for the output not to depend on workers
+            batch = self.vectorized or self.workers is not None or self.seed is not None or \
+                l.stochastic_param == 'thickness'
+            chunk_size = (self.chunk_size or max(1, CHUNK_POINTS//len(a))) if batch else 1
+
+            # draws are always taken, skipped chunks included, to keep the same values
+            done = self.resume_from.get(index, 0)
+            start = done//chunk_size*chunk_size
+            chunks = [draws[i:i+chunk_size] for i in range(start, len(draws), chunk_size)]
+
+            if batch:
+                solved_chunks = self.__solve_draws_batch(a, l_id, chunks, self.__out(result, start))
+            else:
+                solved_chunks = self.__solve_draws(a, l, chunks)
+
+            for (values, R, T) in solved_chunks:
+                draws = slice(start, start+len(values))
+                if result is not None:
+                    result.stochastics['values'][draws] = values
+                    (R, T) = self.__stored(result, R, T, (slice(None), draws))
+                yield ResultChunk(
+                    index, a, R, T,
+                    points=slice(0, len(a)),
+                    draws=draws,
+                    stochastics=dict(stochastics, values=values),
+                    n_draws=self.n_draws,
+                    result=result
+                )
+                start += len(values)
+
+                if index in self.stopped:
+                    solved_chunks.close()
+                    break
+
+    def __memmap_result(self, index, a, stochastics=None):
+        """ Allocates the memory-mapped result `index` for `Analysis` `a`, if `memmap` is set """
+        if self.memmap is None:
+            return None
+        os.makedirs(self.memmap, exist_ok=True)
+
+        n_draws = None
+        if stochastics is not None:
+            n_draws = self.n_draws
+            stochastics = dict(stochastics, values=[None]*n_draws)
+
+        return ResultSet(
+            a.name, a.freqs, a.angles,
+            n_draws=n_draws,
+            transmission=self.backing == backing.transmission,
+            stochastics=stochastics,
+            memmap=os.path.join(self.memmap, '{}_'.format(index))
+        )
+
+    def __out(self, result, start):
+        """ Returns where workers write their coefficients in the memory-mapped `result`
+
+        `start` is the index of the first frequency or draw the workers solve.
+        """
+        if result is None:
+            return None
+        return ([result.R.filename, None if result.T is None else result.T.filename], start)
+
+    def __stored(self, result, R, T, index):
+        """ Stores `R` and `T` (unless written by a worker) in `result` and returns views on them
+
+        `index` selects the coefficients in the flattened arrays of `result` (see
+        `ResultSet.flat`).
+        """
+        if R is not None:
+            result.store(R, T, *index)
+        R = result.flat('R')[index]
+        T = None if result.T is None else result.flat('T')[index]
+        return (R, T)
+
+    def __solve_draws(self, a, l, chunks):
+        """ Yields each chunk of draws of stochastic layer `l` with the results for all points of `a`
+
+        Draws are solved one at a time by the single-point solver, see
+        `__solve_draws_batch`.
+        """
+        for values in chunks:
+            (R, T) = ([], [])
+            for draw in values:
+                l.apply_draw(draw)
+                (R_draw, T_draw) = self._solve_frequencies(a.freqs, a.angles)
+                R.append(R_draw)
+                T.append(T_draw)
+            yield (values, np.stack(R, axis=-1), None if T[0] is None else np.stack(T, axis=-1))
+
+    def __solve_draws_batch(self, a, l_id, chunks, out=None):
+        """ Yields each chunk of draws of stochastic layer `l_id` with the results for all points of `a`
+
+        The draws of a chunk are pushed through the recursion as an extra batch
+        dimension (see `_solve_draw_chunks`). If `workers` is set, the chunks are spread
+        over a pool of processes. Workers write their coefficients into the memory-mapped
+        files given by `out` (see `__out`) instead of sending them back, in which case
+        `None` is yielded for `R` and `T`.
+
+        Yields
+        ------
+        values : list
+            Values drawn in the chunk
+        R : ndarray
+            Reflection coefficients, of shape (n_points, n_chunk)
+        T : ndarray or None
+            Transmission coefficients, of shape (n_points, n_chunk)
+        """
+        if self.workers is None or self.workers == 1:
+            yield from self._solve_draw_chunks(a, l_id, chunks)
+            return
+
+        # contiguous groups of chunks, so that results come back in draw order
+        bounds = np.linspace(0, len(chunks), min(self.workers, len(chunks))+1).astype(int)
+        offsets = np.cumsum([0]+[len(_) for _ in chunks])
+        with EXECUTORS[self.executor](max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(
+                    _solve_draw_chunks, self.__worker_copy(), a, l_id, chunks[start:end],
+                    None if out is None else (out[0], out[1]+int(offsets[start]))
+                )
+                for (start, end) in zip(bounds[:-1], bounds[1:])
+            ]
+            try:
+                for future in futures:
+                    yield from future.result()
+            except GeneratorExit:
+                # the analysis was stopped, pending groups are not needed anymore
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def _solve_draw_chunks(self, a, l_id, chunks):
+        """ Yields the results of each chunk of draws in `chunks` for stochastic layer `l_id`
+
+        The draws are solved as joint draws of the single parameter of the layer, see
+        `_solve_joint_chunks`. Also used as the entry point of the worker processes.
+        """
+        parameters = [(l_id, self.layers[l_id].stochastic_param)]
+        joint_chunks = (np.asarray(values).reshape((-1, 1)) for values in chunks)
+        for (values, (_, R, T)) in zip(chunks, self._solve_joint_chunks(a, parameters, joint_chunks)):
+            yield (values, R, T)
+
+    def _solve_joint_chunks(self, a, parameters, chunks):
+        """ Yields the results of each chunk of joint draws in `chunks`
+
+        `parameters` lists the `(layer_id, param)` couples drawn together, `param`
+        being `'thickness'` or a parameter of the medium of the layer, and each chunk is
+        an array of shape (n_chunk, len(parameters)) holding one joint draw per row. The
+        dtype of the draws is kept, so that complex medium parameters (lossy moduli) can
+        be drawn.
+
+        The thickness-independent state of the layers without drawn medium parameter is
+        computed once. If only the thickness of a layer is drawn, its eigen
+        decompositions are reused for all draws as well. The parameters are set back to
+        their initial values once the chunks are solved.
+
+        The layers behind the last drawn one are the same for all draws: the recursion
+        through them is run once per point (see `__backward_batch`) and each draw
+        resumes from there.
+        """
+        (omega, k_x, states) = self._stack_layers(*a.points())
+        n_points = len(omega)
+
+        drawn = {}
+        for (i_p, (l_id, param)) in enumerate(parameters):
+            drawn.setdefault(l_id, []).append((i_p, param))
+        initial = [(l_id, param, _get_param(self.layers[l_id], param)) for (l_id, param) in parameters]
+
+        last_drawn = max(drawn)
+        (n_steps, Omega_plus, back_prop) = self.__backward_batch(omega, k_x, states, len(self.layers)-1-last_drawn)
+
+        try:
+            for values in chunks:
+                n_chunk = len(values)
+
+                # points are stacked draw after draw
+                chunk_states = []
+                for i_L, (thickness, eigen, transparent) in enumerate(states):
+                    if i_L > last_drawn:
+                        # already went through by the cached head
+                        chunk_states.append(None)
+                        continue
+                    layer_params = drawn.get(i_L, [])
+                    medium_params = [(i_p, param) for (i_p, param) in layer_params if param != 'thickness']
+                    if medium_params:
+                        L = self.layers[i_L]
+                        step = self.plan.step(i_L)
+                        thicknesses, eigens, transparents = [], [], []
+                        for draw in values:
+                            for (i_p, param) in medium_params:
+                                _set_param(L, param, draw[i_p])
+                            (medium, thickness) = L.stack_frequencies(omega)
+                            thicknesses.append(thickness)
+                            eigens.append(step.eigen_batch(omega, k_x, medium))
+                            transparents.append(np.broadcast_to(step.is_transparent(medium), (n_points,)))
+                        thickness = np.concatenate(thicknesses)
+                        eigen = tuple(np.concatenate(_) for _ in zip(*eigens))
+                        # the transparency of the drawn medium is checked on each point
+                        transparent = np.concatenate(transparents)
+                    else:
+                        thickness = np.tile(thickness, n_chunk)
+                        eigen = tuple(np.concatenate([_]*n_chunk) for _ in eigen)
+                        if np.ndim(transparent):
+                            transparent = np.tile(transparent, n_chunk)
+                    for (i_p, param) in layer_params:
+                        if param == 'thickness':
+                            thickness = np.repeat(values[:, i_p].real, n_points)
+                    chunk_states.append((thickness, eigen, transparent))
+
+                head = (n_steps, np.concatenate([Omega_plus]*n_chunk), np.concatenate([back_prop]*n_chunk))
+                (R, T) = self.__recursion_batch(
+                    np.tile(omega, n_chunk),
+                    np.tile(k_x, n_chunk),
+                    chunk_states,
+                    head=head
+                )
 
-            for i_draw in range(self.n_draws):
-                draw = l.new_draw()
-                result['stochastics']['values'].append(draw)
-                for analysis_point, (f, angle) in enumerate(a):
-                    (R, T) = self.__solve_one_frequency(f, angle)
-                    result['R'][analysis_point].append(R)
-                    if T is not None:
-                        result['T'][analysis_point].append(T)
+                R = R.reshape((n_chunk, n_points)).T
+                if T is not None:
+                    T = T.reshape((n_chunk, n_points)).T
+                yield (values, R, T)
+        finally:
+            for (l_id, param, value) in initial:
+                _set_param(self.layers[l_id], param, value)
 
-            partial_resultset.append(result)
-        return partial_resultset
+    def __draw_values(self, l):
+        """ Takes all the draws of stochastic layer `l`, one seeded stream per draw if `seed` is set
+
+        Without seed, the draws are taken at once from batch samplers (see
+        `StochasticLayer.new_draws`). The pdf drawing from the global NumPy PRNG, the
+        latter is re-seeded before each seeded draw and its state is restored afterwards.
+        """
+        if self.seed is None:
+            return l.new_draws(self.n_draws)
+
+        values = []
+        state = np.random.get_state()
+        try:
+            for stream in np.random.SeedSequence(self.seed).spawn(self.n_draws):
+                np.random.seed(stream.generate_state(4))
+                values.append(l.new_draw())
+        finally:
+            np.random.set_state(state)
+        return values
+
+    def __worker_copy(self):
+        """ Returns a copy of the solver holding only what workers need
+
+        Each worker gets its own layers and media, so that workers sharing the memory
+        of the calling process (threads) do not update the same media. Probability
+        density functions of the stochastic layers are not shipped since all draws are
+        taken in the calling process. The hooks registered on the layers are shipped
+        and run on the copies of the layers.
+
+        Raises
+        ------
+        ValueError
+            If hooks are registered on the layers but cannot be pickled to be sent to
+            process workers
+        """
+        layers = []
+        for L in self.layers:
+            L = copy.copy(L)
+            L.medium = copy.deepcopy(L.medium)
+            L.hooks = {hook_name: list(hooks) for (hook_name, hooks) in L.hooks.items()}
+            if isinstance(L, StochasticLayer):
+                L.pdf = None
+            layers.append(L)
+
+        hooks = [L.hooks for L in layers if any(L.hooks.values())]
+        if hooks and self.executor == 'process':
+            try:
+                pickle.dumps(hooks)
+            except (pickle.PicklingError, AttributeError, TypeError) as e:
+                raise ValueError(
+                    'Hooks registered on the layers must be picklable to run on process workers, '
+                    'use module-level functions or executor=\'thread\''
+                ) from e
+
+        solver = Solver(layers=layers, backing=self.backing)
+        solver.vectorized = self.vectorized
+        solver.plan = self.plan
+        return solver
 
     def __run__analysis(self, a):
         """ Runs a solver for `Analysis` `a`
@@ -270,15 +698,15 @@ class Solver(object):
         a : Analysis
             The one to be run.
 
-        Returns
-        -------
-        result : dict
-            Return the result of the computation and metadata in a dict format
+        Yields
+        ------
+        chunk : ResultChunk
+            Blocks of contiguous frequencies
 
         Notes
         -----
 
-        The result dict has the following structure:
+        The gathered result has the following structure when read as a dict:
 
         .. code-block:: python
             result = {
@@ -286,28 +714,87 @@ class Solver(object):
                 'enable_stochastic': bool_var,
                 'f': freqs_vect,
                 'angle': angles_vect,
-                'R': [],  # reflection coefficient per freq
-                'T': [],  # transmission coefficient per freq
+                'R': ndarray,  # reflection coefficient per point
+                'T': ndarray,  # transmission coefficient per point
             }
 
         """
+        index = self.n_analyses
         self.n_analyses += 1
-        result = {
-            'name': a.name,
-            'enable_stochastic': a.enable_stochastic,
-            'f': a.freqs,
-            'angle': a.angles,
-            'R': [],
-            'T': [],
-        }
-
-        for f, angle in a:
-            (R, T) = self.__solve_one_frequency(f, angle)
-            result['R'].append(R)
-            if T is not None:
-                result['T'].append(T)
+        result = self.__memmap_result(index, a)
 
-        return result
+        for (points, (R, T)) in self.__solve_points(a, self.resume_from.get(index, 0), result):
+            if result is not None:
+                (R, T) = self.__stored(result, R, T, (points,))
+            yield ResultChunk(index, a, R, T, points=points, result=result)
+
+    def __solve_points(self, a, done=0, result=None):
+        """ Yields the `(R, T)` coefficients of blocks of contiguous frequencies of `a`, in order.
+
+        Blocks hold `block_size` frequencies, by default as many as fit in
+        `CHUNK_POINTS` points. If `workers` is set, frequencies are split in at least
+        `workers` blocks spread over a pool, and their results merged back in the order
+        of the analysis.
+
+        Blocks fully included in the first `done` points are skipped. Each block is
+        yielded with the slice of the points it covers. Workers write their coefficients
+        into the memory-mapped `result` if given, in which case `None` is yielded for `R`
+        and `T`.
+        """
+        n_angles = len(a.angles)
+        block_size = self.block_size or max(1, CHUNK_POINTS//n_angles)
+        if self.workers is not None and self.workers > 1:
+            block_size = min(block_size, -(-len(a.freqs)//self.workers))
+        starts = range(done//n_angles//block_size*block_size, len(a.freqs), block_size)
+        blocks = [a.freqs[i:i+block_size] for i in starts]
+
+        if self.workers is None or self.workers == 1:
+            for (start, freqs) in zip(starts, blocks):
+                points = slice(start*n_angles, (start+len(freqs))*n_angles)
+                yield (points, self._solve_frequencies(freqs, a.angles))
+            return
+
+        with EXECUTORS[self.executor](max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(
+                    _solve_frequencies, self.__worker_copy(), freqs, a.angles,
+                    self.__out(result, start)
+                )
+                for (start, freqs) in zip(starts, blocks)
+            ]
+            for (start, freqs, future) in zip(starts, blocks, futures):
+                points = slice(start*n_angles, (start+len(freqs))*n_angles)
+                yield (points, future.result())
+
+    def _solve_frequencies(self, freqs, angles):
+        """ Solves all the (frequency, angle) points of the grid `freqs` x `angles`
+
+        Dispatches to the vectorized engine or to the single-point solver depending on
+        the `vectorized` flag given to `solve`. Also used as the entry point of the
+        workers.
+
+        Returns
+        -------
+        reflx_coefficient : ndarray of complex128
+            Reflection coefficient of each point, frequency-major
+        trans_coefficient : ndarray of complex128 or None
+            Transmission coefficient of each point, frequency-major
+        """
+        if self.vectorized:
+            return self._solve_batch(
+                np.repeat(freqs, len(angles)),
+                np.tile(angles, len(freqs))
+            )
+
+        # frequency-major: the layers are updated once and reused for all angles
+        points = []
+        for f in freqs:
+            self.__update_frequency(f)
+            for angle in angles:
+                points.append(self.__solve_one_frequency(f, angle, update_frequency=False))
+
+        (R, T) = zip(*points)
+        return (np.array(R), None if T[0] is None else np.array(T))
 
     def __reinit_stochastic_solver(self):
         """ Utility function to re-initialise the solver between two stochastic analyses. """
@@ -315,7 +802,13 @@ class Solver(object):
         for _,l in self.stochastic_layers:
             l.reinit()
 
-    def __solve_one_frequency(self, frequency, theta_inc):
+    def __update_frequency(self, frequency):
+        """ Updates the angle-independent state of all layers for `frequency` """
+        omega = frequency*2*np.pi
+        for L in self.layers:
+            L.update_frequency(omega)
+
+    def __solve_one_frequency(self, frequency, theta_inc, update_frequency=True):
         """ Solve for one frequency `frequency` and one angle `theta_inc`
 
         Parameters
@@ -324,6 +817,8 @@ class Solver(object):
             Frequency for the resolution
         theta_inc :
             Angle of incidence for the resolution
+        update_frequency : bool
+            If False, the layers are assumed to be already updated for `frequency`
 
         Returns
         -------
@@ -335,61 +830,48 @@ class Solver(object):
 
         omega = frequency*2*np.pi
 
-        for L in self.layers:
-            L.update_frequency(omega)
+        if update_frequency:
+            self.__update_frequency(frequency)
 
         # compute k_x
         k_x = omega/Air.c*np.sin(theta_inc*np.pi/180)
         k_air = omega*sqrt(Air.rho/Air.K)
         k_z = sqrt(k_air**2-k_x**2)
 
+        plan = self.plan
+
         # load the backing vector to initiate recursion
-        Omega_plus = self.backing(omega, k_x)
+        Omega_plus = plan.backing(omega, k_x)
 
         # go backward (from last to first layer) and compute successive
         # Omega_plus/minus
         back_prop = np.eye(1)
-        for invertedi_L, L in enumerate(self.layers[::-1]):
-
-            i_L = len(self.layers)-invertedi_L-1
+        for step in plan.steps:
+            L = self.layers[step.layer]
 
-            if invertedi_L == 0:  # right-most layer
-                if self.backing == backing.transmission:
-                    # check if the last layer is identical to the transmission medium
-                    if L.medium.MODEL == 'fluid' and L.medium.c == Air.c and L.medium.rho == Air.rho:
-                        Omega_plus *= np.exp(-1j*k_z*L.thickness)
-                        continue
-                    interface_func = generic_interface(L.medium, Air)
-                else:
-                    interface_func = rigid_interface(L.medium)
-            else:
-                interface_func = generic_interface(
-                    L.medium,
-                    self.layers[i_L+1].medium
-                )
+            if step.is_transparent(L.medium):
+                Omega_plus *= np.exp(-1j*k_z*L.thickness)
+                continue
 
-            if interface_func is not None:
-                (Omega_minus, tau) = interface_func(Omega_plus)
+            if step.interface is not None:
+                (Omega_minus, tau) = step.interface(Omega_plus)
             else:
                 Omega_minus = Omega_plus
-                tau = np.eye(int(len(Omega_minus)/2))
+                tau = np.eye(step.tau_size)
 
-            layer_func = generic_layer(L.medium)
-            (Omega_plus, xi) = layer_func(Omega_minus, omega, k_x, L.medium, L.thickness)
+            (Omega_plus, xi) = step.transfer(Omega_minus, omega, k_x, L.medium, L.thickness)
 
-            if self.backing == backing.transmission:
+            if plan.transmission:
                 back_prop = back_prop.dot(tau).dot(xi)
 
         # last interface
-        interface_func = generic_interface(Air, self.layers[0].medium)
-        if interface_func is not None:
-            (Omega_minus, tau) = interface_func(Omega_plus)
-
+        if plan.interface is not None:
+            (Omega_minus, tau) = plan.interface(Omega_plus)
         else:
             Omega_minus = Omega_plus
-            tau = np.eye(int(len(Omega_minus)/2))
+            tau = np.eye(plan.tau_size)
 
-        if self.backing == backing.transmission:
+        if plan.transmission:
             back_prop = back_prop.dot(tau)
 
         # Solve for the first layer
@@ -413,7 +895,7 @@ class Solver(object):
         reflx_coefficient = X[1,0]
         X_0_minus = X[0,0]
 
-        if self.backing == backing.transmission:
+        if plan.transmission:
             trans_coefficient = back_prop*X_0_minus
             trans_coefficient = trans_coefficient[0,0]
         else:
@@ -421,101 +903,673 @@ class Solver(object):
 
         return (reflx_coefficient, trans_coefficient)
 
-    def compute_fields(self, layer_id, frequency, theta_inc):
-        """ Returns the backpropagation matrix from the first interface to layer num.
-        `layer_id`.
+    def _solve_batch(self, frequencies, thetas_inc):
+        """ Solve for a stack of (frequency, angle) points at once
+
+        Runs the same recursion as `__solve_one_frequency` on stacked arrays of shape
+        (n_points, m, k). Kernel of the vectorized engine, also used by the drivers of
+        `pymls.utils` (see `pymls.utils.solve_diffuse`).
 
         Parameters
         ----------
-        frequency : float
-            frequency at which backprop is computed
-        theta_inc :
-            angle of incidence
-        layer_id : int
-            id of the layer up to which backpropagate
+        frequencies : ndarray
+            Frequency of each point
+        thetas_inc : ndarray
+            Angle of incidence of each point (same shape as `frequencies`)
 
         Returns
         -------
-        layer_func : callable
-            Function to get the propagation in the layer
+        reflx_coefficient : ndarray of complex128
+            Reflection coefficient of each point
+        trans_coefficient : ndarray of complex128 or None
+            Transmission coefficient of each point
+        """
+        return self.__recursion_batch(*self._stack_layers(frequencies, thetas_inc))
 
-        Raises
-        ------
-        ValueError :
-            if the id is invalid
+    def _stack_layers(self, frequencies, thetas_inc):
+        """ Computes the thickness-independent state of all layers on a stack of points
+
+        Returns
+        -------
+        omega : ndarray
+            Circular frequency of each point
+        k_x : ndarray
+            Horizontal wavenumber of each point
+        states : list of tuple
+            For each layer, its thickness on each point, the data returned by the eigen
+            function of the layer (see `pymls.layers.generic_eigen_batch`) and whether
+            it is identical to the transmission medium, on each point if unknown at
+            compilation (see `pymls.plan.Step.is_transparent`)
         """
 
-        if layer_id >= len(self.layers):
-            raise ValueError("Supplied layer's id is out of range.")
+        omega = np.asarray(frequencies)*2*np.pi
+        k_x = omega/Air.c*np.sin(np.asarray(thetas_inc)*np.pi/180)
 
-        omega = frequency*2*np.pi
+        states = [None]*len(self.layers)
+        for step in self.plan.steps:
+            (medium, thickness) = self.layers[step.layer].stack_frequencies(omega)
+            states[step.layer] = (thickness, step.eigen_batch(omega, k_x, medium), step.is_transparent(medium))
 
-        for L in self.layers:
-            L.update_frequency(omega)
+        return (omega, k_x, states)
 
-        # compute k_x
-        k_x = omega/Air.c*np.sin(theta_inc*np.pi/180)
+    def __backward_batch(self, omega, k_x, states, n_steps):
+        """ Runs the `n_steps` first steps of the recursion, from the backing
 
-        # load the backing vector to initiate recursion
-        Omega_plus = self.backing(omega, k_x)
+        The returned head `(n_steps, Omega_plus, back_prop)` is the state of the
+        recursion on the left of the layers at the back of the system. It only depends
+        on these layers and can be given to `__recursion_batch` for any state of the
+        layers in front of them.
+        """
+        n_points = len(omega)
+        head = (0, self.plan.backing(omega, k_x), np.ones((n_points, 1, 1), dtype=np.complex128))
+        return self.__sweep_batch(omega, k_x, states, head, n_steps)
 
-        # goes backward (from last to first layer) and compute successive
-        # Omega_plus/minus
-        back_prop = None
-        for invertedi_L, L in enumerate(self.layers[::-1]):
+    def __sweep_batch(self, omega, k_x, states, head, n_steps=None, fields=None):
+        """ Runs the backward sweep of the recursion from `head` through `n_steps` steps
 
-            i_L = len(self.layers)-invertedi_L-1
+        All the remaining steps are run if `n_steps` is None. `fields`, if given, is a triplet of lists filled with the `Omega_plus` matrix, its
+        counterpart `Omega_minus @ xi` on the right side and the transfer `tau @ xi` of
+        each layer. Returns the new head, see `__backward_batch`.
+        """
+        (done, Omega_plus, back_prop) = head
+        n_points = len(omega)
+        plan = self.plan
+        steps = plan.steps[done:] if n_steps is None else plan.steps[done:done+n_steps]
+        if fields:
+            (Omega_pluses, Omega_rights, transfers) = fields
 
-            if invertedi_L == 0:  # right-most layer
-                if self.backing == backing.transmission:
-                    interface_func = generic_interface(L.medium, Air)
-                else:
-                    interface_func = rigid_interface(L.medium)
-            else:
-                interface_func = generic_interface(L.medium, self.layers[i_L+1].medium)
+        k_air = omega*sqrt(Air.rho/Air.K)
+        k_z = sqrt(k_air**2-k_x**2)
 
-            if interface_func is not None:
-                (Omega_minus, tau) = interface_func(Omega_plus)
+        for (i_step, step) in enumerate(steps, done):
+            (thickness, eigen, transparent) = states[step.layer]
+
+            if np.all(transparent):
+                Omega_plus = Omega_plus*np.exp(-1j*k_z*thickness).reshape(n_points, 1, 1)
+                if fields:
+                    Omega_pluses[step.layer] = Omega_plus
+                continue
+
+            if np.any(transparent):
+                # medium identical to the transmission one on some points only (drawn
+                # media), the other points go through the layer on their own
+                if fields:
+                    raise ValueError('Unable to keep the fields of a layer identical to the '
+                                     'transmission medium on some points only')
+                opaque = ~np.broadcast_to(transparent, (n_points,))
+                opaque_states = list(states)
+                opaque_states[step.layer] = (thickness[opaque], tuple(_[opaque] for _ in eigen), False)
+                (_, Omega_opaque, back_opaque) = self.__sweep_batch(
+                    omega[opaque], k_x[opaque], opaque_states,
+                    (i_step, Omega_plus[opaque], back_prop[opaque]), 1
+                )
+                Omega_plus = Omega_plus*np.exp(-1j*k_z*thickness).reshape(n_points, 1, 1)
+                Omega_plus[opaque] = Omega_opaque
+                back_prop = back_prop.copy()
+                back_prop[opaque] = back_opaque
+                continue
+
+            if step.interface_batch is not None:
+                (Omega_minus, tau) = step.interface_batch(Omega_plus)
             else:
                 Omega_minus = Omega_plus
-                tau = np.eye(int(len(Omega_minus)/2))
+                tau = np.eye(step.tau_size)
+
+            (Omega_plus, xi) = step.propagate_batch(Omega_minus, eigen, thickness)
+
+            if plan.transmission:
+                back_prop = back_prop @ tau @ xi
+            if fields:
+                Omega_pluses[step.layer] = Omega_plus
+                Omega_rights[step.layer] = Omega_minus @ xi
+                if step.layer < len(self.layers)-1:
+                    transfers[step.layer] = tau @ xi
+
+        return (done+len(steps), Omega_plus, back_prop)
+
+    def __recursion_batch(self, omega, k_x, states, fields=False, head=None):
+        """ Runs the recursion on the stacked layers' states given by `_stack_layers`
 
-            layer_func = generic_layer(L.medium)
-            (Omega_plus, xi) = layer_func(Omega_minus, omega, k_x, L.medium, L.thickness)
+        If `fields` is True, the `Omega_plus` matrix, its counterpart `Omega_minus @ xi`
+        on the right side and the transfer `tau @ xi` of each layer are kept during the
+        backward sweep. The state vectors on the left and right sides of each layer are
+        then returned as well, as a list of couples of arrays of shape (n_points, m)
+        (the right one being None for a layer identical to the transmission medium).
 
-            if i_L < layer_id:  # Store the backprop to the desired layer
-                back_prop = tau.dot(xi) if back_prop is None else back_prop.dot(tau).dot(xi)
-            if i_L == layer_id:
-                omega_plus_target = Omega_plus
+        If `head` is given (see `__backward_batch`), the recursion resumes from it
+        instead of starting from the backing, the states of the layers it already went
+        through being ignored. `fields` then is not supported, nor is it for a layer
+        identical to the transmission medium on some of the points only.
+        """
+
+        n_points = len(omega)
+        Omega_pluses = [None]*len(self.layers)
+        Omega_rights = [None]*len(self.layers)
+        transfers = [None]*len(self.layers)
+
+        k_air = omega*sqrt(Air.rho/Air.K)
+        k_z = sqrt(k_air**2-k_x**2)
+
+        plan = self.plan
+
+        if head is None:
+            # load the backing vectors to initiate recursion
+            head = (0, plan.backing(omega, k_x), np.ones((n_points, 1, 1), dtype=np.complex128))
+
+        # go backward (from last to first layer) and compute successive
+        # Omega_plus/minus
+        (_, Omega_plus, back_prop) = self.__sweep_batch(
+            omega, k_x, states, head,
+            fields=(Omega_pluses, Omega_rights, transfers) if fields else None
+        )
 
         # last interface
-        interface_func = generic_interface(Air, self.layers[0].medium)
-        if interface_func is not None:
-            (Omega_minus, tau) = interface_func(Omega_plus)
+        if plan.interface_batch is not None:
+            (Omega_minus, tau) = plan.interface_batch(Omega_plus)
         else:
             Omega_minus = Omega_plus
-            tau = np.eye(int(len(Omega_minus)/2))
-        back_prop = tau if layer_id == 0 else back_prop.dot(tau)
+            tau = np.eye(plan.tau_size)
+
+        if plan.transmission:
+            back_prop = back_prop @ tau
+
+        # Solve for the first layer, the 2x2 system is inverted analytically
+        u_z = 1j*k_z/(Air.rho*omega**2)
+        det = u_z*Omega_minus[:,1,0] - Omega_minus[:,0,0]
+
+        reflx_coefficient = (Omega_minus[:,0,0] + u_z*Omega_minus[:,1,0])/det
+        X_0_minus = 2*u_z/det
+
+        if plan.transmission:
+            trans_coefficient = back_prop[:,0,0]*X_0_minus
+        else:
+            trans_coefficient = None
+
+        if not fields:
+            return (reflx_coefficient, trans_coefficient)
+
+        # forward sweep: amplitudes on the left side of each layer
+        amplitudes = tau @ X_0_minus.reshape((n_points, 1, 1))
+        layer_fields = []
+        for (Omega_plus, Omega_right, transfer) in zip(Omega_pluses, Omega_rights, transfers):
+            layer_fields.append((
+                (Omega_plus @ amplitudes)[:, :, 0],
+                None if Omega_right is None else (Omega_right @ amplitudes)[:, :, 0]
+            ))
+            if transfer is not None:
+                amplitudes = transfer @ amplitudes
+
+        return (reflx_coefficient, trans_coefficient, layer_fields)
+
+    def _tangent_recursion_batch(self, omega, k_x, states, tangents, n_directions):
+        """ Runs the recursion with its forward-mode tangent along `n_directions` directions
+
+        `tangents` gives, for each layer, the derivatives of its thickness, of shape
+        (n_directions, n_points), and of its eigen data (see `_stack_layers`), with a
+        leading axis of size n_directions, either being None when zero. The recursion
+        through the layers at the back without derivatives is run without tangent.
+        Kernel of the derivatives, used by the drivers of `pymls.utils` (see
+        `pymls.utils.solve_sensitivities` and `pymls.utils.optimize_thicknesses`).
+
+        Returns
+        -------
+        reflx_coefficient, trans_coefficient : ndarray
+            Coefficients of each point, see `__recursion_batch`
+        d_reflx_coefficient, d_trans_coefficient : ndarray
+            Their derivatives, of shape (n_directions, n_points)
+        """
+
+        n_points = len(omega)
+        plan = self.plan
 
-        # Solve for the first layer
         k_air = omega*sqrt(Air.rho/Air.K)
         k_z = sqrt(k_air**2-k_x**2)
+
+        # layers at the back with no derivative
+        n_steps = 0
+        while n_steps < len(plan.steps) and all(_ is None for _ in tangents[plan.steps[n_steps].layer]):
+            n_steps += 1
+        (_, Omega_plus, back_prop) = self.__backward_batch(omega, k_x, states, n_steps)
+
+        d_Omega_plus = np.zeros((n_directions,)+Omega_plus.shape, dtype=np.complex128)
+        d_back_prop = np.zeros((n_directions,)+back_prop.shape, dtype=np.complex128)
+        for step in plan.steps[n_steps:]:
+            (thickness, eigen, transparent) = states[step.layer]
+            (d_thickness, d_eigen) = tangents[step.layer]
+            if d_thickness is None:
+                d_thickness = 0
+            if d_eigen is None:
+                d_eigen = tuple(np.zeros((1,)+np.shape(_), dtype=np.complex128) for _ in eigen)
+
+            if np.all(transparent):
+                delay = np.exp(-1j*k_z*thickness).reshape(n_points, 1, 1)
+                d_delay = (-1j*k_z*d_thickness)[...,np.newaxis,np.newaxis]*delay
+                d_Omega_plus = d_Omega_plus*delay + Omega_plus*d_delay
+                Omega_plus = Omega_plus*delay
+                continue
+            if np.any(transparent):
+                raise ValueError('Unable to differentiate through a layer identical to the '
+                                 'transmission medium on some points only')
+
+            if step.interface_tangent is not None:
+                (Omega_minus, tau, d_Omega_minus, d_tau) = step.interface_tangent(Omega_plus, d_Omega_plus)
+            else:
+                (Omega_minus, d_Omega_minus) = (Omega_plus, d_Omega_plus)
+                (tau, d_tau) = (np.eye(step.tau_size), 0)
+
+            (Omega_plus, d_Omega_plus, xi, d_xi) = step.propagate_tangent(
+                Omega_minus, d_Omega_minus, eigen, d_eigen, thickness, d_thickness)
+
+            if plan.transmission:
+                (transfer, d_transfer) = (tau @ xi, _product_tangent(tau, d_tau, xi, d_xi))
+                d_back_prop = _product_tangent(back_prop, d_back_prop, transfer, d_transfer)
+                back_prop = back_prop @ transfer
+
+        # last interface
+        if plan.interface_tangent is not None:
+            (Omega_minus, tau, d_Omega_minus, d_tau) = plan.interface_tangent(Omega_plus, d_Omega_plus)
+        else:
+            (Omega_minus, d_Omega_minus) = (Omega_plus, d_Omega_plus)
+            (tau, d_tau) = (np.eye(plan.tau_size), 0)
+
+        if plan.transmission:
+            d_back_prop = _product_tangent(back_prop, d_back_prop, tau, d_tau)
+            back_prop = back_prop @ tau
+
+        # Solve for the first layer, see `__recursion_batch`
         u_z = 1j*k_z/(Air.rho*omega**2)
+        det = u_z*Omega_minus[:,1,0] - Omega_minus[:,0,0]
+        d_det = u_z*d_Omega_minus[...,1,0] - d_Omega_minus[...,0,0]
 
-        Omega_0_fluid = np.array([
-            [-u_z],
-            [-1]
-        ], dtype=np.complex128)
-        S_fluid = np.array([
-            [-u_z],
-            [1]
-        ], dtype=np.complex128)
+        reflx_coefficient = (Omega_minus[:,0,0] + u_z*Omega_minus[:,1,0])/det
+        d_reflx_coefficient = (d_Omega_minus[...,0,0] + u_z*d_Omega_minus[...,1,0] - reflx_coefficient*d_det)/det
+        X_0_minus = 2*u_z/det
+        d_X_0_minus = -X_0_minus*d_det/det
 
-        temp = np.array([
-            [Omega_minus[0,0], Omega_0_fluid[0,0]],
-            [Omega_minus[1,0], Omega_0_fluid[1,0]]
-        ])
-        X = np.linalg.inv(temp).dot(S_fluid)
-        S = omega_plus_target.dot(back_prop)*X[0,0]
+        if not plan.transmission:
+            return (reflx_coefficient, None, d_reflx_coefficient, None)
+
+        trans_coefficient = back_prop[:,0,0]*X_0_minus
+        d_trans_coefficient = d_back_prop[...,0,0]*X_0_minus + back_prop[:,0,0]*d_X_0_minus
+        return (reflx_coefficient, trans_coefficient, d_reflx_coefficient, d_trans_coefficient)
+
+    def solve_adaptive(self, frequencies, angles=0, tol=1e-2, tol_TL=0.5, max_points=1000, min_step=None):
+        """
+        Solves a deterministic analysis on a frequency grid refined where the results vary quickly.
+
+        The analysis starts from the (coarse) grid `frequencies`. Each interval between
+        two neighbouring frequencies is then split at its middle and its halves are split
+        again while, on any angle, |R|, alpha or TL either differ by more than the
+        tolerance between the ends of the half or deviate by more than the tolerance
+        from the linear interpolation at the middle. All the middles of a refinement
+        round are solved at once by the vectorized engine, the intervals varying the
+        most being split first when the budget is about to be exceeded. Stochastic
+        layers are taken with their current value.
 
-        return S.reshape((max(S.shape,)))
+        Parameters
+        ----------
+        frequencies : list
+            Initial frequency grid (anything `Analysis` can parse), of 2 points or more
+        angles : optional
+            Angles of incidence of the analysis, defaults to 0
+        tol : float
+            Tolerance on |R| and alpha
+        tol_TL : float
+            Tolerance on the transmission loss (in dB), for a transmission backing
+        max_points : int
+            Maximum number of frequencies of the refined grid
+        min_step : float, optional
+            Intervals narrower than `2*min_step` are no longer split
+
+        Returns
+        -------
+        result : ResultSet
+            Results on the refined grid, the frequencies (`result.f`) being sorted
+
+        Raises
+        ------
+        ValueError
+            If the initial grid has less than 2 frequencies
+        IncompleteDefinitionError
+            If the system is incomplete (missing layer or backing)
+        """
+        # imported here as pymls.utils depends on the solver
+        from pymls.utils.indicators import alpha_from_R, TL_from_T
+
+        self.compile()
+
+        a = Analysis('adaptive', frequencies, angles)
+        n_angles = len(a.angles)
+        freqs = list(np.unique(a.freqs.real))
+        if len(freqs) < 2:
+            raise ValueError('The initial grid needs at least 2 frequencies')
+
+        def solve(new_freqs):
+            (R, T) = self._solve_batch(np.repeat(new_freqs, n_angles), np.tile(a.angles, len(new_freqs)))
+            R = R.reshape((len(new_freqs), n_angles))
+            if T is not None:
+                T = T.reshape((len(new_freqs), n_angles))
+            # indicators scaled by their tolerance
+            scaled = [np.abs(R)/tol, alpha_from_R(R)/tol]
+            if T is not None:
+                with np.errstate(divide='ignore'):
+                    scaled.append(TL_from_T(T)/tol_TL)
+            return (R, T, np.stack(scaled, axis=-1))
+
+        (R, T, scaled) = solve(np.array(freqs))
+        Rs, Ts, indicators = list(R), list(T) if T is not None else None, list(scaled)
+
+        def variation(i, j):
+            return np.nan_to_num(np.max(np.abs(indicators[j]-indicators[i])), nan=np.inf)
+
+        # every initial interval is checked once, as variations can hide between two points
+        intervals = [(variation(i, i+1), i, i+1) for i in range(len(freqs)-1)]
+        while intervals and len(freqs) < max_points:
+            intervals.sort(reverse=True)
+            (intervals, postponed) = (intervals[:max_points-len(freqs)], intervals[max_points-len(freqs):])
+
+            new_freqs = np.array([(freqs[i]+freqs[j])/2 for (_, i, j) in intervals])
+            (R, T, scaled) = solve(new_freqs)
+            first = len(freqs)
+            freqs += list(new_freqs)
+            Rs += list(R)
+            if Ts is not None:
+                Ts += list(T)
+            indicators += list(scaled)
+
+            refined = []
+            for (k, (_, i, j)) in enumerate(intervals):
+                m = first+k
+                deviation = np.nan_to_num(
+                    np.max(np.abs(indicators[m]-(indicators[i]+indicators[j])/2)), nan=np.inf)
+                if min_step is not None and freqs[j]-freqs[i] < 4*min_step:
+                    continue
+                for (l, r) in [(i, m), (m, j)]:
+                    score = max(deviation, variation(l, r))
+                    if score > 1:
+                        refined.append((score, l, r))
+            intervals = refined + [_ for _ in postponed if _[0] > 1]
+
+        order = np.argsort(freqs)
+        result = ResultSet(a.name, np.array(freqs)[order], a.angles, transmission=Ts is not None)
+        result.store(
+            np.array(Rs)[order].ravel(),
+            None if Ts is None else np.array(Ts)[order].ravel()
+        )
+        return result
+
+    def _stack_tangents(self, omega, k_x, states, parameters, step):
+        """ Derivatives of the layers' states given by `_stack_layers` along each parameter
+
+        Returns, for each layer, the derivatives of its thickness and of its eigen data
+        along all `parameters` (None when zero), see `_tangent_recursion_batch`. The
+        eigen data at the perturbed parameters keep the modes in the order of `states`.
+        """
+        n_points = len(omega)
+        tangents = [[None, None] for _ in self.layers]
+
+        for (i_p, (l_id, param)) in enumerate(parameters):
+            (thickness, eigen, transparent) = states[l_id]
+            tangent = tangents[l_id]
+
+            if param == 'thickness':
+                if tangent[0] is None:
+                    tangent[0] = np.zeros((len(parameters), n_points))
+                tangent[0][i_p] = 1
+                continue
+
+            # central differences of the medium and its eigen decomposition, the modes
+            # being kept in the order of `eigen` (a perturbation could swap modes of
+            # close real parts, see `modal_sort`)
+            L = self.layers[l_id]
+            if np.any(transparent):
+                raise ValueError('Unable to differentiate with respect to a parameter of a layer '
+                                 'identical to the transmission medium')
+            eigen_func = self.plan.step(l_id).eigen_batch
+            value = _get_param(L, param)
+            h = step*abs(value) if value != 0 else step
+            try:
+                perturbed = []
+                for sign in [1, -1]:
+                    _set_param(L, param, value+sign*h)
+                    perturbed.append(eigen_func(omega, k_x, L.stack_frequencies(omega)[0], reference=eigen))
+            finally:
+                _set_param(L, param, value)
+
+            if tangent[1] is None:
+                tangent[1] = tuple(np.zeros((len(parameters),)+np.shape(_), dtype=np.complex128) for _ in eigen)
+            for (d_data, plus, minus) in zip(tangent[1], *perturbed):
+                d_data[i_p] = (plus-minus)/(2*h)
+
+        return [tuple(_) for _ in tangents]
+
+    def solve_fields(self, frequencies, angles=0, block_size=None):
+        """
+        Solves a deterministic analysis and gives the state vectors in all the layers.
+
+        The state vectors are obtained from the same backward sweep as the reflection
+        and transmission coefficients: the `Omega_plus` matrix and the transfer matrix
+        of each layer are kept and the amplitudes are then propagated forward from the
+        first interface, layer after layer. Stochastic layers are taken with their
+        current value.
+
+        Parameters
+        ----------
+        frequencies : list
+            Frequencies of the analysis (anything `Analysis` can parse)
+        angles : optional
+            Angles of incidence of the analysis, defaults to 0
+        block_size : int, optional
+            Number of frequencies solved together, see `solve`
+
+        Returns
+        -------
+        result : ResultSet
+            Reflection and transmission coefficients
+        fields : list of ndarray
+            For each layer, the state vector on its left side (at its interface with the
+            previous layer), of shape (n_freq, n_angle, m) with m the size of the state
+            vector in the layer
+
+        Raises
+        ------
+        IncompleteDefinitionError
+            If the system is incomplete (missing layer or backing)
+        """
+        self.compile()
+
+        a = Analysis('fields', frequencies, angles)
+        n_angles = len(a.angles)
+        result = ResultSet(a.name, a.freqs, a.angles, transmission=self.plan.transmission)
+        fields = [
+            np.zeros((len(a.freqs), n_angles, self.plan.step(i_L).size), dtype=np.complex128)
+            for i_L in range(len(self.layers))
+        ]
+
+        block_size = block_size or max(1, CHUNK_POINTS//n_angles)
+        for start in range(0, len(a.freqs), block_size):
+            freqs = a.freqs[start:start+block_size]
+            (R, T, layer_fields) = self.__recursion_batch(
+                *self._stack_layers(np.repeat(freqs, n_angles), np.tile(a.angles, len(freqs))),
+                fields=True
+            )
+
+            result.store(R, T, points=slice(start*n_angles, (start+len(freqs))*n_angles))
+            for (field, (S_left, _)) in zip(fields, layer_fields):
+                field[start:start+len(freqs)] = S_left.reshape((len(freqs), n_angles, -1))
+
+        return (result, fields)
+
+    def solve_profiles(self, frequencies, depths, angles=0, block_size=None):
+        """
+        Solves a deterministic analysis and gives the state vectors at depths through the system.
+
+        The state vectors on both sides of each layer are obtained as in `solve_fields`
+        and the state vectors inside the layer are then evaluated at once for all the
+        depths and points from the eigenvectors and eigenvalues of the layer. The
+        components of the state vectors (displacements, stresses and pressure) are
+        the ones of the models of the layers.
+
+        Parameters
+        ----------
+        frequencies : list
+            Frequencies of the analysis (anything `Analysis` can parse)
+        depths : array_like
+            Depths at which the state vectors are computed, measured from the front face
+            of the system (between 0 and the total thickness). A depth on an interface
+            is given to the layer on the right of the interface.
+        angles : optional
+            Angles of incidence of the analysis, defaults to 0
+        block_size : int, optional
+            Number of frequencies solved together, defaults to a block of at most
+            `CHUNK_POINTS` (point, depth) couples
+
+        Returns
+        -------
+        result : ResultSet
+            Reflection and transmission coefficients
+        profiles : list of couples
+            For each layer, the depths (ndarray of shape (n_z,)) in the layer and the state
+            vectors at these depths (ndarray of shape (n_freq, n_angle, n_z, m) with m the
+            size of the state vector in the layer)
+
+        Raises
+        ------
+        ValueError
+            If a depth is out of the system
+        IncompleteDefinitionError
+            If the system is incomplete (missing layer or backing)
+        """
+        self.compile()
+
+        depths = np.atleast_1d(np.asarray(depths, dtype=float))
+        bounds = np.cumsum([0]+[l.thickness for l in self.layers])
+        if np.any(depths < 0) or np.any(depths > bounds[-1]):
+            raise ValueError('Depths must lie between 0 and the total thickness of the system')
+        # index of the layer of each depth, the back face belonging to the last layer
+        layer_ids = np.minimum(np.searchsorted(bounds, depths, side='right')-1, len(self.layers)-1)
+
+        a = Analysis('profiles', frequencies, angles)
+        n_angles = len(a.angles)
+        result = ResultSet(a.name, a.freqs, a.angles, transmission=self.plan.transmission)
+        profiles = []
+        for i_L in range(len(self.layers)):
+            z = depths[layer_ids == i_L]
+            profiles.append((z, np.zeros(
+                (len(a.freqs), n_angles, len(z), self.plan.step(i_L).size), dtype=np.complex128)))
+
+        block_size = block_size or max(1, CHUNK_POINTS//(n_angles*len(depths)))
+        for start in range(0, len(a.freqs), block_size):
+            freqs = a.freqs[start:start+block_size]
+            (omega, k_x, states) = self._stack_layers(
+                np.repeat(freqs, n_angles), np.tile(a.angles, len(freqs)))
+            (R, T, layer_fields) = self.__recursion_batch(omega, k_x, states, fields=True)
+
+            result.store(R, T, points=slice(start*n_angles, (start+len(freqs))*n_angles))
+            for (i_L, ((z, profile), (S_left, S_right))) in enumerate(zip(profiles, layer_fields)):
+                if len(z) == 0:
+                    continue
+                (thickness, eigen, _) = states[i_L]
+                S = self.plan.step(i_L).profile_batch(eigen, S_left, S_right, thickness, z-bounds[i_L])
+                profile[start:start+len(freqs)] = S.reshape((len(freqs), n_angles)+S.shape[1:])
+
+        return (result, profiles)
+
+    def compute_fields(self, layer_id, frequency, theta_inc):
+        """ Returns the state vector on the left side of layer num. `layer_id`.
+
+        To get the state vectors in several layers or at several frequencies, use
+        `solve_fields` which computes all of them in a single sweep.
+
+        Parameters
+        ----------
+        frequency : float
+            frequency at which backprop is computed
+        theta_inc :
+            angle of incidence
+        layer_id : int
+            id of the layer up to which backpropagate
+
+        Returns
+        -------
+        state : ndarray
+            State vector on the left side of the layer
+
+        Raises
+        ------
+        ValueError :
+            if the id is invalid
+        """
+
+        if layer_id >= len(self.layers):
+            raise ValueError("Supplied layer's id is out of range.")
+
+        (_, fields) = self.solve_fields([frequency], [theta_inc])
+        return fields[layer_id][0, 0]
+
+
+def _product_tangent(A, d_A, B, d_B):
+    """ Derivatives of the product `A @ B` given the ones of its factors (0 when constant) """
+    d_product = 0
+    if not np.isscalar(d_A):
+        d_product = d_product + d_A @ B
+    if not np.isscalar(d_B):
+        d_product = d_product + A @ d_B
+    return d_product
+
+
+def _get_param(layer, param):
+    """ Returns the value of `param` (`'thickness'` or a parameter of the medium) in `layer` """
+    if param == 'thickness':
+        return layer.thickness
+    return getattr(layer.medium, param)
+
+
+def _set_param(layer, param, value):
+    """ Sets `param` (`'thickness'` or a parameter of the medium) to `value` in `layer` """
+    if param == 'thickness':
+        layer.thickness = value
+    else:
+        setattr(layer.medium, param, value)
+        layer.medium.omega = -1
+
+
+def _solve_draw_chunks(solver, a, l_id, chunks, out=None):
+    """ Worker entry point, see `Solver._solve_draw_chunks`
+
+    If `out` is given as `(filenames, first_draw)`, the coefficients are written into
+    the memory-mapped result files instead of being sent back.
+    """
+    solved_chunks = []
+    for (values, R, T) in solver._solve_draw_chunks(a, l_id, chunks):
+        if out is not None:
+            (filenames, start) = out
+            _write_out(filenames, (R, T), (slice(None), slice(None), slice(start, start+len(values))))
+            out = (filenames, start+len(values))
+            (R, T) = (None, None)
+        solved_chunks.append((values, R, T))
+    return solved_chunks
+
+
+def _solve_frequencies(solver, freqs, angles, out=None):
+    """ Worker entry point, see `Solver._solve_frequencies`
+
+    If `out` is given as `(filenames, first_frequency)`, the coefficients are written
+    into the memory-mapped result files instead of being sent back.
+    """
+    (R, T) = solver._solve_frequencies(freqs, angles)
+    if out is None:
+        return (R, T)
+
+    (filenames, start) = out
+    _write_out(filenames, (R, T), slice(start, start+len(freqs)))
+    return (None, None)
+
+
+def _write_out(filenames, coefficients, index):
+    """ Writes coefficients into the `index` part of memory-mapped `.npy` files """
+    for (filename, values) in zip(filenames, coefficients):
+        if filename is not None:
+            array = np.load(filename, mmap_mode='r+')
+            array[index] = values.reshape(array[index].shape)
+            array.flush()
@@ -25,3 +25,10 @@
 from .yaml_loader import YamlLoader
 from .indicators import *
 from .draws_manager import DrawsManager
+from .hdf5_export import HDF5Writer
+from .rational import aaa, RationalApproximant, Surrogate
+from .distributions import Distribution, Normal, Uniform, LogNormal, Truncated, JointDistribution, solve_joint
+from .pce import PolynomialChaos, PCEResult, solve_pce
+from .statistics import Welford, P2Quantile, OnlineStatistics, solve_online
+from .optimize import surface_density, maximize_bounded, optimize_thicknesses
+from .sensitivities import solve_sensitivities
@@ -0,0 +1,401 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# distributions.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+
+from math import erfc
+
+import numpy as np
+
+from pymls.analysis import Analysis
+from pymls.result import ResultSet
+from pymls.layers import StochasticLayer
+from pymls.solver import CHUNK_POINTS
+import pymls.backing as backing
+
+from .sampling import sample
+
+
+# coefficients of the rational approximations of the inverse normal CDF (P. J. Acklam)
+_ACKLAM_A = [-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+             1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00]
+_ACKLAM_B = [-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+             6.680131188771972e+01, -1.328068155288572e+01]
+_ACKLAM_C = [-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+             -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00]
+_ACKLAM_D = [7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+             3.754408661907416e+00]
+
+_erfc = np.vectorize(erfc, otypes=[float])
+
+
+def norm_cdf(x):
+    """ Cumulative distribution function of the standard normal distribution """
+    return _erfc(-np.asarray(x, dtype=float)/np.sqrt(2))/2
+
+
+def norm_ppf(u):
+    """
+    Inverse of the cumulative distribution function of the standard normal distribution.
+
+    Acklam's rational approximation (relative error below 1.2e-9) is refined by one
+    step of Halley's method. Values above 1/2 are obtained by symmetry, so that both
+    tails are accurate.
+    """
+    u = np.asarray(u, dtype=float)
+    v = np.minimum(u, 1-u)
+    x = np.empty_like(v)
+
+    (a, b, c, d) = (_ACKLAM_A, _ACKLAM_B, _ACKLAM_C, _ACKLAM_D)
+    tail = v < 0.02425
+    central = ~tail
+
+    q = v[central]-0.5
+    r = q*q
+    x[central] = (((((a[0]*r+a[1])*r+a[2])*r+a[3])*r+a[4])*r+a[5])*q / \
+        (((((b[0]*r+b[1])*r+b[2])*r+b[3])*r+b[4])*r+1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = np.sqrt(-2*np.log(v[tail]))
+        x[tail] = (((((c[0]*q+c[1])*q+c[2])*q+c[3])*q+c[4])*q+c[5]) / \
+            ((((d[0]*q+d[1])*q+d[2])*q+d[3])*q+1)
+
+        # refinement
+        e = norm_cdf(x)-v
+        step = e*np.sqrt(2*np.pi)*np.exp(x*x/2)
+        x = np.where(np.isfinite(step), x-step/(1+x*step/2), x)
+
+    x[v == 0] = -np.inf
+    return np.where(u > 0.5, -x, x)
+
+
+class Distribution(object):
+    """
+    Probability distribution of a stochastic parameter.
+
+    Calling a distribution draws a sample from the global NumPy PRNG, so that an
+    instance can be given as `pdf` to a `StochasticLayer` (the draws then follow the
+    `prng_state` and `seed` handling of `Solver.solve`).
+
+    For polynomial chaos expansions (see `pymls.utils.pce`), the distribution is also
+    described as the image of a standard random variable, its germ: either `'hermite'`
+    (standard normal variable) or `'legendre'` (uniform variable on [-1, 1]).
+    """
+
+    germ = None
+
+    def sample(self, size=None):
+        """ Draws `size` samples (a float if `size` is None) from the global PRNG """
+        raise NotImplementedError
+
+    def transform(self, xi):
+        """ Maps values `xi` of the germ to values of the distribution """
+        raise NotImplementedError
+
+    def ppf(self, u):
+        """ Inverse of the cumulative distribution function, mapping points of [0, 1) to values """
+        raise NotImplementedError
+
+    def __call__(self):
+        return float(self.sample())
+
+
+class Normal(Distribution):
+    """ Normal distribution of mean `mean` and standard deviation `std` """
+
+    germ = 'hermite'
+
+    def __init__(self, mean, std):
+        self.mean = mean
+        self.std = std
+
+    def sample(self, size=None):
+        return np.random.normal(self.mean, self.std, size)
+
+    def transform(self, xi):
+        return self.mean+self.std*np.asarray(xi)
+
+    def ppf(self, u):
+        return self.transform(norm_ppf(u))
+
+    def cdf(self, x):
+        return norm_cdf((np.asarray(x)-self.mean)/self.std)
+
+    def __repr__(self):
+        return 'Normal({!r}, {!r})'.format(self.mean, self.std)
+
+
+class Uniform(Distribution):
+    """ Uniform distribution on [`low`, `high`] """
+
+    germ = 'legendre'
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def sample(self, size=None):
+        return np.random.uniform(self.low, self.high, size)
+
+    def transform(self, xi):
+        return self.low+(np.asarray(xi)+1)/2*(self.high-self.low)
+
+    def ppf(self, u):
+        return self.low+np.asarray(u)*(self.high-self.low)
+
+    def cdf(self, x):
+        return np.clip((np.asarray(x)-self.low)/(self.high-self.low), 0, 1)
+
+    def __repr__(self):
+        return 'Uniform({!r}, {!r})'.format(self.low, self.high)
+
+
+class LogNormal(Distribution):
+    """ Log-normal distribution, whose logarithm has a mean `mu` and a standard deviation `sigma` """
+
+    germ = 'hermite'
+
+    def __init__(self, mu, sigma):
+        self.mu = mu
+        self.sigma = sigma
+
+    @classmethod
+    def from_moments(cls, mean, std):
+        """ Returns the log-normal distribution of mean `mean` and standard deviation `std` """
+        sigma2 = np.log(1+(std/mean)**2)
+        return cls(np.log(mean)-sigma2/2, np.sqrt(sigma2))
+
+    def sample(self, size=None):
+        return np.random.lognormal(self.mu, self.sigma, size)
+
+    def transform(self, xi):
+        return np.exp(self.mu+self.sigma*np.asarray(xi))
+
+    def ppf(self, u):
+        return self.transform(norm_ppf(u))
+
+    def cdf(self, x):
+        with np.errstate(divide='ignore'):
+            return norm_cdf((np.log(x)-self.mu)/self.sigma)
+
+    def __repr__(self):
+        return 'LogNormal({!r}, {!r})'.format(self.mu, self.sigma)
+
+
+class Truncated(Distribution):
+    """
+    Distribution `distribution` truncated to [`low`, `high`].
+
+    Samples are obtained by inversion of the cumulative distribution function, and the
+    germ of polynomial chaos expansions is a uniform variable mapped through it.
+    """
+
+    germ = 'legendre'
+
+    def __init__(self, distribution, low=-np.inf, high=np.inf):
+        self.distribution = distribution
+        self.low = low
+        self.high = high
+        self.bounds = (float(distribution.cdf(low)), float(distribution.cdf(high)))
+        if self.bounds[1] <= self.bounds[0]:
+            raise ValueError('Empty truncation interval')
+
+    def sample(self, size=None):
+        values = self.ppf(np.random.random_sample(size))
+        return values if size is not None else float(values)
+
+    def transform(self, xi):
+        return self.ppf((np.asarray(xi)+1)/2)
+
+    def ppf(self, u):
+        (lower, upper) = self.bounds
+        return np.clip(self.distribution.ppf(lower+np.asarray(u)*(upper-lower)), self.low, self.high)
+
+    def cdf(self, x):
+        (lower, upper) = self.bounds
+        return np.clip((self.distribution.cdf(x)-lower)/(upper-lower), 0, 1)
+
+    def __repr__(self):
+        return 'Truncated({!r}, {!r}, {!r})'.format(self.distribution, self.low, self.high)
+
+
+class JointDistribution(object):
+    """
+    Joint distribution of several parameters, see `solve_joint`.
+
+    The parameters are coupled by a Gaussian copula: points of the unit hypercube are
+    mapped to standard normal variables, correlated by the Cholesky factor of
+    `correlation` and mapped back to the marginals through their CDF. Normal marginals
+    thus have exactly the given correlation, other ones a close rank correlation.
+
+    Parameters
+    ----------
+    marginals : list of Distribution
+        Distribution of each parameter
+    correlation : array_like, optional
+        Correlation matrix of the parameters, independent ones if not given
+    """
+
+    def __init__(self, marginals, correlation=None):
+        self.marginals = list(marginals)
+        self.correlation = None
+        self.cholesky = None
+
+        if correlation is not None:
+            correlation = np.asarray(correlation, dtype=float)
+            d = len(self.marginals)
+            if correlation.shape != (d, d) or not np.allclose(correlation, correlation.T) \
+                    or not np.allclose(np.diag(correlation), 1):
+                raise ValueError('The correlation must be a symmetric {0}x{0} matrix with a unit diagonal'.format(d))
+            try:
+                self.cholesky = np.linalg.cholesky(correlation)
+            except np.linalg.LinAlgError:
+                raise ValueError('The correlation matrix is not positive definite')
+            self.correlation = correlation
+
+    def __len__(self):
+        return len(self.marginals)
+
+    def ppf(self, u):
+        """ Maps points `u` of the unit hypercube, of shape (n, d), to values of the parameters """
+        u = np.asarray(u, dtype=float).reshape((-1, len(self)))
+        if self.cholesky is not None:
+            u = norm_cdf(norm_ppf(u) @ self.cholesky.T)
+        return np.stack([m.ppf(u[:, j]) for (j, m) in enumerate(self.marginals)], axis=-1)
+
+    def sample(self, n, method='random', scramble=True, seed=None):
+        """
+        Draws `n` joint samples, as an array of shape (n, d).
+
+        The points of the unit hypercube are given by `pymls.utils.sampling.sample`
+        (`method` being `'random'`, `'sobol'`, `'halton'` or `'lhs'`). Unscrambled
+        Sobol sequences skip their first point, which lies on the boundary.
+        """
+        skip = 1 if method == 'sobol' and not scramble else 0
+        points = sample(method, n+skip, len(self), scramble, seed)[skip:]
+        return self.ppf(points)
+
+    def __repr__(self):
+        return 'JointDistribution({!r}, {!r})'.format(
+            self.marginals, None if self.correlation is None else self.correlation.tolist())
+
+
+def solve_joint(solver, frequencies, angles=0, parameters=None, correlation=None, n_draws=1000,
+                method='random', scramble=True, seed=None, chunk_size=None):
+    """
+    Solves a stochastic analysis drawing several parameters of several layers jointly.
+
+    Unlike `Solver.solve`, which analyses each stochastic layer separately, each draw is a
+    vector holding a value of all the `parameters`, possibly correlated, and the
+    system is solved once per draw: the result gives the joint effect of the
+    parameters for `n_draws` draws instead of `n_draws` per stochastic layer. The
+    draws are solved by the vectorized engine, by chunks of `chunk_size` draws.
+
+    Parameters
+    ----------
+    solver : Solver
+        System to solve
+    frequencies : list
+        Frequencies of the analysis (anything `Analysis` can parse)
+    angles : optional
+        Angles of incidence of the analysis, defaults to 0
+    parameters : list of tuple, optional
+        `(layer_id, param, distribution)` triplets, `param` being `'thickness'` or a
+        parameter of the medium of the layer and `distribution` a
+        `Distribution`. Defaults to the stochastic layers
+        whose pdf is a `Distribution`.
+    correlation : array_like, optional
+        Correlation matrix of the parameters (see `JointDistribution`), independent if
+        not given
+    n_draws : int
+        Number of joint draws
+    method : str
+        Sampler of the draws: `'random'`, `'sobol'`, `'halton'` or `'lhs'` (see
+        `pymls.utils.sampling`)
+    scramble : bool
+        Whether low-discrepancy sequences are scrambled
+    seed : optional
+        Seed of the sampler
+    chunk_size : int, optional
+        Number of draws stacked together, see `Solver.solve`
+
+    Returns
+    -------
+    result : ResultSet
+        Result with a draw axis, its `stochastics` holding the drawn `parameters`
+        (`(layer_id, param)` couples), their `distribution` and the drawn `values`
+        as an array of shape (n_draws, n_parameters)
+
+    Raises
+    ------
+    ValueError
+        If a parameter is undefined in its layer, drawn twice or not given a
+        `Distribution`, or if there is no parameter to draw
+    IncompleteDefinitionError
+        If the system is incomplete (missing layer or backing)
+    """
+    solver.check_is_complete()
+
+    if parameters is None:
+        parameters = [
+            (l_id, l.stochastic_param, l.pdf) for (l_id, l) in enumerate(solver.layers)
+            if isinstance(l, StochasticLayer) and isinstance(l.pdf, Distribution)
+        ]
+    if not parameters:
+        raise ValueError('Joint draws need at least one parameter')
+
+    for (i_p, (l_id, param, distribution)) in enumerate(parameters):
+        medium = solver.layers[l_id].medium
+        if param != 'thickness' and param not in dict(medium.EXPECTED_PARAMS+medium.OPT_PARAMS):
+            raise ValueError('Unable to draw a parameter undefined in the layer')
+        if (l_id, param) in [_[:2] for _ in parameters[:i_p]]:
+            raise ValueError('Parameter {} of layer {} is drawn twice'.format(param, l_id))
+        if not isinstance(distribution, Distribution):
+            raise ValueError('The distribution of {} in layer {} is not a Distribution'.format(param, l_id))
+
+    # the transparency of drawn media is checked on each draw
+    solver.compile(varied=[l_id for (l_id, param, _) in parameters if param != 'thickness'])
+
+    joint = JointDistribution([_[2] for _ in parameters], correlation)
+    draws = joint.sample(n_draws, method, scramble, seed)
+
+    a = Analysis('joint', frequencies, angles, True)
+    result = ResultSet(
+        a.name, a.freqs, a.angles,
+        n_draws=n_draws,
+        transmission=solver.backing == backing.transmission,
+        stochastics={
+            'parameters': [(l_id, param) for (l_id, param, _) in parameters],
+            'distribution': joint,
+            'values': draws,
+        }
+    )
+
+    chunk_size = chunk_size or max(1, CHUNK_POINTS//len(a))
+    chunks = [draws[i:i+chunk_size] for i in range(0, n_draws, chunk_size)]
+    start = 0
+    for (values, R, T) in solver._solve_joint_chunks(a, result.stochastics['parameters'], chunks):
+        result.store(R, T, draws=slice(start, start+len(values)))
+        start += len(values)
+
+    return result
@@ -22,9 +22,17 @@
 # copies or substantial portions of the Software.
 #
 
+import numpy as np
+
+from .sampling import sample
+
 
 class DrawsManager(object):
-    """Encapsulates the handling of PDF for StochasticLayer"""
+    """Encapsulates the handling of PDF for StochasticLayer
+
+    A manager (or its `as_pdf`) given as the pdf of a `StochasticLayer` is walked by
+    batches of draws (see `batches` and `StochasticLayer.new_draws`).
+    """
 
     def __init__(self, draws, mean, std):
         self.draws = draws
@@ -33,6 +41,33 @@ class DrawsManager(object):
         self.std = std
         self.n = 0
 
+    @classmethod
+    def from_distribution(cls, distribution, n, method='sobol', scramble=True, seed=None):
+        """
+        Draws `n` values of `distribution` (see `pymls.utils.distributions`) from a
+        low-discrepancy sequence or a Latin hypercube.
+
+        The points of the sampler `method` (`'sobol'`, `'halton'`, `'lhs'` or `'random'`,
+        see `pymls.utils.sampling.sample`) are mapped through the inverse cumulative
+        distribution function of `distribution`. The first point of an unscrambled
+        Sobol sequence (0) is skipped.
+
+        Returns
+        -------
+        manager : DrawsManager
+            Manager walking the values (its `as_pdf` can be given to a `StochasticLayer`)
+        """
+        skip = 1 if method == 'sobol' and not scramble else 0
+        points = sample(method, n+skip, 1, scramble, seed)[skip:, 0]
+        return cls(distribution.ppf(points), 0, 1)
+
+    def batches(self, size):
+        """ Yields the remaining values by arrays of at most `size` values """
+        while self.n < self.N:
+            batch = self.draws[self.n:self.n+size]
+            self.n += len(batch)
+            yield self.mean+np.asarray(batch)*self.std
+
     def as_pdf(self):
         if self.n == self.N:
             raise ValueError('The distribution has  only {} samples.'.format(self.N))
@@ -41,6 +76,9 @@ class DrawsManager(object):
             self.n += 1
             return float(val)
 
+    def __call__(self):
+        return self.as_pdf()
+
     def reset(self):
         self.n = 0
 
@@ -0,0 +1,307 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# hdf5_export.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+import json
+
+import numpy as np
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+from pymls.result import ResultSet
+from pymls.layers import StochasticLayer
+
+
+def describe_layers(layers):
+    """ Returns a JSON-serialisable description of a list of layers """
+    description = []
+    for L in layers:
+        medium = L.medium
+        params = dict(medium.EXPECTED_PARAMS+medium.OPT_PARAMS)
+        layer = {
+            'name': L.name,
+            'thickness': L.thickness,
+            'medium': {
+                'class': type(medium).__name__,
+                'name': medium.name,
+                'model': medium.MODEL,
+                'params': {k: getattr(medium, k, None) for k in params},
+            },
+        }
+        if isinstance(L, StochasticLayer):
+            # the layer holds the last value drawn
+            layer['stochastic_param'] = L.stochastic_param
+            if L.stochastic_param == 'thickness':
+                layer['thickness'] = L.initial_param_value
+            else:
+                layer['medium']['params'][L.stochastic_param] = L.initial_param_value
+        description.append(layer)
+    return description
+
+
+def _to_json(value):
+    """ JSON encoder for the complex numbers and the NumPy scalars and arrays found in layers and arguments
+
+    Complex numbers (such as the moduli of lossy media) are encoded as
+    `{"__complex__": [real, imag]}`, see `_from_json`.
+    """
+    if isinstance(value, complex):
+        return {'__complex__': [float(value.real), float(value.imag)]}
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('Object of type {} is not JSON serialisable'.format(type(value).__name__))
+
+
+def _from_json(obj):
+    """ JSON object hook decoding the complex numbers encoded by `_to_json` """
+    if list(obj.keys()) == ['__complex__']:
+        return complex(*obj['__complex__'])
+    return obj
+
+
+class HDF5Writer(object):
+    """
+    Solves a system and writes its results into an HDF5 file as they are computed.
+
+    Results are stored in the `results` group, one subgroup per result of the
+    resultset, holding the frequency (`f`) and angle (`angle`) axes, the drawn values
+    (`values`) for stochastic analyses and the coefficients `R` and `T` as chunked and
+    compressed datasets shaped as in `ResultSet`. The root of the file records the
+    description of the layers, the backing and the arguments of the solve.
+
+    Each chunk yielded by `Solver.iter_solve` is flushed to the file once written along
+    with the number of points (or draws) completed. If the run is interrupted, solving
+    again into the same file with the same system and arguments resumes from the last
+    complete chunk. Resuming a stochastic run draws from the PRNG state saved in the
+    file, stateful pdfs (such as `DrawsManager.as_pdf`) must be back to their initial
+    state.
+
+    Parameters
+    ----------
+
+    filename : str
+        Path of the HDF5 file, created if it doesn't exist
+    solver : Solver
+        System to solve
+    compression : str
+        Compression filter of the coefficient datasets (see `h5py`)
+    compression_opts : optional
+        Options of the compression filter
+
+    Raises
+    ------
+    ImportError
+        If h5py is not installed
+    """
+
+    def __init__(self, filename, solver, compression='gzip', compression_opts=4):
+        if h5py is None:
+            raise ImportError('h5py is required to write results in HDF5 files')
+        self.filename = filename
+        self.solver = solver
+        self.compression = compression
+        self.compression_opts = compression_opts
+
+    def solve(self, **kwargs):
+        """ Solves the system, see `Solver.solve` for the arguments
+
+        Returns
+        -------
+        resultset : ResultSet or list of ResultSet
+            Results read back from the file (see `load`)
+        """
+        for _ in self.iter_solve(**kwargs):
+            pass
+        resultset = load(self.filename)
+        return resultset[0] if len(resultset) == 1 else resultset
+
+    def iter_solve(self, **kwargs):
+        """ Solves the system and yields each `ResultChunk` once written to the file
+
+        See `Solver.iter_solve` for the arguments.
+
+        Raises
+        ------
+        ValueError
+            If the file holds a run of another system or with other arguments
+        """
+        arguments = json.dumps(kwargs, sort_keys=True, default=_to_json)
+        layers = json.dumps(describe_layers(self.solver.layers), default=_to_json)
+
+        with h5py.File(self.filename, 'a') as fh:
+            if 'results' in fh:
+                if fh.attrs['arguments'] != arguments or fh.attrs['layers'] != layers:
+                    raise ValueError('{} holds the results of a different run'.format(self.filename))
+                if 'prng_state' in fh and kwargs.get('prng_state') is None:
+                    kwargs['prng_state'] = self.__read_prng_state(fh['prng_state'])
+            else:
+                fh.attrs['arguments'] = arguments
+                fh.attrs['layers'] = layers
+                fh.attrs['backing'] = self.solver.backing.__name__
+                fh.create_group('results')
+
+            resume_from = {
+                int(index): int(group.attrs['done'])
+                for (index, group) in fh['results'].items()
+            }
+
+            for chunk in self.solver.iter_solve(resume_from=resume_from, **kwargs):
+                if chunk.draws is not None and 'prng_state' not in fh:
+                    self.__write_prng_state(fh, self.solver.prng_state)
+                self.__write(fh, chunk)
+                fh.flush()
+                yield chunk
+
+    def __write(self, fh, chunk):
+        """ Writes a `ResultChunk` and updates the progress of its result """
+        key = str(chunk.index)
+        if key not in fh['results']:
+            group = self.__create_group(fh['results'], key, chunk)
+        else:
+            group = fh['results'][key]
+
+        n_angles = len(chunk.angle)
+        coefficients = [('R', chunk.R)]
+        if chunk.T is not None:
+            coefficients.append(('T', chunk.T))
+
+        if chunk.draws is None:
+            rows = slice(chunk.points.start//n_angles, chunk.points.stop//n_angles)
+            for (name, values) in coefficients:
+                group[name][rows] = values.reshape((-1, n_angles))
+            group.attrs['done'] = chunk.points.stop
+        else:
+            shape = (len(chunk.f), n_angles, -1)
+            for (name, values) in coefficients:
+                group[name][:, :, chunk.draws] = values.reshape(shape)
+            group['values'][chunk.draws] = chunk.stochastics['values']
+            group.attrs['done'] = chunk.draws.stop
+
+    def __create_group(self, results, key, chunk):
+        """ Creates the group and datasets of the result `chunk` belongs to """
+        a = chunk.analysis
+        group = results.create_group(key)
+        group.attrs['name'] = a.name
+        group.attrs['done'] = 0
+        group['f'] = a.freqs
+        group['angle'] = a.angles
+
+        if chunk.draws is None:
+            shape = (len(a.freqs), len(a.angles))
+            chunks = (len(chunk.f), len(a.angles))
+        else:
+            shape = (len(a.freqs), len(a.angles), chunk.n_draws)
+            chunks = (len(a.freqs), len(a.angles), chunk.draws.stop-chunk.draws.start)
+            group.attrs['layer'] = chunk.stochastics['layer']
+            group.attrs['param'] = chunk.stochastics['param']
+            # complex draws (lossy moduli) are recorded as such
+            dtype = np.result_type(np.asarray(chunk.stochastics['values']), np.float64)
+            group.create_dataset('values', shape=(chunk.n_draws,), dtype=dtype)
+
+        names = ['R'] if chunk.T is None else ['R', 'T']
+        for name in names:
+            group.create_dataset(
+                name, shape=shape, dtype=np.complex128, chunks=chunks, shuffle=True,
+                compression=self.compression, compression_opts=self.compression_opts
+            )
+        return group
+
+    def __write_prng_state(self, fh, prng_state):
+        (algorithm, keys, pos, has_gauss, cached_gaussian) = prng_state
+        fh['prng_state'] = keys
+        fh['prng_state'].attrs['algorithm'] = algorithm
+        fh['prng_state'].attrs['pos'] = pos
+        fh['prng_state'].attrs['has_gauss'] = has_gauss
+        fh['prng_state'].attrs['cached_gaussian'] = cached_gaussian
+
+    def __read_prng_state(self, dataset):
+        return (
+            str(dataset.attrs['algorithm']),
+            dataset[()],
+            int(dataset.attrs['pos']),
+            int(dataset.attrs['has_gauss']),
+            float(dataset.attrs['cached_gaussian']),
+        )
+
+
+def load(filename, description=False):
+    """ Reads the results written by `HDF5Writer` in `filename`
+
+    Results of an interrupted run are returned as is, points (or draws) not computed
+    being zeros.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the HDF5 file
+    description : bool
+        If True, the description of the run is returned as well
+
+    Returns
+    -------
+    resultset : list of ResultSet
+    description : dict
+        Only if `description` is True: the description of the `layers` (see
+        `describe_layers`), the name of the `backing` and the `arguments` of the solve
+    """
+    if h5py is None:
+        raise ImportError('h5py is required to read results from HDF5 files')
+
+    resultset = []
+    with h5py.File(filename, 'r') as fh:
+        results = fh['results']
+        for key in sorted(results.keys(), key=int):
+            group = results[key]
+            stochastics, n_draws = None, None
+            if 'values' in group:
+                stochastics = {
+                    'layer': int(group.attrs['layer']),
+                    'param': str(group.attrs['param']),
+                    'values': group['values'][()].tolist(),
+                }
+                n_draws = len(stochastics['values'])
+            result = ResultSet(
+                str(group.attrs['name']),
+                group['f'][()],
+                group['angle'][()],
+                n_draws=n_draws,
+                transmission='T' in group,
+                stochastics=stochastics
+            )
+            result.R[...] = group['R'][()]
+            if result.T is not None:
+                result.T[...] = group['T'][()]
+            resultset.append(result)
+
+        if description:
+            return (resultset, {
+                'layers': json.loads(fh.attrs['layers'], object_hook=_from_json),
+                'backing': str(fh.attrs['backing']),
+                'arguments': json.loads(fh.attrs['arguments'], object_hook=_from_json),
+            })
+    return resultset
@@ -25,6 +25,9 @@
 
 import numpy as np
 
+from pymls.analysis import Analysis
+from pymls.result import DiffuseResult
+
 
 def alpha_from_R(R):
     """ Compute the absorption coefficient from the Reflexion coefficient """
@@ -34,3 +37,189 @@ def alpha_from_R(R):
 def TL_from_T(T):
     """ Compute the Transmission Loss from the Transmission coefficient """
     return -20*np.log10(np.abs(T))
+
+
+def paris_quadrature(n, theta_max=78):
+    """
+    Gauss-Legendre rule for the diffuse-field (Paris) integral up to a limiting angle.
+
+    The diffuse-field value of an indicator `q` is the average of `q(theta)` weighted by
+    `sin(theta)cos(theta)` over [0, `theta_max`]. The returned weights include this
+    weighting and its normalisation: the diffuse-field value is `q(angles) @ weights`.
+
+    Parameters
+    ----------
+    n : int
+        Number of nodes
+    theta_max : float
+        Limiting angle, in degrees
+
+    Returns
+    -------
+    angles : ndarray
+        Angles of incidence of the nodes, in degrees
+    weights : ndarray
+        Weights of the nodes, summing to one
+    """
+    (x, w) = np.polynomial.legendre.leggauss(n)
+    theta = (x+1)/2*np.radians(theta_max)
+    weights = w*np.sin(theta)*np.cos(theta)
+    return (np.degrees(theta), weights/np.sum(weights))
+
+
+def diffuse_alpha_from_R(R, weights):
+    """ Compute the diffuse-field absorption coefficient from the Reflexion coefficients
+    at the nodes of a rule of weights `weights` (last axis of `R`), see `paris_quadrature` """
+    return alpha_from_R(R) @ weights
+
+
+def diffuse_TL_from_T(T, weights):
+    """ Compute the diffuse-field Transmission Loss from the Transmission coefficients
+    at the nodes of a rule of weights `weights` (last axis of `T`), see `paris_quadrature` """
+    return -10*np.log10(np.abs(T)**2 @ weights)
+
+
+# Gauss-Kronrod (7, 15) rule on [-1, 1]: positive half of the nodes (decreasing, the
+# Gauss nodes being the odd ones) with their Kronrod and Gauss weights
+_KRONROD_NODES = np.array([
+    0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+    0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+    0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+    0.207784955007898467600689403773245, 0.000000000000000000000000000000000,
+])
+_KRONROD_WEIGHTS = np.array([
+    0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649, 0.209482141084727828012999174891714,
+])
+_GAUSS_WEIGHTS = np.array([
+    0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+    0.381830050505118944950369775488975, 0.417959183673469387755102040816327,
+])
+
+
+def kronrod_rule():
+    """
+    Returns the 15 nodes of the Gauss-Kronrod rule on [-1, 1] with their Kronrod
+    weights and their Gauss weights (zero on the nodes of the Kronrod extension).
+    """
+    nodes = np.concatenate([-_KRONROD_NODES, _KRONROD_NODES[-2::-1]])
+    kronrod = np.concatenate([_KRONROD_WEIGHTS, _KRONROD_WEIGHTS[-2::-1]])
+    gauss = np.zeros(15)
+    gauss[1::2] = np.concatenate([_GAUSS_WEIGHTS, _GAUSS_WEIGHTS[-2::-1]])
+    return (nodes, kronrod, gauss)
+
+
+def solve_diffuse(solver, frequencies, theta_max=78, method='gauss', n_angles=8, tol=1e-4, max_rounds=10):
+    """
+    Solves the diffuse-field absorption and transmission of a system.
+
+    The indicators are integrated over the angle of incidence with the Paris
+    `sin(theta)cos(theta)` weighting up to the limiting angle `theta_max`, the
+    quadrature nodes being chosen by the solver:
+
+    - `'gauss'`: Gauss-Legendre rule of `n_angles` nodes (see
+      `pymls.utils.paris_quadrature`), the same for all frequencies;
+    - `'kronrod'`: adaptive Gauss-Kronrod (7, 15) rule, the intervals whose error
+      estimate exceeds their share of `tol` being split in two, frequency by
+      frequency, for at most `max_rounds` rounds.
+
+    All the points of a rule (or of a round) are solved at once by the vectorized
+    engine. Stochastic layers are taken with their current value.
+
+    Parameters
+    ----------
+    solver : Solver
+        System to solve
+    frequencies : list
+        Frequencies of the analysis (anything `Analysis` can parse)
+    theta_max : float
+        Limiting angle, in degrees
+    method : str
+        `'gauss'` or `'kronrod'`
+    n_angles : int
+        Number of nodes of the Gauss-Legendre rule
+    tol : float
+        Tolerance of the adaptive rule, absolute on the absorption coefficient and
+        relative on the transmission coefficient
+    max_rounds : int
+        Maximum number of refinements of the adaptive rule
+
+    Returns
+    -------
+    result : DiffuseResult
+
+    Raises
+    ------
+    ValueError
+        If the method is unknown
+    IncompleteDefinitionError
+        If the system is incomplete (missing layer or backing)
+    """
+    if method not in ['gauss', 'kronrod']:
+        raise ValueError('Unknown quadrature method: {}'.format(method))
+
+    solver.compile()
+
+    a = Analysis('diffuse', frequencies, 0)
+    freqs = a.freqs.real
+    n_freqs = len(freqs)
+
+    if method == 'gauss':
+        (angles, weights) = paris_quadrature(n_angles, theta_max)
+        (R, T) = solver._solve_batch(np.repeat(freqs, n_angles), np.tile(angles, n_freqs))
+        alpha = alpha_from_R(R.reshape((n_freqs, n_angles))) @ weights
+        tau = None if T is None else np.abs(T.reshape((n_freqs, n_angles)))**2 @ weights
+        return DiffuseResult(a.name, freqs, theta_max, alpha, tau, len(R))
+
+    (nodes, kronrod_weights, gauss_weights) = kronrod_rule()
+    theta_max_rad = np.radians(theta_max)
+    norm = np.sin(theta_max_rad)**2/2
+
+    # intervals [lower, upper] still to integrate and the frequency they belong to
+    lower = np.zeros(n_freqs)
+    upper = np.full(n_freqs, theta_max_rad)
+    owner = np.arange(n_freqs)
+
+    alpha = np.zeros(n_freqs)
+    tau = np.zeros(n_freqs) if solver.plan.transmission else None
+    tau_scale = None
+    n_points = 0
+    for i_round in range(max_rounds+1):
+        half = (upper-lower)/2
+        theta = ((upper+lower)/2).reshape((-1, 1)) + half.reshape((-1, 1))*nodes
+        (R, T) = solver._solve_batch(np.repeat(freqs[owner], len(nodes)), np.degrees(theta).ravel())
+        n_points += len(R)
+
+        weighting = np.sin(theta)*np.cos(theta)/norm
+        integrands = [alpha_from_R(R.reshape(theta.shape))*weighting]
+        if T is not None:
+            integrands.append(np.abs(T.reshape(theta.shape))**2*weighting)
+        integrals = [half*(_ @ kronrod_weights) for _ in integrands]
+        errors = [np.abs(half*(_ @ gauss_weights)-integral) for (_, integral) in zip(integrands, integrals)]
+
+        # share of the tolerance of each interval
+        share = tol*2*half/theta_max_rad
+        accepted = errors[0] <= share
+        if T is not None:
+            if tau_scale is None:
+                tau_scale = integrals[1]
+            accepted &= errors[1] <= share*tau_scale[owner]
+        if i_round == max_rounds:
+            accepted[:] = True
+
+        np.add.at(alpha, owner[accepted], integrals[0][accepted])
+        if T is not None:
+            np.add.at(tau, owner[accepted], integrals[1][accepted])
+
+        if np.all(accepted):
+            break
+        middle = (lower+upper)/2
+        (lower, upper, owner) = (
+            np.concatenate([lower[~accepted], middle[~accepted]]),
+            np.concatenate([middle[~accepted], upper[~accepted]]),
+            np.concatenate([owner[~accepted], owner[~accepted]]),
+        )
+
+    return DiffuseResult(a.name, freqs, theta_max, alpha, tau, n_points)
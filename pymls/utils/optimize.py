@@ -0,0 +1,275 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# optimize.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+import numpy as np
+
+from pymls.analysis import Analysis
+from pymls.result import OptimizationResult
+from pymls.solver import CHUNK_POINTS
+
+from .indicators import alpha_from_R, paris_quadrature
+
+try:
+    from scipy.optimize import minimize
+except ImportError:
+    minimize = None
+
+
+def surface_density(medium):
+    """ Density used for the mass per unit area of a layer of `medium`
+
+    The density of the frame (`rho_1`) is used for porous media, the mass of the
+    saturating air being neglected, and `rho` for elastic and fluid media.
+
+    Raises
+    ------
+    ValueError
+        If the medium defines neither
+    """
+    for key in ['rho_1', 'rho']:
+        value = getattr(medium, key, None)
+        if isinstance(value, (int, float)):
+            return float(value)
+    raise ValueError('Unable to find the density of medium {}'.format(medium.name))
+
+
+def maximize_bounded(evaluate, lower, upper, x0, masses=None, mass_budget=None, tol=1e-6, max_iter=100):
+    """
+    Maximizes a smooth function of bounded variables, possibly under a mass budget.
+
+    The variables are rescaled to [0, 1] between their bounds before being handed to
+    `scipy.optimize.minimize`: L-BFGS-B without budget, SLSQP with the linear
+    constraint `masses @ x <= mass_budget` otherwise.
+
+    Parameters
+    ----------
+    evaluate : function
+        Returns the value of the objective and its gradient (ndarray) at `x`
+    lower, upper : ndarray
+        Bounds of the variables
+    x0 : ndarray
+        Starting point, within the bounds
+    masses : ndarray, optional
+        Mass per unit of each variable
+    mass_budget : float, optional
+        Upper bound of `masses @ x`
+    tol : float
+        Tolerance of the optimizer
+    max_iter : int
+        Maximum number of iterations
+
+    Returns
+    -------
+    x : ndarray
+        Optimum found
+    info : scipy.optimize.OptimizeResult
+        Details of the run (`success`, `message`, `nit`, `nfev`)
+
+    Raises
+    ------
+    ImportError
+        If scipy is not installed
+    """
+    if minimize is None:
+        raise ImportError('scipy is required to optimize the system')
+
+    span = upper-lower
+
+    def objective(u):
+        (value, gradient) = evaluate(lower+u*span)
+        return (-value, -gradient*span)
+
+    options = {'maxiter': max_iter}
+    constraints = ()
+    if mass_budget is None:
+        method = 'L-BFGS-B'
+    else:
+        method = 'SLSQP'
+        constraints = ({
+            'type': 'ineq',
+            'fun': lambda u: mass_budget-masses @ (lower+u*span),
+            'jac': lambda u: -masses*span,
+        },)
+
+    info = minimize(objective, (x0-lower)/span, jac=True, method=method, bounds=[(0, 1)]*len(x0),
+                    constraints=constraints, tol=tol, options=options)
+    return (lower+np.clip(info.x, 0, 1)*span, info)
+
+
+def optimize_thicknesses(solver, frequencies, bounds, target='alpha', angles=None, theta_max=78, n_angles=8,
+                         mass_budget=None, densities=None, x0=None, tol=1e-6, max_iter=100):
+    """
+    Finds the thicknesses of layers maximizing the absorption or the transmission loss over a band.
+
+    The target is the average over the frequencies of the band of the absorption
+    coefficient (`'alpha'`) or of the transmission loss in dB (`'TL'`), taken in
+    diffuse field (Paris weighting up to `theta_max`, on the Gauss-Legendre rule of
+    `n_angles` nodes, see `pymls.utils.paris_quadrature`) or averaged over the given
+    `angles`. The transmission loss is the one of the transmission coefficient in
+    energy averaged over the angles.
+
+    Only the thicknesses change between iterations: the media and the eigen
+    decompositions of all layers are computed once, and each iteration only runs the
+    recursion with the analytic derivatives of the coefficients with respect to the
+    optimized thicknesses (see `pymls.utils.solve_sensitivities`). The iterations are driven by
+    `scipy.optimize.minimize` (see `maximize_bounded`). The
+    layers of the system are left unchanged and stochastic layers are taken with
+    their current value.
+
+    Parameters
+    ----------
+    solver : Solver
+        System to solve
+    frequencies : list
+        Frequencies of the band (anything `Analysis` can parse)
+    bounds : dict
+        `(lower, upper)` bounds of the thickness of each optimized layer, by index
+        of the layer. The other layers keep their thickness.
+    target : str
+        `'alpha'` or `'TL'`
+    angles : optional
+        Angles of incidence the target is averaged over, defaults to the diffuse field
+    theta_max : float
+        Limiting angle of the diffuse field, in degrees
+    n_angles : int
+        Number of nodes of the diffuse-field rule
+    mass_budget : float, optional
+        Upper bound of the mass per unit area of the system (in kg/m²)
+    densities : dict, optional
+        Densities of layers by index, overriding the ones of their media (see
+        `surface_density`)
+    x0 : list, optional
+        Starting thicknesses of the optimized layers, defaults to their current
+        thicknesses
+    tol : float
+        Tolerance of the optimizer
+    max_iter : int
+        Maximum number of iterations
+
+    Returns
+    -------
+    result : OptimizationResult
+
+    Raises
+    ------
+    ValueError
+        If the target is unknown, if the transmission loss is asked for a rigid
+        backing, if the bounds are invalid or if the mass budget cannot be met
+    ImportError
+        If scipy is not installed
+    IncompleteDefinitionError
+        If the system is incomplete (missing layer or backing)
+    """
+    if minimize is None:
+        raise ImportError('scipy is required to optimize the system')
+    if target not in ['alpha', 'TL']:
+        raise ValueError('Unknown target: {}'.format(target))
+
+    solver.compile()
+
+    if target == 'TL' and not solver.plan.transmission:
+        raise ValueError('The transmission loss requires a transmission backing')
+
+    layer_ids = sorted(bounds)
+    if len(layer_ids) == 0:
+        raise ValueError('No thickness to optimize')
+    lower = np.array([bounds[_][0] for _ in layer_ids], dtype=float)
+    upper = np.array([bounds[_][1] for _ in layer_ids], dtype=float)
+    if np.any(lower < 0) or np.any(lower >= upper):
+        raise ValueError('Thickness bounds must satisfy 0 <= lower < upper')
+
+    if x0 is None:
+        x0 = [solver.layers[_].thickness for _ in layer_ids]
+    x0 = np.clip(np.asarray(x0, dtype=float), lower, upper)
+
+    (masses, fixed_mass) = (None, 0)
+    if mass_budget is not None:
+        densities = densities or {}
+        rho = np.array([
+            densities[i_L] if i_L in densities else surface_density(L.medium)
+            for (i_L, L) in enumerate(solver.layers)
+        ])
+        fixed = np.array([_ not in bounds for _ in range(len(solver.layers))])
+        fixed_mass = rho[fixed] @ np.array([L.thickness for L in solver.layers])[fixed]
+        masses = rho[layer_ids]
+        if fixed_mass+masses @ lower > mass_budget:
+            raise ValueError('The mass budget cannot be met within the thickness bounds')
+
+    a = Analysis('optimization', frequencies, 0)
+    freqs = a.freqs.real
+    if angles is None:
+        (angles, weights) = paris_quadrature(n_angles, theta_max)
+    else:
+        angles = np.atleast_1d(np.asarray(angles, dtype=float))
+        weights = np.full(len(angles), 1/len(angles))
+
+    # state of the layers on each block of frequencies, computed once
+    blocks = []
+    block_size = max(1, CHUNK_POINTS//len(angles))
+    for start in range(0, len(freqs), block_size):
+        block = freqs[start:start+block_size]
+        (omega, k_x, states) = solver._stack_layers(np.repeat(block, len(angles)), np.tile(angles, len(block)))
+        tangents = [(None, None)]*len(solver.layers)
+        for (i_p, l_id) in enumerate(layer_ids):
+            d_thickness = np.zeros((len(layer_ids), len(omega)))
+            d_thickness[i_p] = 1
+            tangents[l_id] = (d_thickness, None)
+        blocks.append((omega, k_x, states, tangents))
+
+    n_evaluations = [0]
+
+    def evaluate(thicknesses):
+        n_evaluations[0] += 1
+        (values, gradients) = ([], [])
+        for (omega, k_x, states, tangents) in blocks:
+            states = list(states)
+            for (l_id, thickness) in zip(layer_ids, thicknesses):
+                states[l_id] = (np.full(len(omega), thickness),)+states[l_id][1:]
+            (R, T, d_R, d_T) = solver._tangent_recursion_batch(omega, k_x, states, tangents, len(layer_ids))
+
+            shape = (-1, len(angles))
+            if target == 'alpha':
+                values.append(alpha_from_R(R.reshape(shape)) @ weights)
+                gradients.append(-2*np.real(np.conj(R)*d_R).reshape((len(layer_ids),)+shape) @ weights)
+            else:
+                tau = np.abs(T.reshape(shape))**2 @ weights
+                d_tau = 2*np.real(np.conj(T)*d_T).reshape((len(layer_ids),)+shape) @ weights
+                values.append(-10*np.log10(tau))
+                gradients.append(-10/np.log(10)*d_tau/tau)
+        return (np.mean(np.concatenate(values)), np.mean(np.concatenate(gradients, axis=1), axis=1))
+
+    (x, info) = maximize_bounded(evaluate, lower, upper, x0, masses,
+                                 None if mass_budget is None else mass_budget-fixed_mass,
+                                 tol=tol, max_iter=max_iter)
+    (objective, gradient) = evaluate(x)
+
+    thicknesses = [float(L.thickness) for L in solver.layers]
+    for (l_id, thickness) in zip(layer_ids, x):
+        thicknesses[l_id] = float(thickness)
+
+    return OptimizationResult(
+        target, freqs, angles, layer_ids, thicknesses, float(objective), gradient,
+        None if mass_budget is None else float(fixed_mass+masses @ x),
+        bool(info.success), str(info.message), int(info.nit), n_evaluations[0]
+    )
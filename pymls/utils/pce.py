@@ -0,0 +1,311 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# pce.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+
+from math import factorial
+
+import numpy as np
+
+from pymls.analysis import Analysis
+from pymls.layers import StochasticLayer
+
+from .indicators import alpha_from_R, TL_from_T
+from .distributions import Distribution
+
+
+def germ_quadrature(germ, n):
+    """
+    Gauss quadrature of `n` nodes for the probability measure of a germ.
+
+    Returns
+    -------
+    nodes : ndarray
+        Values of the germ
+    weights : ndarray
+        Probabilities of the nodes, summing to one
+    """
+    if germ == 'hermite':
+        (nodes, weights) = np.polynomial.hermite_e.hermegauss(n)
+    elif germ == 'legendre':
+        (nodes, weights) = np.polynomial.legendre.leggauss(n)
+    else:
+        raise ValueError('Unknown germ: {}'.format(germ))
+    return (nodes, weights/np.sum(weights))
+
+
+def germ_basis(germ, xi, order):
+    """
+    Values of the orthonormal polynomials of a germ up to degree `order` at `xi`.
+
+    The polynomials are the probabilists' Hermite polynomials for a standard normal
+    germ and the Legendre polynomials for a uniform germ, normalised so that
+    `E[psi_i psi_j] = delta_ij`.
+
+    Returns
+    -------
+    psi : ndarray
+        Values of the polynomials, of shape (len(xi), order+1)
+    """
+    xi = np.asarray(xi, dtype=float)
+    if germ == 'hermite':
+        basis = np.polynomial.hermite_e.hermevander(xi, order)
+        norms = np.sqrt([factorial(k) for k in range(order+1)])
+    elif germ == 'legendre':
+        basis = np.polynomial.legendre.legvander(xi, order)
+        norms = 1/np.sqrt(2*np.arange(order+1)+1)
+    else:
+        raise ValueError('Unknown germ: {}'.format(germ))
+    return basis/norms
+
+
+def germ_samples(germ, size, rng):
+    """ Draws `size` values of a germ with the NumPy generator `rng` """
+    if germ == 'hermite':
+        return rng.standard_normal(size)
+    elif germ == 'legendre':
+        return rng.uniform(-1, 1, size)
+    raise ValueError('Unknown germ: {}'.format(germ))
+
+
+class PolynomialChaos(object):
+    """
+    Polynomial chaos expansion of a quantity in one germ.
+
+    Parameters
+    ----------
+
+    germ : str
+        `'hermite'` or `'legendre'`, see `pymls.utils.distributions.Distribution`
+    coefficients : ndarray
+        Coefficients on the orthonormal polynomials of the germ, of shape
+        (order+1, ...) (the other axes being the ones of the quantity)
+    """
+
+    def __init__(self, germ, coefficients):
+        self.germ = germ
+        self.coefficients = coefficients
+
+    @classmethod
+    def fit(cls, germ, xi, values, order, weights=None):
+        """
+        Computes the expansion of degree `order` from `values` (of shape (len(xi), ...))
+        at the germ values `xi`, by quadrature if the `weights` of the nodes are given
+        and by least squares regression otherwise.
+        """
+        psi = germ_basis(germ, xi, order)
+        values = np.asarray(values)
+        flat = values.reshape((len(xi), -1))
+        if weights is not None:
+            coefficients = psi.T @ (np.reshape(weights, (-1, 1))*flat)
+        else:
+            coefficients = np.linalg.lstsq(psi, flat, rcond=None)[0]
+        return cls(germ, coefficients.reshape((order+1,)+values.shape[1:]))
+
+    @property
+    def order(self):
+        return len(self.coefficients)-1
+
+    def __call__(self, xi):
+        """ Evaluates the expansion at the germ values `xi`, as an array of shape (len(xi), ...) """
+        return np.tensordot(germ_basis(self.germ, xi, self.order), self.coefficients, 1)
+
+    def mean(self):
+        return self.coefficients[0]
+
+    def variance(self):
+        return np.sum(np.abs(self.coefficients[1:])**2, axis=0)
+
+    def sample(self, size, seed=None):
+        """ Evaluates the expansion at `size` values of the germ drawn from a generator seeded by `seed` """
+        return self(germ_samples(self.germ, size, np.random.default_rng(seed)))
+
+
+class PCEResult(object):
+    """
+    Polynomial chaos expansions of the results of a stochastic layer, see `solve_pce`.
+
+    Expansions are computed for the reflection (`'R'`) and transmission (`'T'`)
+    coefficients and for the absorption coefficient (`'alpha'`) and transmission loss
+    (`'TL'`), each being of shape (n_freq, n_angle).
+
+    Attributes
+    ----------
+
+    name : str
+        Name of the analysis
+    f : ndarray
+        Frequencies of the analysis
+    angle : ndarray
+        Angles of the analysis
+    stochastics : dict
+        Stochastic layer (`layer`), parameter (`param`), distribution (`distribution`)
+        and the `values` of the parameter solved
+    expansions : dict
+        `PolynomialChaos` of each quantity
+    """
+
+    def __init__(self, name, freqs, angles, stochastics, expansions):
+        self.name = name
+        self.f = freqs
+        self.angle = angles
+        self.stochastics = stochastics
+        self.expansions = expansions
+
+    @classmethod
+    def fit(cls, name, freqs, angles, stochastics, germ, xi, R, T, order, weights=None):
+        """ Fits the expansions from the coefficients `R` and `T` (of shape (len(xi), n_freq, n_angle)) """
+        values = {'R': R, 'alpha': alpha_from_R(R)}
+        if T is not None:
+            values.update(T=T, TL=TL_from_T(T))
+        expansions = {
+            key: PolynomialChaos.fit(germ, xi, value, order, weights) for (key, value) in values.items()
+        }
+        return cls(name, freqs, angles, stochastics, expansions)
+
+    def mean(self, key):
+        """ Mean of `key` """
+        return self.expansions[key].mean()
+
+    def variance(self, key):
+        """ Variance of `key` (of its modulus for complex quantities) """
+        return self.expansions[key].variance()
+
+    def std(self, key):
+        """ Standard deviation of `key` """
+        return np.sqrt(self.variance(key))
+
+    def quantiles(self, key, q, n_samples=10000, seed=None):
+        """
+        Quantiles `q` of `key`, for complex quantities of its modulus, estimated from
+        `n_samples` evaluations of the expansion.
+
+        Returns
+        -------
+        quantiles : ndarray
+            Quantiles, of shape (len(q), n_freq, n_angle) (without the first axis for a
+            scalar `q`)
+        """
+        samples = self.expansions[key].sample(n_samples, seed)
+        if np.iscomplexobj(samples):
+            samples = np.abs(samples)
+        return np.quantile(samples, q, axis=0)
+
+    def __repr__(self):
+        return '<PCEResult {!r} of layer {}, {}: order {}>'.format(
+            self.name,
+            self.stochastics['layer'],
+            self.stochastics['param'],
+            self.expansions['R'].order
+        )
+
+
+def solve_pce(solver, frequencies, angles=0, order=4, method='quadrature', n_points=None, seed=None):
+    """
+    Solves a stochastic analysis by non-intrusive polynomial chaos expansion.
+
+    Instead of drawing the stochastic parameter `n_draws` times, the system is
+    solved at a few values of the parameter only, and the coefficients and
+    indicators are expanded on the orthonormal polynomials of its distribution (see
+    `PolynomialChaos`):
+
+    - `'quadrature'`: the values are the `n_points` (default `order+1`) nodes of the
+      Gauss quadrature of the distribution, the expansion being obtained by
+      projection;
+    - `'regression'`: the values are `n_points` (default `2*(order+1)`) samples of the
+      distribution, drawn from a generator seeded by `seed`, the expansion being
+      fitted by least squares.
+
+    As with `Solver.solve`, each stochastic layer is analysed separately, all the values
+    being solved at once by the vectorized engine. The pdf of the stochastic layers
+    must be a `pymls.utils.distributions.Distribution`.
+
+    Parameters
+    ----------
+    solver : Solver
+        System to solve
+    frequencies : list
+        Frequencies of the analysis (anything `Analysis` can parse)
+    angles : optional
+        Angles of incidence of the analysis, defaults to 0
+    order : int
+        Degree of the expansions
+    method : str
+        `'quadrature'` or `'regression'`
+    n_points : int, optional
+        Number of values of the parameter solved
+    seed : optional
+        Seed of the samples of the regression
+
+    Returns
+    -------
+    result : PCEResult or list of PCEResult
+        Expansions for each stochastic layer (a single one if there is only one
+        stochastic layer)
+
+    Raises
+    ------
+    ValueError
+        If the method is unknown, if there is no stochastic layer or if the pdf of a
+        stochastic layer is not a `Distribution`
+    IncompleteDefinitionError
+        If the system is incomplete (missing layer or backing)
+    """
+    if method not in ['quadrature', 'regression']:
+        raise ValueError('Unknown expansion method: {}'.format(method))
+
+    solver.compile()
+
+    stochastic_layers = [(l_id, l) for (l_id, l) in enumerate(solver.layers) if isinstance(l, StochasticLayer)]
+    if not stochastic_layers:
+        raise ValueError('Polynomial chaos expansions need at least one stochastic layer')
+
+    a = Analysis('pce', frequencies, angles, True)
+    shape = (len(a.freqs), len(a.angles))
+
+    results = []
+    for (l_id, l) in stochastic_layers:
+        distribution = l.pdf
+        if not isinstance(distribution, Distribution):
+            raise ValueError('The pdf of layer {} is not a Distribution'.format(l_id))
+
+        if method == 'quadrature':
+            (xi, weights) = germ_quadrature(distribution.germ, n_points or order+1)
+        else:
+            xi = germ_samples(distribution.germ, n_points or 2*(order+1), np.random.default_rng(seed))
+            weights = None
+
+        values = [float(_) for _ in distribution.transform(xi)]
+        ((_, R, T),) = solver._solve_draw_chunks(a, l_id, [values])
+        l.reinit()
+
+        results.append(PCEResult.fit(
+            a.name, a.freqs, a.angles,
+            {'layer': l_id, 'param': l.stochastic_param, 'distribution': distribution, 'values': values},
+            distribution.germ, xi,
+            R.T.reshape((len(xi),)+shape),
+            None if T is None else T.T.reshape((len(xi),)+shape),
+            order, weights
+        ))
+
+    return results[0] if len(results) == 1 else results
@@ -0,0 +1,217 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# rational.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+
+import numpy as np
+
+from pymls.result import ResultSet
+
+
+class RationalApproximant(object):
+    """
+    Rational function in barycentric form, as built by `aaa`.
+
+    `r(z) = sum(weights*values/(z-support)) / sum(weights/(z-support))`, which
+    interpolates `values` at the `support` points.
+
+    Attributes
+    ----------
+
+    support : ndarray
+        Support points
+    values : ndarray
+        Values at the support points
+    weights : ndarray
+        Barycentric weights
+    error : float
+        Maximum error on the fitted samples
+    """
+
+    def __init__(self, support, values, weights, error):
+        self.support = support
+        self.values = values
+        self.weights = weights
+        self.error = error
+
+    def __call__(self, z):
+        z = np.asarray(z)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            C = 1/(z.reshape((-1, 1))-self.support)
+            r = (C @ (self.weights*self.values))/(C @ self.weights)
+
+        # exact values on the support points
+        (i_z, i_s) = np.nonzero(z.reshape((-1, 1)) == self.support)
+        r[i_z] = self.values[i_s]
+
+        return r.reshape(z.shape)
+
+
+def aaa(z, f, tol=1e-13, max_terms=100):
+    """
+    Fits a rational approximant to the samples `f` at the points `z` with the AAA
+    algorithm (Nakatsukasa, Sète & Trefethen, SIAM J. Sci. Comput., 2018).
+
+    Support points are added one at a time where the current approximant is the
+    furthest from the samples, the weights being given at each step by the smallest
+    singular vector of the Loewner matrix of the remaining samples.
+
+    Parameters
+    ----------
+    z : array_like
+        Sample points
+    f : array_like
+        Samples
+    tol : float
+        Relative tolerance on the samples (to their maximum modulus)
+    max_terms : int
+        Maximum number of support points
+
+    Returns
+    -------
+    r : RationalApproximant
+
+    Raises
+    ------
+    ValueError
+        If there are less than 2 samples, not as many as points, or if `max_terms` is
+        lower than 1
+    """
+
+    z = np.asarray(z, dtype=np.complex128).ravel()
+    f = np.asarray(f, dtype=np.complex128).ravel()
+    M = len(z)
+    if len(f) != M:
+        raise ValueError('Got {} samples for {} points'.format(len(f), M))
+    if M < 2:
+        raise ValueError('The AAA algorithm needs at least 2 samples')
+    if max_terms < 1:
+        raise ValueError('The approximant needs at least one support point')
+
+    free = np.ones(M, dtype=bool)  # samples that are not support points
+    C = np.empty((M, 0), dtype=np.complex128)
+    support = []
+    r = np.full(M, np.mean(f))
+    threshold = tol*np.max(np.abs(f))
+
+    for _ in range(min(max_terms, M-1)):
+        j = np.argmax(np.where(free, np.abs(f-r), -1))
+        support.append(j)
+        free[j] = False
+
+        # the rows of the support points are infinite but never used
+        with np.errstate(divide='ignore', invalid='ignore'):
+            C = np.hstack([C, (1/(z-z[j])).reshape((-1, 1))])
+            loewner = (f.reshape((-1, 1))-f[support])*C
+
+        weights = np.linalg.svd(loewner[free])[2][-1].conj()
+
+        r = f.copy()
+        r[free] = (C[free] @ (weights*f[support]))/(C[free] @ weights)
+
+        error = np.max(np.abs(f-r))
+        if error <= threshold:
+            break
+
+    return RationalApproximant(z[support], f[support], weights, error)
+
+
+class Surrogate(object):
+    """
+    Rational surrogate of the coefficients of a deterministic result.
+
+    For each angle of incidence, `R(f)` and `T(f)` are approximated by a rational
+    function of the frequency (see `aaa`), which can then be evaluated on grids of any
+    density at a negligible cost.
+
+    The error is estimated by cross-validation: a second surrogate is fitted on one
+    frequency out of two and its maximum error on the other ones is reported. As it is
+    built from half the samples, this estimate is usually pessimistic.
+
+    Parameters
+    ----------
+
+    result : ResultSet
+        Deterministic result (see `Solver.solve`), of at least 4 frequencies
+    tol : float
+        Relative tolerance of the fits, see `aaa`
+    max_terms : int, optional
+        Maximum number of support points of the fits, defaults to half the number of
+        frequencies
+
+    Attributes
+    ----------
+
+    approximants : dict
+        List of `RationalApproximant` (one per angle) for `R` and `T`
+    error : dict
+        Estimated maximum error for each angle (ndarray of shape (n_angle,)) on `R` and
+        `T`
+    """
+
+    def __init__(self, result, tol=1e-10, max_terms=None):
+        if result.enable_stochastic:
+            raise ValueError('Surrogates are only available for deterministic results')
+        freqs = np.asarray(result.f).real
+        if len(freqs) < 4:
+            raise ValueError('At least 4 frequencies are needed to fit a surrogate')
+
+        self.name = result.name
+        self.angle = result.angle
+        max_terms = max_terms or len(freqs)//2
+
+        self.approximants = {}
+        self.error = {}
+        for key in ['R', 'T'] if result.T is not None else ['R']:
+            values = getattr(result, key)
+            self.approximants[key] = [
+                aaa(freqs, values[:, i_a], tol, max_terms) for i_a in range(len(self.angle))
+            ]
+            self.error[key] = np.array([
+                np.max(np.abs(aaa(freqs[::2], values[::2, i_a], tol, max_terms)(freqs[1::2]) - values[1::2, i_a]))
+                for i_a in range(len(self.angle))
+            ])
+
+    def __call__(self, key, freqs):
+        """ Evaluates the surrogate of `key` (`R` or `T`) at `freqs`, as an array of shape (n_freq, n_angle) """
+        freqs = np.asarray(freqs, dtype=float)
+        return np.stack([r(freqs) for r in self.approximants[key]], axis=-1)
+
+    def evaluate(self, freqs):
+        """
+        Evaluates the surrogate on the frequencies `freqs`.
+
+        Returns
+        -------
+        result : ResultSet
+            Approximated coefficients, from which `alpha` and `TL` are derived as for
+            solved results
+        """
+        freqs = np.asarray(freqs, dtype=float)
+        transmission = 'T' in self.approximants
+        result = ResultSet(self.name, freqs, self.angle, transmission=transmission)
+        result.store(
+            self('R', freqs).ravel(),
+            self('T', freqs).ravel() if transmission else None
+        )
+        return result
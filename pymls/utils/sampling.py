@@ -0,0 +1,204 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# sampling.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+
+import numpy as np
+
+
+# Direction numbers of Joe & Kuo (new-joe-kuo-6.21201) for the dimensions 2 to 16:
+# degree s and coefficients a of the primitive polynomial, initial numbers m
+SOBOL_DIRECTIONS = [
+    (1, 0, [1]),
+    (2, 1, [1, 3]),
+    (3, 1, [1, 3, 1]),
+    (3, 2, [1, 1, 1]),
+    (4, 1, [1, 1, 3, 3]),
+    (4, 4, [1, 3, 5, 13]),
+    (5, 2, [1, 1, 5, 5, 17]),
+    (5, 4, [1, 1, 5, 5, 5]),
+    (5, 7, [1, 1, 7, 11, 19]),
+    (5, 11, [1, 1, 5, 1, 1]),
+    (5, 13, [1, 1, 1, 3, 11]),
+    (5, 14, [1, 3, 5, 5, 31]),
+    (6, 1, [1, 3, 3, 9, 7, 49]),
+    (6, 13, [1, 1, 1, 15, 21, 21]),
+    (6, 16, [1, 3, 1, 13, 27, 49]),
+]
+
+# number of bits of the Sobol points
+SOBOL_BITS = 30
+
+PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53]
+
+
+def _sobol_directions(d):
+    """ Returns the direction numbers of the `d` first dimensions, of shape (d, SOBOL_BITS) """
+    if d > len(SOBOL_DIRECTIONS)+1:
+        raise ValueError('Sobol sequences are available up to {} dimensions'.format(len(SOBOL_DIRECTIONS)+1))
+
+    V = np.zeros((d, SOBOL_BITS), dtype=np.int64)
+    # first dimension: van der Corput sequence in base 2
+    V[0] = 1 << np.arange(SOBOL_BITS-1, -1, -1)
+    for j in range(1, d):
+        (s, a, m) = SOBOL_DIRECTIONS[j-1]
+        v = [m_k << (SOBOL_BITS-1-k) for (k, m_k) in enumerate(m)]
+        for k in range(s, SOBOL_BITS):
+            value = v[k-s] ^ (v[k-s] >> s)
+            for i in range(1, s):
+                if (a >> (s-1-i)) & 1:
+                    value ^= v[k-i]
+            v.append(value)
+        V[j] = v[:SOBOL_BITS]
+    return V
+
+
+def sobol(n, d=1, scramble=True, seed=None):
+    """
+    Points of a Sobol sequence in [0, 1)^d (Gray code order, the first point being 0
+    when unscrambled).
+
+    If `scramble` is set, the sequence is randomised by a linear matrix scrambling and
+    a digital shift, which keeps its low discrepancy and makes the points (and their
+    mean) unbiased. Balance properties are best kept for `n` a power of 2.
+
+    Parameters
+    ----------
+    n : int
+        Number of points
+    d : int
+        Number of dimensions (up to 16)
+    scramble : bool
+        Whether to scramble the sequence
+    seed : optional
+        Seed of the scrambling
+
+    Returns
+    -------
+    points : ndarray
+        Points, of shape (n, d)
+    """
+    V = _sobol_directions(d)
+
+    if scramble:
+        rng = np.random.default_rng(seed)
+        # random lower triangular bit matrices with unit diagonal, applied to each
+        # direction number (bit i of the matrix row applied to bit i from the top)
+        bits = SOBOL_BITS
+        for j in range(d):
+            L = np.tril(rng.integers(0, 2, (bits, bits)), -1) + np.eye(bits, dtype=np.int64)
+            digits = (V[j, :, np.newaxis] >> np.arange(bits-1, -1, -1)) & 1  # (direction, bit)
+            digits = (digits @ L.T) % 2
+            V[j] = digits @ (1 << np.arange(bits-1, -1, -1))
+        shift = rng.integers(0, 1 << SOBOL_BITS, d)
+    else:
+        shift = np.zeros(d, dtype=np.int64)
+
+    points = np.zeros((n, d), dtype=np.int64)
+    x = shift.copy()
+    for i in range(n):
+        points[i] = x
+        # index of the lowest zero bit of i
+        c = (~i & (i+1)).bit_length()-1
+        x = x ^ V[:, c]
+    return points/(1 << SOBOL_BITS)
+
+
+def halton(n, d=1, scramble=True, seed=None):
+    """
+    Points of a Halton sequence in [0, 1)^d, skipping the first point (0).
+
+    If `scramble` is set, the digits of each dimension are permuted by a random
+    permutation keeping 0.
+
+    Parameters
+    ----------
+    n : int
+        Number of points
+    d : int
+        Number of dimensions (up to 16)
+    scramble : bool
+        Whether to scramble the sequence
+    seed : optional
+        Seed of the scrambling
+
+    Returns
+    -------
+    points : ndarray
+        Points, of shape (n, d)
+    """
+    if d > len(PRIMES):
+        raise ValueError('Halton sequences are available up to {} dimensions'.format(len(PRIMES)))
+
+    rng = np.random.default_rng(seed)
+    points = np.zeros((n, d))
+    indices = np.arange(1, n+1)
+    for j in range(d):
+        base = PRIMES[j]
+        permutation = np.arange(base)
+        if scramble:
+            permutation[1:] = rng.permutation(np.arange(1, base))
+
+        remaining = indices.copy()
+        scale = 1.0
+        while np.any(remaining > 0):
+            scale /= base
+            points[:, j] += permutation[remaining % base]*scale
+            remaining //= base
+    return points
+
+
+def latin_hypercube(n, d=1, seed=None):
+    """
+    Latin hypercube sample of `n` points in [0, 1)^d: each dimension has exactly one
+    point in each of the `n` intervals [k/n, (k+1)/n), at a random position.
+
+    Returns
+    -------
+    points : ndarray
+        Points, of shape (n, d)
+    """
+    rng = np.random.default_rng(seed)
+    strata = np.stack([rng.permutation(n) for _ in range(d)], axis=-1)
+    return (strata+rng.random((n, d)))/n
+
+
+def random(n, d=1, seed=None):
+    """ Pseudo-random points in [0, 1)^d from a generator seeded by `seed` """
+    return np.random.default_rng(seed).random((n, d))
+
+
+def sample(method, n, d=1, scramble=True, seed=None):
+    """
+    Returns `n` points in [0, 1)^d from the sampler `method`: `'sobol'`, `'halton'`,
+    `'lhs'` (Latin hypercube) or `'random'`.
+    """
+    if method == 'sobol':
+        return sobol(n, d, scramble, seed)
+    elif method == 'halton':
+        return halton(n, d, scramble, seed)
+    elif method == 'lhs':
+        return latin_hypercube(n, d, seed)
+    elif method == 'random':
+        return random(n, d, seed)
+    raise ValueError('Unknown sampling method: {}'.format(method))
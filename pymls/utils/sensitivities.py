@@ -0,0 +1,116 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# sensitivities.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+import numpy as np
+
+from pymls.analysis import Analysis
+from pymls.result import ResultSet, SensitivityResult
+from pymls.solver import CHUNK_POINTS
+
+
+def solve_sensitivities(solver, frequencies, angles=0, parameters=None, step=1e-6, block_size=None):
+    """
+    Solves a deterministic analysis and the derivatives of its results with respect to parameters of the system.
+
+    The derivatives are obtained in forward mode: the recursion is run once, with
+    the tangents of all the parameters propagated alongside through the interface
+    and propagation kernels (`generic_interface_tangent`,
+    `generic_tangent_batch`). The derivatives with respect to thicknesses are
+    analytic. The media being computed by mediapack, the derivatives of their
+    frequency-dependent state (and of the eigen decomposition of the layer) with
+    respect to a medium parameter are obtained by central differences of relative
+    `step`, which involve neither the recursion nor the other layers (the perturbed
+    modes being matched to the unperturbed ones, see `modal_sort`). A medium
+    parameter only has an effect if the medium reads it when updated for a frequency
+    (for instance, the Young's modulus of an elastic medium is read once at its
+    creation and its derivative is zero).
+
+    Parameters
+    ----------
+    solver : Solver
+        System to solve
+    frequencies : list
+        Frequencies of the analysis (anything `Analysis` can parse)
+    angles : optional
+        Angles of incidence of the analysis, defaults to 0
+    parameters : list of tuple, optional
+        `(layer_id, param)` couples, `param` being `'thickness'` or a parameter of the
+        medium of the layer. Defaults to the thicknesses of all the layers.
+    step : float
+        Relative step of the central differences on medium parameters
+    block_size : int, optional
+        Number of frequencies solved together, see `Solver.solve`
+
+    Returns
+    -------
+    result : ResultSet
+        Reflection and transmission coefficients
+    sensitivities : SensitivityResult
+        Derivatives of the coefficients and indicators with respect to `parameters`
+
+    Raises
+    ------
+    ValueError
+        If a parameter is undefined in its layer, or is a medium parameter of a
+        layer identical to the transmission medium (through which the recursion
+        is singular) or of a layer with degenerate eigenvalues
+    IncompleteDefinitionError
+        If the system is incomplete (missing layer or backing)
+    """
+    solver.check_is_complete()
+
+    if parameters is None:
+        parameters = [(l_id, 'thickness') for l_id in range(len(solver.layers))]
+    for (l_id, param) in parameters:
+        medium = solver.layers[l_id].medium
+        if param != 'thickness' and param not in dict(medium.EXPECTED_PARAMS+medium.OPT_PARAMS):
+            raise ValueError('Unable to differentiate with respect to a parameter undefined in the layer')
+
+    # the transparency of the differentiated media is checked on each stacked point,
+    # the recursion through a layer identical to air being singular
+    solver.compile(varied=[l_id for (l_id, param) in parameters if param != 'thickness'])
+
+    a = Analysis('sensitivities', frequencies, angles)
+    n_angles = len(a.angles)
+    result = ResultSet(a.name, a.freqs, a.angles, transmission=solver.plan.transmission)
+    shape = (len(a.freqs), n_angles, len(parameters))
+    d_R = np.zeros(shape, dtype=np.complex128)
+    d_T = np.zeros(shape, dtype=np.complex128) if solver.plan.transmission else None
+
+    block_size = block_size or max(1, CHUNK_POINTS//n_angles)
+    for start in range(0, len(a.freqs), block_size):
+        freqs = a.freqs[start:start+block_size]
+        (omega, k_x, states) = solver._stack_layers(np.repeat(freqs, n_angles), np.tile(a.angles, len(freqs)))
+        tangents = solver._stack_tangents(omega, k_x, states, parameters, step)
+
+        (R, T, d_R_block, d_T_block) = solver._tangent_recursion_batch(
+            omega, k_x, states, tangents, len(parameters))
+
+        points = slice(start*n_angles, (start+len(freqs))*n_angles)
+        result.store(R, T, points=points)
+        d_R[start:start+len(freqs)] = d_R_block.T.reshape((len(freqs), n_angles, -1))
+        if d_T is not None:
+            d_T[start:start+len(freqs)] = d_T_block.T.reshape((len(freqs), n_angles, -1))
+
+    return (result, SensitivityResult(result, list(parameters), d_R, d_T))
@@ -0,0 +1,296 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# statistics.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+
+import numpy as np
+
+from pymls.layers import StochasticLayer
+
+from .indicators import alpha_from_R, TL_from_T
+from .distributions import norm_ppf
+
+
+class Welford(object):
+    """
+    Streaming mean and variance of samples of shape `shape` (Welford's algorithm,
+    extended to batches by Chan's update).
+
+    Complex samples are supported, their variance being the one of their modulus
+    (`E|x-mean|^2`).
+    """
+
+    def __init__(self, shape, dtype=np.float64):
+        self.count = 0
+        self.mean = np.zeros(shape, dtype=dtype)
+        self.M2 = np.zeros(shape)
+
+    def update(self, samples):
+        """ Adds `samples`, of shape `shape + (n,)` """
+        n = samples.shape[-1]
+        if n == 0:
+            return
+        mean = samples.mean(axis=-1)
+        M2 = np.sum(np.abs(samples-mean[..., np.newaxis])**2, axis=-1)
+
+        total = self.count+n
+        delta = mean-self.mean
+        self.mean = self.mean+delta*n/total
+        self.M2 = self.M2+M2+np.abs(delta)**2*self.count*n/total
+        self.count = total
+
+    def variance(self, ddof=1):
+        """ Variance of the samples (unbiased by default) """
+        if self.count <= ddof:
+            return np.full(self.M2.shape, np.nan)
+        return self.M2/(self.count-ddof)
+
+    def std_error(self):
+        """ Standard error of the mean """
+        return np.sqrt(self.variance()/self.count)
+
+
+class P2Quantile(object):
+    """
+    Streaming estimate of the quantile `p` of samples of shape `shape`, with the P²
+    algorithm (Jain & Chlamtac, Commun. ACM, 1985): five markers per element are moved
+    with each sample, so that neither the samples nor their distribution are stored.
+    """
+
+    def __init__(self, p, shape):
+        self.p = p
+        self.count = 0
+        self.heights = np.zeros((5,)+tuple(shape))
+        self.positions = np.tile(np.arange(1., 6.).reshape((5,)+(1,)*len(shape)), (1,)+tuple(shape))
+        self.desired = np.array([1, 1+2*p, 1+4*p, 3+2*p, 5])
+        self.increments = np.array([0, p/2, p, (1+p)/2, 1])
+
+    def update(self, samples):
+        """ Adds `samples`, of shape `shape + (n,)` """
+        for i in range(samples.shape[-1]):
+            self.add(samples[..., i])
+
+    def add(self, x):
+        """ Adds one sample `x`, of shape `shape` """
+        q = self.heights
+        n = self.positions
+
+        if self.count < 5:
+            q[self.count] = x
+            self.count += 1
+            if self.count == 5:
+                q.sort(axis=0)
+            return
+        self.count += 1
+
+        # cell of x, extreme markers being moved to it if needed
+        q[0] = np.minimum(q[0], x)
+        q[4] = np.maximum(q[4], x)
+        k = np.clip(np.sum(x >= q[1:4], axis=0), 0, 3)
+        n += np.arange(5).reshape((5,)+(1,)*x.ndim) > k
+        self.desired = self.desired+self.increments
+
+        for i in [1, 2, 3]:
+            d = self.desired[i]-n[i]
+            move = ((d >= 1) & (n[i+1]-n[i] > 1)) | ((d <= -1) & (n[i-1]-n[i] < -1))
+            d = np.sign(d)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                right = (n[i]-n[i-1]+d)*(q[i+1]-q[i])/(n[i+1]-n[i])
+                left = (n[i+1]-n[i]-d)*(q[i]-q[i-1])/(n[i]-n[i-1])
+                parabolic = q[i] + d/(n[i+1]-n[i-1])*(right+left)
+                linear = np.where(
+                    d > 0,
+                    q[i]+(q[i+1]-q[i])/(n[i+1]-n[i]),
+                    q[i]-(q[i-1]-q[i])/(n[i-1]-n[i])
+                )
+            height = np.where((q[i-1] < parabolic) & (parabolic < q[i+1]), parabolic, linear)
+
+            q[i] = np.where(move, height, q[i])
+            n[i] = np.where(move, n[i]+d, n[i])
+
+    def value(self):
+        """ Current estimate of the quantile """
+        if self.count < 5:
+            if self.count == 0:
+                return np.full(self.heights.shape[1:], np.nan)
+            return np.quantile(self.heights[:self.count], self.p, axis=0)
+        return self.heights[2]
+
+
+class OnlineStatistics(object):
+    """
+    Streaming statistics of the results of a stochastic layer, see `solve_online`.
+
+    Means and variances are accumulated for the reflection (`'R'`) and transmission
+    (`'T'`) coefficients and for the absorption coefficient (`'alpha'`) and
+    transmission loss (`'TL'`), and quantiles for `alpha` and `TL`, each being of shape
+    (n_freq, n_angle).
+
+    Attributes
+    ----------
+
+    name : str
+        Name of the analysis
+    f : ndarray
+        Frequencies of the analysis
+    angle : ndarray
+        Angles of the analysis
+    stochastics : dict
+        Stochastic layer (`layer`) and parameter (`param`)
+    n_draws : int
+        Number of draws accumulated
+    converged : bool
+        Whether the run was stopped by the tolerance
+    """
+
+    def __init__(self, name, freqs, angles, stochastics, transmission=True, quantiles=(0.05, 0.5, 0.95)):
+        self.name = name
+        self.f = freqs
+        self.angle = angles
+        self.stochastics = stochastics
+        self.converged = False
+
+        shape = (len(freqs), len(angles))
+        self.moments = {'R': Welford(shape, np.complex128), 'alpha': Welford(shape)}
+        self.quantile_sketches = {'alpha': {p: P2Quantile(p, shape) for p in quantiles}}
+        if transmission:
+            self.moments.update(T=Welford(shape, np.complex128), TL=Welford(shape))
+            self.quantile_sketches['TL'] = {p: P2Quantile(p, shape) for p in quantiles}
+
+    @property
+    def n_draws(self):
+        return self.moments['R'].count
+
+    def update(self, R, T=None):
+        """ Adds draws of coefficients, of shape (n_points, n) """
+        shape = (len(self.f), len(self.angle), R.shape[-1])
+        values = {'R': R.reshape(shape), 'alpha': alpha_from_R(R).reshape(shape)}
+        if T is not None:
+            with np.errstate(divide='ignore'):
+                values.update(T=T.reshape(shape), TL=TL_from_T(T).reshape(shape))
+
+        for (key, accumulator) in self.moments.items():
+            accumulator.update(values[key])
+        for (key, sketches) in self.quantile_sketches.items():
+            for sketch in sketches.values():
+                sketch.update(values[key])
+
+    def mean(self, key):
+        return self.moments[key].mean
+
+    def variance(self, key):
+        """ Variance of `key` (of its modulus for complex quantities) """
+        return self.moments[key].variance()
+
+    def std(self, key):
+        return np.sqrt(self.variance(key))
+
+    def quantile(self, key, p):
+        """ Streaming estimate of the quantile `p` (one of the `quantiles` given) of `key` """
+        return self.quantile_sketches[key][p].value()
+
+    def interval_width(self, key, confidence=0.95):
+        """ Width of the confidence interval of level `confidence` on the mean of `key` """
+        return 2*norm_ppf((1+confidence)/2)*self.moments[key].std_error()
+
+    def __repr__(self):
+        return '<OnlineStatistics {!r} of layer {}, {}: {} draws{}>'.format(
+            self.name,
+            self.stochastics['layer'],
+            self.stochastics['param'],
+            self.n_draws,
+            ', converged' if self.converged else ''
+        )
+
+
+def solve_online(solver, frequencies, angles=0, n_draws=1000, tol=None, indicator='alpha', confidence=0.95,
+                 min_draws=30, quantiles=(0.05, 0.5, 0.95), chunk_size=50, prng_state=None,
+                 vectorized=True, workers=None, seed=None, executor='process'):
+    """
+    Solves a stochastic analysis into streaming statistics, stopping once they have converged.
+
+    The draws are solved by chunks (see `Solver.iter_solve`) which update running means,
+    variances and quantile estimates (see `OnlineStatistics`) and are then
+    discarded. If `tol` is given, the draws of a stochastic layer stop as soon as,
+    after `min_draws` draws or more, the confidence interval on the mean of
+    `indicator` is narrower than `tol` on all the points. With `workers`, the
+    groups of draws already started when the tolerance is reached are completed
+    (and ignored).
+
+    Parameters
+    ----------
+    solver : Solver
+        System to solve
+    n_draws : int
+        Maximum number of draws
+    tol : float, optional
+        Width of the confidence interval below which the draws stop
+    indicator : str
+        Quantity the tolerance applies to: `'alpha'`, `'TL'`, `'R'` or `'T'`
+    confidence : float
+        Level of the confidence interval
+    min_draws : int
+        Minimum number of draws before stopping
+    quantiles : tuple of float
+        Quantiles estimated for `alpha` and `TL`
+    chunk_size : int
+        Number of draws between two checks of the tolerance
+
+    Other parameters are the ones of `Solver.solve`.
+
+    Returns
+    -------
+    statistics : OnlineStatistics or list of OnlineStatistics
+        Statistics for each stochastic layer (a single one if there is only one
+        stochastic layer)
+
+    Raises
+    ------
+    ValueError
+        If there is no stochastic layer
+    """
+    if not any(isinstance(l, StochasticLayer) for l in solver.layers):
+        raise ValueError('Online statistics need at least one stochastic layer')
+
+    statistics = {}
+    for chunk in solver.iter_solve(frequencies, angles, n_draws=n_draws, prng_state=prng_state,
+                                   vectorized=vectorized, chunk_size=chunk_size, workers=workers,
+                                   seed=seed, executor=executor):
+        if chunk.index not in statistics:
+            statistics[chunk.index] = OnlineStatistics(
+                chunk.analysis.name, chunk.analysis.freqs, chunk.analysis.angles,
+                {'layer': chunk.stochastics['layer'], 'param': chunk.stochastics['param']},
+                transmission=chunk.T is not None,
+                quantiles=quantiles
+            )
+        stats = statistics[chunk.index]
+        stats.update(chunk.R, chunk.T)
+
+        if tol is not None and stats.n_draws >= min_draws and \
+                np.all(stats.interval_width(indicator, confidence) <= tol):
+            stats.converged = True
+            solver.stop(chunk.index)
+
+    results = [statistics[index] for index in sorted(statistics)]
+    return results[0] if len(results) == 1 else results
@@ -42,8 +42,12 @@ setup(name='pymls',
         'Operating System :: OS Independent',
     ],
     install_requires=[
-        'numpy>=1.13.1',
+        'numpy>=1.17',
         'PyYAML>=5.1',
         'mediapack>=0.3',
     ],
+    extras_require={
+        'hdf5': ['h5py'],
+        'optimize': ['scipy'],
+    },
 )
@@ -0,0 +1,169 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# test_hdf5.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+import unittest
+import os
+
+import numpy as np
+import pytest
+
+from pymls import Solver, Layer, StochasticLayer, backing, from_yaml
+from pymls.utils import HDF5Writer
+from pymls.utils.hdf5_export import load
+
+h5py = pytest.importorskip('h5py')
+
+# use assertions from unittest
+asserts = unittest.TestCase('__init__')
+
+THIS_FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+FREQS = [10, 500, 1000, 3000]
+ANGLES = [5, 35, 45, 80]
+
+
+class TestHDF5Writer:
+
+    def test_deterministic(self, tmp_path):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        S = Solver(layers=[Layer(foam2, 50e-3)], backing=backing.transmission)
+        reference = S.solve(FREQS, ANGLES)
+
+        filename = str(tmp_path/'results.h5')
+        result = HDF5Writer(filename, S).solve(frequencies=FREQS, angles=ANGLES, block_size=3)
+
+        asserts.assertTrue(np.array_equal(reference.R, result.R))
+        asserts.assertTrue(np.array_equal(reference.T, result.T))
+        asserts.assertTrue(np.array_equal(reference.f, result.f))
+        with h5py.File(filename, 'r') as fh:
+            asserts.assertEqual(fh['results/0/R'].chunks, (3, len(ANGLES)))
+            asserts.assertEqual(fh['results/0'].attrs['done'], len(FREQS)*len(ANGLES))
+            asserts.assertEqual(fh.attrs['backing'], 'transmission')
+
+    def test_lossy_elastic(self, tmp_path):
+
+        # the moduli of lossy media are complex
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+        S = Solver(layers=[Layer(wood, 5e-3)], backing=backing.transmission)
+        reference = S.solve(FREQS, ANGLES)
+
+        filename = str(tmp_path/'results.h5')
+        result = HDF5Writer(filename, S).solve(frequencies=FREQS, angles=ANGLES)
+        asserts.assertTrue(np.array_equal(reference.R, result.R))
+
+        (_, description) = load(filename, description=True)
+        params = description['layers'][0]['medium']['params']
+        asserts.assertIsInstance(params['mu'], complex)
+        asserts.assertEqual(params['mu'], S.layers[0].medium.mu)
+        asserts.assertEqual(params['lambda_'], S.layers[0].medium.lambda_)
+        asserts.assertEqual(description['backing'], 'transmission')
+        asserts.assertEqual(description['arguments'], {'frequencies': FREQS, 'angles': ANGLES})
+
+    def test_resume(self, tmp_path):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        S = Solver(backing=backing.transmission)
+        S.layers = [StochasticLayer(foam2, 50e-3, 'sigma', lambda: float(np.random.normal(15e3, 3e3)))]
+        kwargs = dict(frequencies=FREQS, angles=ANGLES, n_draws=7, chunk_size=3, vectorized=True)
+
+        np.random.seed(42)
+        reference = S.solve(**kwargs)
+
+        # interrupted after the first chunk
+        filename = str(tmp_path/'results.h5')
+        np.random.seed(42)
+        for chunk in HDF5Writer(filename, S).iter_solve(**kwargs):
+            break
+
+        # the PRNG state of the first run is restored from the file
+        np.random.seed(0)
+        writer = HDF5Writer(filename, S)
+        chunks = list(writer.iter_solve(**kwargs))
+        asserts.assertEqual([(_.draws.start, _.draws.stop) for _ in chunks], [(3, 6), (6, 7)])
+
+        result = writer.solve(**kwargs)
+        asserts.assertEqual(reference['stochastics']['values'], result['stochastics']['values'])
+        asserts.assertTrue(np.array_equal(reference.R, result.R))
+        asserts.assertTrue(np.array_equal(reference.T, result.T))
+
+        with asserts.assertRaises(ValueError):
+            HDF5Writer(filename, S).solve(**dict(kwargs, n_draws=8))
+
+    def test_resume_several_layers(self, tmp_path):
+
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        S = Solver(backing=backing.transmission)
+        S.layers = [
+            StochasticLayer(wood, 5e-3, 'rho', lambda: float(np.random.normal(900, 50))),
+            StochasticLayer(foam2, 50e-3, 'sigma', lambda: float(np.random.normal(15e3, 3e3))),
+        ]
+        kwargs = dict(frequencies=FREQS, angles=ANGLES, n_draws=7, chunk_size=3, vectorized=True)
+
+        np.random.seed(42)
+        reference = S.solve(**kwargs)
+
+        # interrupted during the draws of the second layer
+        filename = str(tmp_path/'results.h5')
+        np.random.seed(42)
+        for (i_chunk, chunk) in enumerate(HDF5Writer(filename, S).iter_solve(**kwargs)):
+            if i_chunk == 3:
+                break
+
+        np.random.seed(0)
+        resultset = HDF5Writer(filename, S).solve(**kwargs)
+        asserts.assertEqual(len(resultset), 2)
+        for (expected, result) in zip(reference, resultset):
+            asserts.assertEqual(expected['stochastics']['values'], result['stochastics']['values'])
+            asserts.assertTrue(np.array_equal(expected.R, result.R))
+            asserts.assertTrue(np.array_equal(expected.T, result.T))
+
+    def test_resume_complex(self, tmp_path):
+
+        # draws of a lossy shear modulus are complex
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        mu = wood.mu
+        S = Solver(backing=backing.transmission)
+        S.layers = [
+            StochasticLayer(wood, 5e-3, 'mu', lambda: mu*complex(np.random.normal(1, 0.1), np.random.normal(0, 0.05))),
+            Layer(foam2, 50e-3),
+        ]
+        kwargs = dict(frequencies=FREQS, angles=ANGLES, n_draws=7, chunk_size=3, vectorized=True)
+
+        np.random.seed(42)
+        reference = S.solve(**kwargs)
+
+        filename = str(tmp_path/'results.h5')
+        np.random.seed(42)
+        for chunk in HDF5Writer(filename, S).iter_solve(**kwargs):
+            break
+
+        np.random.seed(0)
+        result = HDF5Writer(filename, S).solve(**kwargs)
+        asserts.assertIsInstance(result['stochastics']['values'][0], complex)
+        asserts.assertEqual(reference['stochastics']['values'], result['stochastics']['values'])
+        asserts.assertTrue(np.array_equal(reference.R, result.R))
+        asserts.assertTrue(np.array_equal(reference.T, result.T))
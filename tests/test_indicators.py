@@ -0,0 +1,67 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# test_indicators.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+import unittest
+import os
+
+import numpy as np
+
+from pymls import Solver, Layer, backing, from_yaml
+from pymls.utils import paris_quadrature, diffuse_alpha_from_R, diffuse_TL_from_T, solve_diffuse
+
+# use assertions from unittest
+asserts = unittest.TestCase('__init__')
+
+THIS_FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+NB_PLACES = 10
+
+
+def test_solve_diffuse():
+
+    foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+    wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+    freqs = [100, 500, 1000, 2500, 5000]
+
+    (angles, weights) = paris_quadrature(8, 60)
+    asserts.assertAlmostEqual(np.sum(weights), 1, places=NB_PLACES)
+    asserts.assertTrue(np.all((angles > 0) & (angles < 60)))
+
+    S = Solver(layers=[Layer(foam2, 50e-3)], backing=backing.rigid)
+    gauss = solve_diffuse(S, freqs, n_angles=16)
+    kronrod = solve_diffuse(S, freqs, method='kronrod', tol=1e-8)
+    asserts.assertEqual(gauss.n_points, 16*len(freqs))
+    asserts.assertIsNone(gauss.TL)
+    np.testing.assert_allclose(gauss.alpha, kronrod.alpha, atol=1e-8)
+
+    S = Solver(layers=[Layer(wood, 10e-3), Layer(foam2, 50e-3)], backing=backing.transmission)
+    (angles, weights) = paris_quadrature(128)
+    reference = S.solve(freqs, list(angles), vectorized=True)
+    kronrod = solve_diffuse(S, freqs, method='kronrod')
+    asserts.assertLess(kronrod.n_points, 128*len(freqs))
+    np.testing.assert_allclose(kronrod.alpha, diffuse_alpha_from_R(reference.R, weights), atol=1e-4)
+    np.testing.assert_allclose(kronrod.TL, diffuse_TL_from_T(reference.T, weights), atol=1e-2)
+
+    with asserts.assertRaises(ValueError):
+        solve_diffuse(S, freqs, method='simpson')
@@ -0,0 +1,129 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# test_optimize.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+import unittest
+import os
+
+import numpy as np
+import pytest
+
+from pymls import Solver, Layer, backing, from_yaml
+from pymls.utils import paris_quadrature, diffuse_alpha_from_R, diffuse_TL_from_T, optimize_thicknesses
+
+pytest.importorskip('scipy')
+
+# use assertions from unittest
+asserts = unittest.TestCase('__init__')
+
+THIS_FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+FREQS = [250, 500, 1000, 2000]
+
+
+class TestOptimizeThicknesses:
+
+    def test_alpha(self):
+
+        foam = from_yaml(THIS_FILE_DIR+'/materials/foam.yaml')
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        S = Solver(layers=[Layer(foam, 20e-3), Layer(foam2, 20e-3)], backing=backing.rigid)
+        bounds = {0: (5e-3, 50e-3), 1: (5e-3, 50e-3)}
+        (angles, weights) = paris_quadrature(8)
+
+        def band_alpha(thicknesses):
+            S_check = Solver(layers=[Layer(L.medium, t) for (L, t) in zip(S.layers, thicknesses)],
+                             backing=backing.rigid)
+            R = S_check.solve(FREQS, list(angles), vectorized=True).R
+            return np.mean(diffuse_alpha_from_R(R, weights))
+
+        result = optimize_thicknesses(S, FREQS, bounds)
+
+        asserts.assertTrue(result.success)
+        asserts.assertEqual(result.layers, [0, 1])
+        asserts.assertEqual([L.thickness for L in S.layers], [20e-3, 20e-3])
+        for (l_id, (lower, upper)) in bounds.items():
+            asserts.assertTrue(lower <= result.thicknesses[l_id] <= upper)
+        asserts.assertAlmostEqual(result.objective, band_alpha(result.thicknesses), places=10)
+        asserts.assertGreater(result.objective, band_alpha([20e-3, 20e-3]))
+
+        # analytic gradient against central differences, with a tolerance absolute as
+        # the gradient vanishes at the optimum
+        h = 1e-6
+        for (i_p, l_id) in enumerate(result.layers):
+            plus = list(result.thicknesses)
+            minus = list(result.thicknesses)
+            plus[l_id] += h
+            minus[l_id] -= h
+            derivative = (band_alpha(plus)-band_alpha(minus))/(2*h)
+            asserts.assertAlmostEqual(result.gradient[i_p], derivative, delta=1e-6)
+
+    def test_TL_mass_budget(self):
+
+        foam = from_yaml(THIS_FILE_DIR+'/materials/foam.yaml')
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+        S = Solver(layers=[Layer(wood, 5e-3), Layer(foam, 30e-3), Layer(wood, 5e-3)],
+                   backing=backing.transmission)
+        angles = [15, 30, 45, 60]
+
+        def band_TL(thicknesses):
+            S_check = Solver(layers=[Layer(L.medium, t) for (L, t) in zip(S.layers, thicknesses)],
+                             backing=backing.transmission)
+            T = S_check.solve(FREQS, angles, vectorized=True).T
+            return np.mean(diffuse_TL_from_T(T.reshape((len(FREQS), len(angles))), np.full(len(angles), 1/4)))
+
+        mass_budget = 9.
+        result = optimize_thicknesses(S, FREQS, {0: (2e-3, 20e-3), 2: (2e-3, 20e-3)}, target='TL',
+                                      angles=angles, mass_budget=mass_budget)
+
+        densities = [wood.rho, foam.rho_1, wood.rho]
+        mass = np.dot(densities, result.thicknesses)
+        asserts.assertTrue(result.success)
+        asserts.assertEqual(result.thicknesses[1], 30e-3)
+        asserts.assertAlmostEqual(result.mass, mass)
+        # the transmission loss increases with the mass of the walls
+        asserts.assertAlmostEqual(mass, mass_budget, places=6)
+        asserts.assertAlmostEqual(result.objective, band_TL(result.thicknesses), places=8)
+        asserts.assertGreater(result.objective, band_TL([4e-3, 30e-3, 4e-3]))
+
+        h = 1e-7
+        for (i_p, l_id) in enumerate(result.layers):
+            plus = list(result.thicknesses)
+            minus = list(result.thicknesses)
+            plus[l_id] += h
+            minus[l_id] -= h
+            derivative = (band_TL(plus)-band_TL(minus))/(2*h)
+            asserts.assertAlmostEqual(result.gradient[i_p], derivative, delta=1e-6*abs(derivative))
+
+    def test_errors(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        S = Solver(layers=[Layer(foam2, 20e-3)], backing=backing.rigid)
+
+        with asserts.assertRaises(ValueError):
+            optimize_thicknesses(S, FREQS, {0: (5e-3, 50e-3)}, target='unknown')
+        with asserts.assertRaises(ValueError):
+            optimize_thicknesses(S, FREQS, {0: (5e-3, 50e-3)}, target='TL')
+        with asserts.assertRaises(ValueError):
+            optimize_thicknesses(S, FREQS, {0: (50e-3, 5e-3)})
+        with asserts.assertRaises(ValueError):
+            optimize_thicknesses(S, FREQS, {0: (5e-3, 50e-3)}, mass_budget=1e-3)
@@ -0,0 +1,111 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# test_pce.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+import unittest
+import os
+
+import numpy as np
+
+from pymls import Solver, Layer, StochasticLayer, backing, from_yaml
+from pymls.utils import Normal, Uniform, PolynomialChaos, solve_pce
+from pymls.utils.pce import germ_quadrature, germ_basis
+
+# use assertions from unittest
+asserts = unittest.TestCase('__init__')
+
+THIS_FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+FREQS = [10, 500, 1000, 3000]
+ANGLES = [5, 35, 45, 80]
+
+
+def test_orthonormal_basis():
+    for germ in ['hermite', 'legendre']:
+        (xi, weights) = germ_quadrature(germ, 8)
+        psi = germ_basis(germ, xi, 5)
+        np.testing.assert_allclose(psi.T @ (weights.reshape((-1, 1))*psi), np.eye(6), atol=1e-12)
+
+
+def test_polynomial_chaos():
+    # y = exp(X) with X normal has a known mean and variance
+    (mean, std) = (0.2, 0.3)
+    X = Normal(mean, std)
+    (xi, weights) = germ_quadrature(X.germ, 12)
+    values = np.exp(X.transform(xi))
+
+    for expansion in [
+        PolynomialChaos.fit(X.germ, xi, values, 10, weights),
+        PolynomialChaos.fit(X.germ, xi, values, 10),
+    ]:
+        asserts.assertAlmostEqual(expansion.mean(), np.exp(mean+std**2/2), places=10)
+        asserts.assertAlmostEqual(expansion.variance(), (np.exp(std**2)-1)*np.exp(2*mean+std**2), places=10)
+        np.testing.assert_allclose(expansion(xi), values, rtol=1e-5)
+
+    # samples of the germ are mapped to the support of the distribution
+    U = Uniform(2, 3)
+    (xi, weights) = germ_quadrature(U.germ, 3)
+    samples = PolynomialChaos.fit(U.germ, xi, U.transform(xi), 1, weights).sample(1000, seed=0)
+    asserts.assertTrue(np.all((samples >= 2) & (samples <= 3)))
+    asserts.assertTrue(2 <= U() <= 3)
+
+
+def test_solve_pce():
+
+    foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+    wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+
+    S = Solver(layers=[
+        Layer(wood, 5e-3),
+        StochasticLayer(foam2, 50e-3, 'thickness', Normal(50e-3, 3e-3))
+    ], backing=backing.transmission)
+    result = solve_pce(S, FREQS, ANGLES, order=6)
+
+    asserts.assertEqual(len(result.stochastics['values']), 7)
+    asserts.assertEqual(result.mean('R').shape, (len(FREQS), len(ANGLES)))
+    asserts.assertEqual(S.layers[1].thickness, 50e-3)
+    np.testing.assert_allclose(solve_pce(S, FREQS, ANGLES, order=3).mean('alpha'), result.mean('alpha'), atol=1e-3)
+    np.testing.assert_allclose(
+        solve_pce(S, FREQS, ANGLES, order=6, method='regression', seed=0).mean('alpha'),
+        result.mean('alpha'),
+        atol=1e-3
+    )
+
+    # statistics are the ones of a Monte Carlo analysis
+    monte_carlo = S.solve(FREQS, ANGLES, n_draws=2000, vectorized=True, seed=0)
+    np.testing.assert_allclose(result.mean('alpha'), monte_carlo.alpha.mean(axis=-1), atol=2e-3)
+    np.testing.assert_allclose(result.std('alpha'), monte_carlo.alpha.std(axis=-1), atol=2e-3)
+    np.testing.assert_allclose(
+        result.quantiles('alpha', [0.1, 0.9], seed=0),
+        np.quantile(monte_carlo.alpha, [0.1, 0.9], axis=-1),
+        atol=5e-3
+    )
+
+    S.layers[1] = StochasticLayer(foam2, 50e-3, 'sigma', Uniform(10e3, 20e3))
+    result = solve_pce(S, FREQS, ANGLES, order=4)
+    asserts.assertTrue(np.all(np.array(result.stochastics['values']) > 10e3))
+    asserts.assertTrue(np.all(result.variance('T') > 0))
+
+    S.layers[1] = StochasticLayer(foam2, 50e-3, 'sigma', lambda: float(np.random.normal(15e3, 3e3)))
+    with asserts.assertRaises(ValueError):
+        solve_pce(S, FREQS, ANGLES)
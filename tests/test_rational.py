@@ -0,0 +1,87 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# test_rational.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+import unittest
+import os
+
+import numpy as np
+
+from pymls import Solver, Layer, backing, from_yaml
+from pymls.utils import aaa, Surrogate
+
+# use assertions from unittest
+asserts = unittest.TestCase('__init__')
+
+THIS_FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+def test_aaa():
+    z = np.linspace(-1, 1, 200)
+
+    # a rational function is recovered exactly with its number of poles
+    def f(z):
+        return (z**2+1j)/((z-1.5)*(z+0.3-0.1j)*(z-0.2j))
+    r = aaa(z, f(z))
+    asserts.assertLessEqual(len(r.support), 5)
+    np.testing.assert_allclose(r(np.linspace(-1, 1, 1001)), f(np.linspace(-1, 1, 1001)), rtol=1e-10)
+
+    # interpolation of the support points and shape of the output
+    np.testing.assert_array_equal(r(r.support), r.values)
+    asserts.assertEqual(r(z.reshape((10, 20))).shape, (10, 20))
+
+    r = aaa(z, np.exp(z), tol=1e-12)
+    asserts.assertLess(np.max(np.abs(r(z)-np.exp(z))), 1e-11)
+
+    # at least two samples, one per point
+    for (points, samples) in [([], []), ([0.5], [1.]), (z, np.exp(z[1:]))]:
+        with asserts.assertRaises(ValueError):
+            aaa(points, samples)
+    with asserts.assertRaises(ValueError):
+        aaa(z, np.exp(z), max_terms=0)
+
+
+def test_surrogate():
+    foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+    wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+
+    S = Solver(layers=[Layer(wood, 10e-3), Layer(foam2, 50e-3)], backing=backing.transmission)
+    angles = [5, 45]
+    surrogate = Surrogate(S.solve(list(np.linspace(50, 5000, 100)), angles, vectorized=True))
+
+    dense = np.linspace(50, 5000, 2000)
+    result = surrogate.evaluate(dense)
+    reference = S.solve(list(dense), angles, vectorized=True)
+
+    asserts.assertEqual(result.shape, (2000, 2))
+    for key in ['R', 'T']:
+        error = np.max(np.abs(getattr(result, key)-getattr(reference, key)), axis=0)
+        # the cross-validated estimate bounds the actual error
+        asserts.assertTrue(np.all(error <= surrogate.error[key]))
+        asserts.assertLess(np.max(error), 1e-6)
+    np.testing.assert_allclose(result.TL, reference.TL, atol=1e-4)
+
+    S.backing = backing.rigid
+    surrogate = Surrogate(S.solve(list(np.linspace(50, 5000, 50)), angles, vectorized=True))
+    asserts.assertIsNone(surrogate.evaluate(dense).T)
+    asserts.assertEqual(list(surrogate.error), ['R'])
@@ -0,0 +1,194 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# test_sampling.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+import unittest
+import os
+
+import numpy as np
+
+from pymls import Solver, Layer, StochasticLayer, backing, from_yaml
+from pymls.utils import DrawsManager, Normal, Uniform, LogNormal, Truncated, JointDistribution, solve_joint
+from pymls.utils.distributions import norm_ppf, norm_cdf
+from pymls.utils.sampling import sobol, halton, latin_hypercube, sample
+
+# use assertions from unittest
+asserts = unittest.TestCase('__init__')
+
+THIS_FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+FREQS = [10, 500, 1000, 3000]
+ANGLES = [5, 35, 45, 80]
+
+
+def test_sobol():
+    points = sobol(8, 2, scramble=False)
+    np.testing.assert_array_equal(points[:4], [[0, 0], [0.5, 0.5], [0.75, 0.25], [0.25, 0.75]])
+
+    # each dyadic interval holds one point of every block of 2^k points
+    for points in [sobol(1024, 16, scramble=False), sobol(1024, 16, seed=0)]:
+        for j in range(16):
+            np.testing.assert_array_equal(np.sort(np.floor(points[:256, j]*256)), np.arange(256))
+    asserts.assertFalse(np.array_equal(sobol(16, 2, seed=0), sobol(16, 2, seed=1)))
+    np.testing.assert_array_equal(sobol(16, 2, seed=3), sobol(16, 2, seed=3))
+
+    with asserts.assertRaises(ValueError):
+        sobol(8, 17)
+
+
+def test_halton_lhs():
+    np.testing.assert_allclose(halton(4, 2, scramble=False), [[1/2, 1/3], [1/4, 2/3], [3/4, 1/9], [1/8, 4/9]])
+    points = halton(81, 2, seed=0)
+    np.testing.assert_array_equal(np.sort(np.floor(points[:, 1]*81+1e-9)), np.arange(81))
+
+    points = latin_hypercube(50, 3, seed=0)
+    for j in range(3):
+        np.testing.assert_array_equal(np.sort(np.floor(points[:, j]*50)), np.arange(50))
+
+    with asserts.assertRaises(ValueError):
+        sample('grid', 10)
+
+
+def test_distributions():
+    asserts.assertAlmostEqual(float(norm_ppf(0.975)), 1.959963984540054, places=14)
+    asserts.assertAlmostEqual(float(norm_ppf(1e-10)), -6.361340902404056, places=12)
+    u = np.linspace(1e-9, 1-1e-9, 1001)
+    np.testing.assert_allclose(norm_cdf(norm_ppf(u)), u, rtol=1e-12)
+
+    for distribution in [Normal(2, 0.5), Uniform(1, 3), LogNormal.from_moments(2, 0.5), Truncated(Normal(2, 1), 1, 2.5)]:
+        values = distribution.ppf(u)
+        np.testing.assert_allclose(distribution.cdf(values), u, rtol=1e-9, atol=1e-12)
+        asserts.assertIsInstance(distribution(), float)
+
+    values = LogNormal.from_moments(2, 0.5).ppf(sobol(2**14, seed=0)[:, 0])
+    asserts.assertAlmostEqual(np.mean(values), 2, places=4)
+    asserts.assertAlmostEqual(np.std(values), 0.5, places=3)
+
+
+def test_draws_manager():
+    draws = DrawsManager.from_distribution(Normal(5, 1), 10, 'sobol', seed=0)
+    asserts.assertEqual(len(draws), 10)
+    value = draws.as_pdf()
+    batches = list(draws.batches(4))
+    asserts.assertEqual([len(_) for _ in batches], [4, 4, 1])
+    np.testing.assert_array_equal(np.concatenate([[value]]+batches), draws.draws)
+
+    draws = DrawsManager.from_distribution(Uniform(0, 1), 8, 'sobol', scramble=False)
+    np.testing.assert_array_equal(draws.draws[:3], [0.5, 0.75, 0.25])
+
+
+def test_batch_samplers():
+    foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+    manager = DrawsManager.from_distribution(Normal(15e3, 2e3), 16, 'sobol', seed=0)
+    expected = np.concatenate(list(manager.batches(5)))
+
+    # the layer walks the manager by batches, whether given as is or as its pdf
+    for pdf in [manager, manager.as_pdf]:
+        manager.reset()
+        S = Solver(layers=[StochasticLayer(foam2, 50e-3, 'sigma', pdf)], backing=backing.rigid)
+        asserts.assertIs(S.layers[0].batch_sampler, manager)
+        result = S.solve(FREQS, ANGLES, n_draws=len(manager), vectorized=True)
+        np.testing.assert_array_equal(result.stochastics['values'], expected)
+        asserts.assertEqual(manager.n, len(manager))
+
+    manager.reset()
+    layer = StochasticLayer(foam2, 50e-3, 'sigma', manager)
+    layer.new_draws(10)
+    with asserts.assertRaises(ValueError):
+        layer.new_draws(10)
+
+    # distributions give the same draws by batches as one at a time
+    distribution = LogNormal.from_moments(50e-3, 5e-3)
+    layer = StochasticLayer(foam2, 50e-3, 'thickness', distribution)
+    np.random.seed(0)
+    draws = layer.new_draws(7)
+    asserts.assertEqual(layer.thickness, draws[-1])
+    np.random.seed(0)
+    asserts.assertEqual(draws, [distribution() for _ in range(7)])
+    asserts.assertIsNone(StochasticLayer(foam2, 50e-3, 'sigma', lambda: 15e3).batch_sampler)
+
+
+def test_joint_distribution():
+    marginals = [Normal(0, 1), Normal(10, 2), Uniform(0.9, 0.99)]
+    correlation = [[1, 0.8, 0], [0.8, 1, -0.5], [0, -0.5, 1]]
+
+    values = JointDistribution(marginals, correlation).sample(4096, 'sobol', seed=0)
+    asserts.assertEqual(values.shape, (4096, 3))
+    np.testing.assert_allclose(values.mean(axis=0), [0, 10, 0.945], atol=1e-3)
+    np.testing.assert_allclose(np.corrcoef(values[:, :2].T)[0, 1], 0.8, atol=1e-2)
+    asserts.assertTrue(np.corrcoef(values[:, 1:].T)[0, 1] < -0.4)
+
+    # independent parameters are drawn from their marginals
+    u = sobol(16, 3, seed=1)
+    np.testing.assert_array_equal(JointDistribution(marginals).ppf(u)[:, 1], marginals[1].ppf(u[:, 1]))
+
+    with asserts.assertRaises(ValueError):
+        JointDistribution(marginals, np.ones((3, 3)))
+    with asserts.assertRaises(ValueError):
+        JointDistribution(marginals, np.eye(2))
+
+
+def test_solve_joint():
+
+    foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+    wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+
+    S = Solver(layers=[
+        Layer(wood, 5e-3),
+        Layer(foam2, 50e-3),
+    ], backing=backing.transmission)
+    parameters = [
+        (0, 'thickness', Normal(5e-3, 2e-4)),
+        (1, 'thickness', Normal(50e-3, 3e-3)),
+        (1, 'sigma', LogNormal.from_moments(15e3, 2e3)),
+        (1, 'phi', Uniform(0.9, 0.99)),
+    ]
+    correlation = np.eye(4)
+    correlation[2, 3] = correlation[3, 2] = -0.6
+    result = solve_joint(S, FREQS, ANGLES, parameters, correlation, n_draws=50, method='sobol',
+                         seed=0, chunk_size=16)
+
+    values = result.stochastics['values']
+    asserts.assertEqual(result.shape, (len(FREQS), len(ANGLES), 50))
+    asserts.assertEqual(values.shape, (50, 4))
+    asserts.assertEqual((S.layers[1].thickness, S.layers[1].medium.sigma), (50e-3, foam2.sigma))
+
+    # each joint draw is the deterministic solution for the drawn values
+    for i_draw in [0, 17, 49]:
+        draw = values[i_draw]
+        S_draw = Solver(layers=[Layer(wood, draw[0]), Layer(foam2, draw[1])], backing=backing.transmission)
+        S_draw.layers[1].medium.sigma = draw[2]
+        S_draw.layers[1].medium.phi = draw[3]
+        reference = S_draw.solve(FREQS, ANGLES)
+        np.testing.assert_allclose(result.R[..., i_draw], reference.R, atol=1e-9)
+        np.testing.assert_allclose(result.T[..., i_draw], reference.T, atol=1e-9)
+
+    # stochastic layers are drawn together by default
+    S.layers[1] = StochasticLayer(foam2, 50e-3, 'sigma', Uniform(10e3, 20e3))
+    result = solve_joint(S, FREQS, ANGLES, n_draws=10, seed=0)
+    asserts.assertEqual(result.stochastics['parameters'], [(1, 'sigma')])
+
+    with asserts.assertRaises(ValueError):
+        solve_joint(S, FREQS, ANGLES, [(1, 'unknown', Normal(0, 1))])
+    with asserts.assertRaises(ValueError):
+        solve_joint(S, FREQS, ANGLES, [(1, 'sigma', Normal(15e3, 1e3))]*2)
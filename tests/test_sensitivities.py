@@ -0,0 +1,141 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# test_sensitivities.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+import unittest
+import os
+
+import numpy as np
+
+from pymls import Solver, Layer, backing, from_yaml
+from pymls.utils import solve_sensitivities
+from pymls.layers.modes import modal_sort
+from mediapack import EqFluidJCA, Screen
+
+# use assertions from unittest
+asserts = unittest.TestCase('__init__')
+
+THIS_FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+FREQS = [10, 500, 1000, 3000]
+ANGLES = [5, 35, 45, 80]
+BACKINGS = [('rigid', backing.rigid), ('transmission', backing.transmission)]
+
+
+def test_solve_sensitivities():
+
+    foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+    wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+    fluid = from_yaml(THIS_FILE_DIR+'/materials/foam.yaml', force=EqFluidJCA)
+    screen = from_yaml(THIS_FILE_DIR+'/materials/foam.yaml', force=Screen)
+
+    parameters = [(0, 'thickness'), (1, 'thickness'), (2, 'thickness'), (3, 'thickness'),
+                  (0, 'sigma'), (1, 'sigma'), (1, 'phi'), (2, 'sigma'), (3, 'rho')]
+    for (_, backing_func) in BACKINGS:
+        S = Solver(layers=[
+            Layer(screen, 1e-3),
+            Layer(foam2, 30e-3),
+            Layer(fluid, 20e-3),
+            Layer(wood, 5e-3),
+        ], backing=backing_func)
+        (result, sensitivities) = solve_sensitivities(S, FREQS, ANGLES, parameters)
+
+        reference = S.solve(FREQS, ANGLES)
+        np.testing.assert_allclose(result.R, reference.R, atol=1e-12)
+        asserts.assertEqual(sensitivities.R.shape, (len(FREQS), len(ANGLES), len(parameters)))
+        asserts.assertEqual(S.layers[1].medium.sigma, foam2.sigma)
+
+        # fourth-order central differences on the whole system, with a step large
+        # enough to stay clear of the round-off of the elastic layers
+        for (i_p, (l_id, param)) in enumerate(parameters):
+            layer = S.layers[l_id]
+            value = getattr(layer, param) if param == 'thickness' else getattr(layer.medium, param)
+            h = 1e-3*value
+            coefficients = []
+            for perturbed in [value+h, value-h, value+2*h, value-2*h]:
+                if param == 'thickness':
+                    layer.thickness = perturbed
+                else:
+                    setattr(layer.medium, param, perturbed)
+                    layer.medium.omega = -1
+                coefficients.append(S.solve(FREQS, ANGLES, vectorized=True))
+            if param == 'thickness':
+                layer.thickness = value
+            else:
+                setattr(layer.medium, param, value)
+                layer.medium.omega = -1
+
+            # compared relatively to the parameter and to the coefficients, as some
+            # derivatives (rho of the wood on a rigid backing) are within round-off
+            for key in ['R', 'T', 'alpha', 'TL']:
+                if getattr(result, key) is None:
+                    continue
+                (plus, minus, plus2, minus2) = [getattr(_, key) for _ in coefficients]
+                derivative = (8*(plus-minus)-(plus2-minus2))/(12*h)
+                scale = np.abs(getattr(result, key)).max()
+                np.testing.assert_allclose(value*getattr(sensitivities, key)[..., i_p], value*derivative,
+                                           atol=1e-6*scale)
+
+    with asserts.assertRaises(ValueError):
+        solve_sensitivities(S, FREQS, ANGLES, [(1, 'unknown')])
+
+
+def test_sensitivities_degenerate():
+
+    # nearly incompressible elastic layer: past the critical angle of the p-waves, the
+    # real parts of the p and s modes cross around 28.79 degrees at 500 Hz and the
+    # central differences on the medium swap them when sorted by real parts
+    elastomer = from_yaml(THIS_FILE_DIR+'/materials/elastomer.yaml')
+    S = Solver(layers=[Layer(elastomer, 5e-3)], backing=backing.transmission)
+    (freqs, angles) = ([500], [20, 28.79014, 60])
+    parameters = [(0, 'thickness'), (0, 'lambda_'), (0, 'mu'), (0, 'rho')]
+
+    (result, sensitivities) = solve_sensitivities(S, freqs, angles, parameters)
+
+    layer = S.layers[0]
+    for (i_p, (_, param)) in enumerate(parameters):
+        value = getattr(layer, param) if param == 'thickness' else getattr(layer.medium, param)
+        h = 1e-4*abs(value)
+        coefficients = []
+        for perturbed in [value+h, value-h, value+2*h, value-2*h]:
+            if param == 'thickness':
+                layer.thickness = perturbed
+            else:
+                setattr(layer.medium, param, perturbed)
+                layer.medium.omega = -1
+            coefficients.append(S.solve(freqs, angles, vectorized=True).R)
+        if param == 'thickness':
+            layer.thickness = value
+        else:
+            setattr(layer.medium, param, value)
+            layer.medium.omega = -1
+
+        (plus, minus, plus2, minus2) = coefficients
+        derivative = (8*(plus-minus)-(plus2-minus2))/(12*h)
+        np.testing.assert_allclose(abs(value)*sensitivities.R[..., i_p], abs(value)*derivative,
+                                   atol=1e-6*np.abs(result.R).max())
+
+    # exactly degenerate eigenvalues cannot be matched
+    V_0 = np.array([[1j, 1j, -1j, -1j]])
+    with asserts.assertRaises(ValueError):
+        modal_sort(V_0, V_0)
@@ -25,11 +25,13 @@
 import unittest
 import os
 import itertools
+import pickle
 
 import numpy as np
 
-from pymls import Solver, Layer, backing, from_yaml
-from mediapack import Air, EqFluidJCA
+from pymls import Solver, Layer, StochasticLayer, backing, from_yaml
+from pymls.utils import DrawsManager, Normal, solve_pce, solve_joint, solve_sensitivities
+from mediapack import Air, Fluid, EqFluidJCA, Screen
 
 # use assertions from unittest
 asserts = unittest.TestCase('__init__')
@@ -45,6 +47,11 @@ BACKINGS = [('rigid', backing.rigid), ('transmission', backing.transmission)]
 NB_PLACES = 10
 
 
+def compress_layer(layer):
+    """ Hook compressing a layer to 40 mm, defined at module level to be picklable """
+    layer.thickness = 40e-3
+
+
 class TestSolver:
 
     def test_air_analytical(self):
@@ -255,3 +262,472 @@ class TestSolver:
         self.helper_bi_mat_eqf('foam', 'foam2', BACKINGS, NB_PLACES, no_is_default=1, ref_path='eqf_pem')
         self.helper_bi_mat_eqf('foam2', 'foam2', BACKINGS, NB_PLACES, no_is_default=1, ref_path='eqf_pem')
         self.helper_bi_mat_eqf('foam2', 'foam', BACKINGS, NB_PLACES, no_is_default=1, ref_path='eqf_pem')
+
+    def test_vectorized_engine(self):
+
+        foam = from_yaml(THIS_FILE_DIR+'/materials/foam.yaml')
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        foam2_eqf = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml', force=EqFluidJCA)
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+        screen = from_yaml(THIS_FILE_DIR+'/materials/foam.yaml', force=Screen)
+
+        stacks = [
+            [Layer(Air, 50e-3)],
+            [Layer(foam2_eqf, 20e-3), Layer(foam, 30e-3)],
+            [Layer(wood, 10e-3), Layer(foam2, 50e-3)],
+            [Layer(foam2, 50e-3), Layer(wood, 10e-3)],
+            [Layer(foam2, 20e-3), Layer(Air, 50e-3)],
+            [Layer(screen, 1e-4), Layer(foam2, 30e-3)],
+        ]
+
+        for (layers, (_, backing_func)) in itertools.product(stacks, BACKINGS):
+            S = Solver(layers=layers, backing=backing_func)
+            reference = S.solve(FREQS[1:], ANGLES)
+            result = S.solve(FREQS[1:], ANGLES, vectorized=True)
+
+            asserts.assertEqual(len(reference['R']), len(result['R']))
+            asserts.assertEqual(len(reference['T']), len(result['T']))
+            for (R_ref, R) in zip(reference['R'], result['R']):
+                asserts.assertAlmostEqual(R_ref, R, NB_PLACES)
+            for (T_ref, T) in zip(reference['T'], result['T']):
+                asserts.assertAlmostEqual(T_ref, T, NB_PLACES)
+
+    def test_update_once_per_frequency(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+
+        for vectorized in [False, True]:
+            layer = Layer(foam2, 50e-3)
+            updated_frequencies = []
+
+            @layer.register('pre_update_frequency')
+            def count_updates(L):
+                updated_frequencies.append(L)
+
+            S = Solver(layers=[layer], backing=backing.rigid)
+            result = S.solve(FREQS, ANGLES, vectorized=vectorized)
+
+            asserts.assertEqual(len(result['R']), len(FREQS)*len(ANGLES))
+            asserts.assertEqual(len(updated_frequencies), len(FREQS))
+
+    def test_stochastic_thickness(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+        draws = DrawsManager(np.linspace(-1, 1, 5), 50e-3, 10e-3)
+
+        for (_, backing_func) in BACKINGS:
+            draws.reset()
+            S = Solver(backing=backing_func)
+            S.layers = [
+                Layer(wood, 10e-3),
+                StochasticLayer(foam2, 50e-3, 'thickness', draws.as_pdf),
+            ]
+            result = S.solve(FREQS[1:], ANGLES, n_draws=len(draws))
+
+            for i_draw, d in enumerate(result['stochastics']['values']):
+                S_ref = Solver(layers=[Layer(wood, 10e-3), Layer(foam2, d)], backing=backing_func)
+                reference = S_ref.solve(FREQS[1:], ANGLES)
+
+                for i_point, R_ref in enumerate(reference['R']):
+                    asserts.assertAlmostEqual(R_ref, result['R'][i_point][i_draw], NB_PLACES)
+                for i_point, T_ref in enumerate(reference['T']):
+                    asserts.assertAlmostEqual(T_ref, result['T'][i_point][i_draw], NB_PLACES)
+
+    def test_stochastic_vectorized(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+
+        for (param, mean, std) in [('thickness', 50e-3, 10e-3), ('sigma', 15e3, 3e3)]:
+            draws = DrawsManager(np.linspace(-1, 1, 5), mean, std)
+            S = Solver(backing=backing.transmission)
+            S.layers = [
+                Layer(wood, 10e-3),
+                StochasticLayer(foam2, 50e-3, param, draws.as_pdf),
+            ]
+
+            results = []
+            for (vectorized, chunk_size) in [(False, None), (True, 2), (True, None)]:
+                draws.reset()
+                results.append(S.solve(FREQS[1:], ANGLES, n_draws=len(draws), vectorized=vectorized, chunk_size=chunk_size))
+
+            for result in results[1:]:
+                asserts.assertEqual(results[0]['stochastics']['values'], result['stochastics']['values'])
+                for key in ['R', 'T']:
+                    for (reference_point, point) in zip(results[0][key], result[key]):
+                        asserts.assertEqual(len(reference_point), len(point))
+                        for (reference, value) in zip(reference_point, point):
+                            asserts.assertAlmostEqual(reference, value, NB_PLACES)
+
+    def test_stochastic_complex(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+
+        # lossy shear modulus, drawn as complex values
+        values = [wood.mu*(1+0.1*i+0.05j*i) for i in range(4)]
+        S = Solver(backing=backing.transmission)
+
+        results = []
+        for (vectorized, chunk_size) in [(False, None), (True, 3)]:
+            draws = iter(values)
+            S.layers = [
+                StochasticLayer(wood, 10e-3, 'mu', lambda: next(draws)),
+                Layer(foam2, 50e-3),
+            ]
+            results.append(S.solve(FREQS[1:], ANGLES, n_draws=len(values), vectorized=vectorized, chunk_size=chunk_size))
+
+        asserts.assertEqual(list(results[1].stochastics['values']), values)
+        np.testing.assert_allclose(results[1].R, results[0].R, atol=1e-10)
+        np.testing.assert_allclose(results[1].T, results[0].T, atol=1e-10)
+
+    def test_stochastic_front_layer(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+        glass = from_yaml(THIS_FILE_DIR+'/materials/glass.yaml')
+
+        # the recursion through the layers behind the stochastic one is shared by all draws
+        for (_, backing_func) in BACKINGS:
+            for (param, mean, std) in [('thickness', 20e-3, 5e-3), ('sigma', 15e3, 3e3)]:
+                draws = DrawsManager(np.linspace(-1, 1, 5), mean, std)
+                S = Solver(backing=backing_func)
+                S.layers = [
+                    StochasticLayer(foam2, 20e-3, param, draws.as_pdf),
+                    Layer(wood, 5e-3),
+                    Layer(foam2, 30e-3),
+                    Layer(glass, 4e-3),
+                ]
+
+                results = []
+                for vectorized in [False, True]:
+                    draws.reset()
+                    results.append(S.solve(FREQS[1:], ANGLES, n_draws=len(draws), vectorized=vectorized, chunk_size=2))
+
+                np.testing.assert_allclose(results[1].R, results[0].R, atol=1e-9)
+                if results[0].T is not None:
+                    np.testing.assert_allclose(results[1].T, results[0].T, atol=1e-9)
+
+    def test_stochastic_workers(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+
+        S = Solver(backing=backing.transmission)
+        S.layers = [
+            StochasticLayer(foam2, 50e-3, 'sigma', lambda: float(np.random.normal(15e3, 3e3))),
+        ]
+
+        reference = S.solve(FREQS, ANGLES, n_draws=7, chunk_size=3, workers=1, seed=42)
+        for workers in [2, 3]:
+            result = S.solve(FREQS, ANGLES, n_draws=7, chunk_size=3, workers=workers, seed=42)
+
+            asserts.assertEqual(reference['stochastics']['values'], result['stochastics']['values'])
+            asserts.assertTrue(np.array_equal(reference['R'], result['R']))
+            asserts.assertTrue(np.array_equal(reference['T'], result['T']))
+
+        # draws only depend on the seed, and serial runs give the same output
+        result = S.solve(FREQS, ANGLES, n_draws=7, seed=42)
+        asserts.assertEqual(reference['stochastics']['values'], result['stochastics']['values'])
+        asserts.assertTrue(np.array_equal(reference['R'], result['R']))
+        asserts.assertTrue(np.array_equal(reference['T'], result['T']))
+        asserts.assertTrue(np.array_equal(
+            S.solve(FREQS, ANGLES, n_draws=7, seed=42, workers=2)['R'],
+            S.solve(FREQS, ANGLES, n_draws=7, seed=42)['R']
+        ))
+        result = S.solve(FREQS, ANGLES, n_draws=7, seed=43)
+        asserts.assertNotEqual(reference['stochastics']['values'], result['stochastics']['values'])
+
+        # seeded draws leave the global PRNG of the caller untouched
+        np.random.seed(0)
+        state = np.random.get_state()
+        S.solve(FREQS, ANGLES, n_draws=7, seed=42)
+        after = np.random.get_state()
+        asserts.assertTrue(np.array_equal(state[1], after[1]))
+        asserts.assertEqual(state[2:], after[2:])
+
+    def test_deterministic_workers(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+
+        S = Solver(layers=[Layer(wood, 10e-3), Layer(foam2, 50e-3)], backing=backing.transmission)
+        reference = S.solve(FREQS, ANGLES)
+
+        for (executor, vectorized) in itertools.product(['process', 'thread'], [False, True]):
+            result = S.solve(FREQS, ANGLES, workers=3, executor=executor, vectorized=vectorized)
+
+            asserts.assertEqual(len(reference['R']), len(result['R']))
+            for key in ['R', 'T']:
+                for (R_ref, R) in zip(reference[key], result[key]):
+                    asserts.assertAlmostEqual(R_ref, R, NB_PLACES)
+
+        with asserts.assertRaises(ValueError):
+            S.solve(FREQS, ANGLES, workers=2, executor='cluster')
+
+    def test_workers_hooks(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+
+        S = Solver(layers=[Layer(wood, 10e-3), Layer(foam2, 50e-3)], backing=backing.transmission)
+        S.layers[1].hooks['pre_update_frequency'].append(compress_layer)
+        reference = S.solve(FREQS, ANGLES)
+        uncompressed = Solver(layers=[Layer(wood, 10e-3), Layer(foam2, 40e-3)], backing=backing.transmission)
+        np.testing.assert_allclose(reference.R, uncompressed.solve(FREQS, ANGLES).R, atol=1e-12)
+
+        for (executor, vectorized) in itertools.product(['process', 'thread'], [False, True]):
+            result = S.solve(FREQS, ANGLES, workers=3, executor=executor, vectorized=vectorized)
+            np.testing.assert_allclose(result.R, reference.R, atol=1e-10)
+            np.testing.assert_allclose(result.T, reference.T, atol=1e-10)
+
+        # stochastic draws spread over workers run the hooks as well
+        S.layers[0] = StochasticLayer(wood, 10e-3, 'rho', lambda: float(np.random.normal(900, 50)))
+        reference = S.solve(FREQS, ANGLES, n_draws=7, chunk_size=3, seed=42)
+        result = S.solve(FREQS, ANGLES, n_draws=7, chunk_size=3, seed=42, workers=2)
+        np.testing.assert_allclose(result.R, reference.R, atol=1e-10)
+
+        # hooks which cannot be sent to processes
+        S.layers[1].hooks['pre_update_frequency'] = [lambda layer: None]
+        with asserts.assertRaises(ValueError):
+            S.solve(FREQS, ANGLES, workers=2)
+        S.solve(FREQS, ANGLES, workers=2, executor='thread')
+
+    def test_resultset(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        draws = DrawsManager(np.linspace(-1, 1, 5), 50e-3, 10e-3)
+
+        S = Solver(layers=[Layer(foam2, 50e-3)], backing=backing.transmission)
+        result = S.solve(FREQS, ANGLES)
+
+        asserts.assertEqual(result.axes, ('f', 'angle'))
+        asserts.assertEqual(result.R.shape, (len(FREQS), len(ANGLES)))
+        asserts.assertEqual(result.R.dtype, np.complex128)
+        for (i_point, (f, angle)) in enumerate(itertools.product(FREQS, ANGLES)):
+            asserts.assertEqual(result['R'][i_point], result.R[FREQS.index(f), ANGLES.index(angle)])
+        asserts.assertTrue(np.array_equal(result.alpha, 1-np.abs(result.R)**2))
+        asserts.assertTrue(np.array_equal(result.TL, -20*np.log10(np.abs(result.T))))
+        asserts.assertEqual(
+            set(result.as_dict().keys()),
+            {'name', 'enable_stochastic', 'f', 'angle', 'R', 'T'}
+        )
+
+        S = Solver(backing=backing.rigid)
+        S.layers = [StochasticLayer(foam2, 50e-3, 'thickness', draws.as_pdf)]
+        result = S.solve(FREQS, ANGLES, n_draws=len(draws))
+
+        asserts.assertEqual(result.axes, ('f', 'angle', 'draw'))
+        asserts.assertEqual(result.R.shape, (len(FREQS), len(ANGLES), len(draws)))
+        asserts.assertEqual(result['R'].shape, (len(FREQS)*len(ANGLES), len(draws)))
+        asserts.assertEqual(result['stochastics']['values'], list(50e-3+np.linspace(-1, 1, 5)*10e-3))
+        asserts.assertIsNone(result.T)
+        asserts.assertIsNone(result.TL)
+        asserts.assertEqual(result['T'].size, 0)
+
+    def test_iter_solve(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        draws = DrawsManager(np.linspace(-1, 1, 5), 50e-3, 10e-3)
+
+        S = Solver(layers=[Layer(foam2, 50e-3)], backing=backing.transmission)
+        reference = S.solve(FREQS, ANGLES)
+        chunks = list(S.iter_solve(FREQS, ANGLES, block_size=3))
+
+        asserts.assertEqual([len(_.f) for _ in chunks], [3, 1])
+        asserts.assertEqual([(_.points.start, _.points.stop) for _ in chunks], [(0, 12), (12, 16)])
+        for chunk in chunks:
+            asserts.assertIsNone(chunk.draws)
+            asserts.assertTrue(np.array_equal(reference['R'][chunk.points], chunk.R))
+            asserts.assertTrue(np.array_equal(reference['T'][chunk.points], chunk.T))
+
+        S = Solver(backing=backing.rigid)
+        S.layers = [StochasticLayer(foam2, 50e-3, 'thickness', draws.as_pdf)]
+        reference = S.solve(FREQS, ANGLES, n_draws=len(draws))
+        draws.reset()
+        chunks = list(S.iter_solve(FREQS, ANGLES, n_draws=len(draws), chunk_size=2))
+
+        asserts.assertEqual([(_.draws.start, _.draws.stop) for _ in chunks], [(0, 2), (2, 4), (4, 5)])
+        for chunk in chunks:
+            asserts.assertEqual(reference['stochastics']['values'][chunk.draws], chunk.stochastics['values'])
+            asserts.assertTrue(np.array_equal(reference['R'][:, chunk.draws], chunk.R))
+            asserts.assertIsNone(chunk.T)
+
+    def test_memmap(self, tmp_path):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        S = Solver(backing=backing.transmission)
+        S.layers = [StochasticLayer(foam2, 50e-3, 'sigma', lambda: float(np.random.normal(15e3, 3e3)))]
+        for workers in [None, 2]:
+            reference = S.solve(FREQS, ANGLES, n_draws=7, seed=42, chunk_size=3, workers=workers)
+            directory = str(tmp_path/'workers_{}'.format(workers))
+            result = S.solve(FREQS, ANGLES, n_draws=7, seed=42, chunk_size=3, workers=workers, memmap=directory)
+
+            asserts.assertIsInstance(result.R, np.memmap)
+            asserts.assertEqual(reference['stochastics']['values'], result['stochastics']['values'])
+            asserts.assertTrue(np.array_equal(reference.R, np.load(os.path.join(directory, '0_R.npy'))))
+            asserts.assertTrue(np.array_equal(reference.T, np.load(os.path.join(directory, '0_T.npy'))))
+            asserts.assertTrue(np.array_equal(reference.alpha, result.alpha))
+            asserts.assertTrue(os.path.exists(os.path.join(directory, '0_alpha.npy')))
+
+        S = Solver(layers=[Layer(foam2, 50e-3)], backing=backing.rigid)
+        reference = S.solve(FREQS, ANGLES)
+        result = S.solve(FREQS, ANGLES, workers=2, memmap=str(tmp_path/'deterministic'))
+        asserts.assertTrue(np.array_equal(reference.R, result.R))
+        asserts.assertIsNone(result.T)
+
+    def test_compile(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+
+        S = Solver(layers=[Layer(wood, 10e-3), Layer(foam2, 50e-3), Layer(Air, 20e-3)], backing=backing.transmission)
+        plan = S.compile()
+
+        asserts.assertEqual([step.layer for step in plan.steps], [2, 1, 0])
+        asserts.assertEqual([step.size for step in plan.steps], [2, 6, 4])
+        asserts.assertEqual([step.transparent for step in plan.steps], [True, False, False])
+        asserts.assertIs(plan.step(1), plan.steps[1])
+        asserts.assertEqual(pickle.loads(pickle.dumps(plan)), plan)
+        with asserts.assertRaises(AttributeError):
+            plan.backing = backing.rigid
+
+    def test_varied_transparency(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        air = Fluid()
+        (air.rho, air.c) = (Air.rho, Air.c)
+
+        S = Solver(layers=[Layer(foam2, 50e-3), Layer(air, 20e-3)], backing=backing.transmission)
+        asserts.assertIs(S.compile().step(1).transparent, True)
+        asserts.assertIsNone(S.compile(varied=[1]).step(1).transparent)
+
+        # joint draws of the density of a last layer identical to air
+        result = solve_joint(S, FREQS, ANGLES, [(1, 'rho', Normal(Air.rho, 0.2))], n_draws=3, seed=0)
+        asserts.assertEqual(S.layers[1].medium.rho, Air.rho)
+        for (i_draw, value) in enumerate(result.stochastics['values'][:, 0]):
+            drawn = Layer(air, 20e-3)
+            drawn.medium.rho = value
+            reference = Solver(layers=[Layer(foam2, 50e-3), drawn], backing=backing.transmission).solve(FREQS, ANGLES)
+            np.testing.assert_allclose(result.R[..., i_draw], reference.R, atol=1e-12)
+            np.testing.assert_allclose(result.T[..., i_draw], reference.T, atol=1e-12)
+
+        # draws identical to air on some points of a chunk only
+        values = [Air.rho, 1.5, Air.rho, 2.]
+        draws = iter(values)
+        S_drawn = Solver(layers=[
+            Layer(foam2, 50e-3),
+            StochasticLayer(air, 20e-3, 'rho', lambda: next(draws)),
+        ], backing=backing.transmission)
+        result = S_drawn.solve(FREQS, ANGLES, n_draws=len(values), vectorized=True, chunk_size=len(values))
+        for (i_draw, value) in enumerate(values):
+            drawn = Layer(air, 20e-3)
+            drawn.medium.rho = value
+            reference = Solver(layers=[Layer(foam2, 50e-3), drawn], backing=backing.transmission).solve(FREQS, ANGLES)
+            np.testing.assert_allclose(result.R[..., i_draw], reference.R, atol=1e-12)
+            np.testing.assert_allclose(result.T[..., i_draw], reference.T, atol=1e-12)
+
+        # the recursion through a layer identical to air is singular
+        with asserts.assertRaises(ValueError):
+            solve_sensitivities(S, FREQS, ANGLES, [(1, 'rho')])
+        (_, sensitivities) = solve_sensitivities(S, FREQS, ANGLES, [(1, 'thickness')])
+        np.testing.assert_allclose(sensitivities.alpha, 0, atol=1e-12)
+
+    def test_solve_fields(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+        fluid = from_yaml(THIS_FILE_DIR+'/materials/foam.yaml', force=EqFluidJCA)
+
+        for (layers, (_, backing_func)) in itertools.product([
+            [Layer(fluid, 20e-3), Layer(foam2, 50e-3), Layer(wood, 10e-3)],
+            [Layer(fluid, 20e-3), Layer(wood, 10e-3), Layer(Air, 20e-3)],
+        ], BACKINGS):
+            S = Solver(layers=layers, backing=backing_func)
+            (result, fields) = S.solve_fields(FREQS, ANGLES, block_size=3)
+            reference = S.solve(FREQS, ANGLES, vectorized=True)
+
+            np.testing.assert_allclose(result.R, reference.R, rtol=1e-12)
+            asserts.assertEqual([_.shape for _ in fields], [
+                (len(FREQS), len(ANGLES), S.plan.step(i_L).size) for i_L in range(len(layers))
+            ])
+            # pressure is continuous at the interface with the incident medium
+            np.testing.assert_allclose(fields[0][:, :, 1], 1+result.R, rtol=1e-10)
+
+            np.testing.assert_allclose(
+                S.compute_fields(1, FREQS[2], ANGLES[1]), fields[1][2, 1], rtol=1e-10)
+
+    def test_solve_profiles(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+        fluid = from_yaml(THIS_FILE_DIR+'/materials/foam.yaml', force=EqFluidJCA)
+
+        for (_, backing_func) in BACKINGS:
+            S = Solver(layers=[Layer(fluid, 20e-3), Layer(foam2, 50e-3), Layer(wood, 10e-3)], backing=backing_func)
+            (result, profiles) = S.solve_profiles(FREQS, [0, 10e-3, 20e-3, 35e-3, 80e-3], ANGLES)
+
+            np.testing.assert_allclose(result.R, S.solve(FREQS, ANGLES, vectorized=True).R, rtol=1e-12)
+            asserts.assertEqual([list(z) for (z, _) in profiles], [[0, 10e-3], [20e-3, 35e-3], [80e-3]])
+            asserts.assertEqual(profiles[1][1].shape, (len(FREQS), len(ANGLES), 2, 6))
+
+            # the state vector inside a layer is the one on the interface of the same
+            # system with the layer split in two
+            S_split = Solver(layers=[
+                Layer(fluid, 10e-3), Layer(fluid, 10e-3),
+                Layer(foam2, 15e-3), Layer(foam2, 35e-3),
+                Layer(wood, 10e-3)
+            ], backing=backing_func)
+            (_, fields) = S_split.solve_fields(FREQS, ANGLES)
+            for (profile, field) in [(profiles[0][1][:, :, 1], fields[1]), (profiles[1][1][:, :, 1], fields[3])]:
+                np.testing.assert_allclose(profile, field, rtol=1e-8, atol=1e-8*np.abs(field).max())
+
+        with asserts.assertRaises(ValueError):
+            S.solve_profiles(FREQS, [-1e-3])
+
+    def test_solve_adaptive(self):
+
+        glass = from_yaml(THIS_FILE_DIR+'/materials/glass.yaml')
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+
+        S = Solver(layers=[Layer(glass, 4e-3)], backing=backing.transmission)
+        result = S.solve_adaptive('20:500:10000', [45], max_points=400)
+
+        asserts.assertLessEqual(len(result.f), 400)
+        asserts.assertTrue(np.all(np.diff(result.f) > 0))
+        asserts.assertTrue(set(np.arange(20, 10001, 500)) <= set(result.f))
+        # the grid is refined around the coincidence dip
+        dip = result.f[np.argmin(result.TL[:, 0])]
+        asserts.assertLess(np.min(np.diff(result.f)), 10)
+        asserts.assertLess(np.max(np.diff(result.f[np.abs(result.f-dip) < 500])), 50)
+
+        reference = S.solve(list(result.f), [45], vectorized=True)
+        np.testing.assert_allclose(result.R, reference.R, rtol=1e-12)
+        np.testing.assert_allclose(result.T, reference.T, rtol=1e-12)
+
+        S = Solver(layers=[Layer(foam2, 50e-3)], backing=backing.rigid)
+        result = S.solve_adaptive([100, 1000, 5000], ANGLES, tol=0.05, min_step=20)
+        asserts.assertIsNone(result.T)
+        asserts.assertGreaterEqual(np.min(np.diff(result.f)), 10)
+
+        with asserts.assertRaises(ValueError):
+            S.solve_adaptive([100])
+
+    def test_stochastic_qmc(self):
+
+        foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+        wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+        distribution = Normal(50e-3, 3e-3)
+
+        S = Solver(layers=[
+            Layer(wood, 5e-3),
+            StochasticLayer(foam2, 50e-3, 'thickness', distribution)
+        ], backing=backing.transmission)
+        reference = solve_pce(S, FREQS, ANGLES, order=10).mean('alpha')
+
+        draws = DrawsManager.from_distribution(distribution, 256, 'sobol', seed=0)
+        S.layers[1].pdf = draws.as_pdf
+        result = S.solve(FREQS, ANGLES, n_draws=len(draws), vectorized=True)
+
+        np.testing.assert_array_equal(result.stochastics['values'], draws.draws)
+        np.testing.assert_allclose(result.alpha.mean(axis=-1), reference, atol=2e-4)
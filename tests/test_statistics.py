@@ -0,0 +1,102 @@
+#! /usr/bin/env python
+# -*- coding:utf8 -*-
+#
+# test_statistics.py
+#
+# This file is part of pymls, a software distributed under the MIT license.
+# For any question, please contact one of the authors cited below.
+#
+# Copyright (c) 2017
+# 	Olivier Dazel <olivier.dazel@univ-lemans.fr>
+# 	Mathieu Gaborit <gaborit@kth.se>
+# 	Peter Göransson <pege@kth.se>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+
+import unittest
+import os
+
+import numpy as np
+
+from pymls import Solver, Layer, StochasticLayer, backing, from_yaml
+from pymls.utils import Welford, P2Quantile, Normal, solve_online
+
+# use assertions from unittest
+asserts = unittest.TestCase('__init__')
+
+THIS_FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+FREQS = [10, 500, 1000, 3000]
+ANGLES = [5, 35, 45, 80]
+
+
+def test_welford():
+    rng = np.random.default_rng(0)
+    samples = rng.lognormal(0, 0.5, (3, 4, 1000)) + 1j*rng.normal(size=(3, 4, 1000))
+
+    accumulator = Welford((3, 4), np.complex128)
+    for start in range(0, 1000, 37):
+        accumulator.update(samples[..., start:start+37])
+
+    asserts.assertEqual(accumulator.count, 1000)
+    np.testing.assert_allclose(accumulator.mean, samples.mean(axis=-1), rtol=1e-12)
+    np.testing.assert_allclose(accumulator.variance(), np.var(samples, axis=-1, ddof=1), rtol=1e-12)
+    asserts.assertTrue(np.all(np.isnan(Welford((2,)).variance())))
+
+
+def test_p2_quantile():
+    rng = np.random.default_rng(0)
+    samples = rng.lognormal(0, 0.5, (3, 4, 5000))
+
+    for p in [0.05, 0.5, 0.95]:
+        sketch = P2Quantile(p, (3, 4))
+        sketch.update(samples)
+        np.testing.assert_allclose(sketch.value(), np.quantile(samples, p, axis=-1), rtol=5e-2)
+
+    # exact quantiles while the markers are not initialised
+    sketch = P2Quantile(0.5, (2,))
+    sketch.update(np.array([[1., 2., 3.], [3., 2., 1.]]))
+    np.testing.assert_array_equal(sketch.value(), [2, 2])
+
+
+def test_solve_online():
+
+    foam2 = from_yaml(THIS_FILE_DIR+'/materials/foam2.yaml')
+    wood = from_yaml(THIS_FILE_DIR+'/materials/wood.yaml')
+
+    S = Solver(layers=[
+        Layer(wood, 5e-3),
+        StochasticLayer(foam2, 50e-3, 'sigma', Normal(15e3, 2e3)),
+        StochasticLayer(foam2, 50e-3, 'thickness', Normal(50e-3, 3e-3)),
+    ], backing=backing.transmission)
+    reference = S.solve(FREQS, ANGLES, n_draws=200, vectorized=True, seed=0)
+
+    statistics = solve_online(S, FREQS, ANGLES, n_draws=200, chunk_size=30, seed=0)
+    for (stats, result) in zip(statistics, reference):
+        asserts.assertEqual(stats.n_draws, 200)
+        asserts.assertFalse(stats.converged)
+        np.testing.assert_allclose(stats.mean('R'), result.R.mean(axis=-1), rtol=1e-12)
+        np.testing.assert_allclose(stats.std('TL'), result.TL.std(axis=-1, ddof=1), rtol=1e-10)
+        np.testing.assert_allclose(stats.quantile('alpha', 0.5), np.median(result.alpha, axis=-1), atol=1e-2)
+
+    # draws stop once the confidence interval on alpha is narrow enough
+    statistics = solve_online(S, FREQS, ANGLES, n_draws=200, tol=5e-3, min_draws=40, chunk_size=20, seed=0)
+    for (stats, result) in zip(statistics, reference):
+        asserts.assertTrue(stats.converged)
+        asserts.assertTrue(40 <= stats.n_draws < 200)
+        asserts.assertTrue(np.all(stats.interval_width('alpha') <= 5e-3))
+        np.testing.assert_allclose(
+            stats.mean('alpha'), result.alpha[..., :stats.n_draws].mean(axis=-1), rtol=1e-12)
+
+    S.layers = [Layer(wood, 5e-3)]
+    with asserts.assertRaises(ValueError):
+        solve_online(S, FREQS, ANGLES)